@@ -0,0 +1,322 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: bench_hicrep.py [-h] [--presets PRESET [PRESET ...]] [--out OUT]
+#                        [--saveBaseline NAME] [--compare NAME]
+# Description: Benchmark the hicrep hot path on synthetic Cooler files.
+# For each preset, a pair of synthetic Cooler files with the chromosome sizes
+# of the preset genome is generated (and kept under --dataDir for later runs)
+# and the wall time and the peak allocated memory of each stage of the
+# pipeline on the largest chromosome, as well as the end-to-end hicrepSCC, are
+# recorded, together with the deviation of the float32 mode from float64.
+# Results can be saved with --saveBaseline as a named baseline under
+# benchmarks/baselines and later runs on the same machine can be compared
+# against it with --compare to catch performance regressions. No baseline is
+# shipped as the timings depend on the machine.
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+import cooler
+from hicrep.utils import (
+    readMcool, cool2pixels, getSubCoo, trimDiags, meanFilterSparse,
+    upperDiagCsr, resample, streamSubBand, meanFilterBand, coolerInfo,
+    DiagBand
+    )
+from hicrep.hicrep import sccByDiag, sccByDiagCsr, hicrepSCC
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+
+GENOMES = {
+    # dm6 as in tests/data/fly_hi-c
+    'fly': {'chr2L': 23513712, 'chr2R': 25286936, 'chr3L': 28110227,
+            'chr3R': 32079331, 'chr4': 1348131, 'chrX': 23542271,
+            'chrY': 3667352},
+    # hg38
+    'human': {'chr1': 248956422, 'chr2': 242193529, 'chr3': 198295559,
+              'chr4': 190214555, 'chr5': 181538259, 'chr6': 170805979,
+              'chr7': 159345973, 'chr8': 145138636, 'chr9': 138394717,
+              'chr10': 133797422, 'chr11': 135086622, 'chr12': 133275309,
+              'chr13': 114364328, 'chr14': 107043718, 'chr15': 101991189,
+              'chr16': 90338345, 'chr17': 83257441, 'chr18': 80373285,
+              'chr19': 58617616, 'chr20': 64444167, 'chr21': 46709983,
+              'chr22': 50818468, 'chrX': 156040895, 'chrY': 57227415},
+}
+
+PRESETS = {
+    'fly100kb': dict(genome='fly', binSize=100000, h=1, dBPMax=5000000),
+    'fly10kb': dict(genome='fly', binSize=10000, h=20, dBPMax=5000000),
+    'human100kb': dict(genome='human', binSize=100000, h=1, dBPMax=5000000),
+    'human10kb': dict(genome='human', binSize=10000, h=20, dBPMax=5000000),
+    'human5kb': dict(genome='human', binSize=5000, h=20, dBPMax=5000000),
+}
+
+DEFAULT_PRESETS = ['fly100kb', 'fly10kb', 'human100kb']
+
+
+def syntheticPixels(chromSizes: dict, binSize: int, seed: int,
+                    density: float = 20.0, maxDistBP: int = 10000000):
+    """Generate the pixels of a synthetic Hi-C contact matrix whose contact
+    probability and counts decay with the genomic distance
+
+    Args:
+        chromSizes: `dict` chromosome name to length in bp
+        binSize: `int` bin size
+        seed: `int` random seed
+        density: `float` expected number of non-zero pixels per bin
+        on each diagonal is density / (1 + diagonal index)
+        maxDistBP: `int` no cis contact is generated beyond this distance
+
+    Yields:
+        `pd.DataFrame` pixels of each chromosome sorted by bin1_id and bin2_id
+    """
+    rng = np.random.default_rng(seed)
+    nBinsAll = [-(-size // binSize) for size in chromSizes.values()]
+    binOffsets = np.concatenate(([0], np.cumsum(nBinsAll)))
+    dMax = maxDistBP // binSize + 1
+    for iChr, nBins in enumerate(nBinsAll):
+        bin1s = []
+        bin2s = []
+        for d in range(min(dMax, nBins)):
+            nPix = rng.binomial(nBins - d, min(1.0, density / (d + 1)))
+            pos = rng.choice(nBins - d, size=nPix, replace=False)
+            bin1s.append(pos)
+            bin2s.append(pos + d)
+        # sprinkle some trans contacts to the downstream chromosomes
+        nTrans = nBins // 2 if binOffsets[iChr + 1] < binOffsets[-1] else 0
+        transBin1 = rng.integers(0, nBins, size=nTrans)
+        transBin2 = rng.integers(binOffsets[iChr + 1], binOffsets[-1],
+                                 size=nTrans) - binOffsets[iChr]
+        bin1 = np.concatenate(bin1s + [transBin1]) + binOffsets[iChr]
+        bin2 = np.concatenate(bin2s + [transBin2]) + binOffsets[iChr]
+        counts = 1 + rng.poisson(200.0 / (1.0 + np.abs(bin2 - bin1)))
+        pixels = pd.DataFrame({'bin1_id': bin1, 'bin2_id': bin2,
+                               'count': counts})
+        pixels = pixels.drop_duplicates(['bin1_id', 'bin2_id'])
+        yield pixels.sort_values(['bin1_id', 'bin2_id']).reset_index(drop=True)
+
+
+def syntheticCooler(dataDir: str, preset: str, seed: int):
+    """Return the file name of a synthetic Cooler file for the preset and
+    generate it if it doesn't exist yet
+
+    Args:
+        dataDir: `str` directory of the generated files
+        preset: `str` name of the preset
+        seed: `int` random seed
+
+    Returns:
+        `str` file name of the Cooler file
+    """
+    os.makedirs(dataDir, exist_ok=True)
+    fcool = os.path.join(dataDir, f"{preset}_seed{seed}.cool")
+    if not os.path.exists(fcool):
+        params = PRESETS[preset]
+        chromSizes = GENOMES[params['genome']]
+        bins = cooler.binnify(pd.Series(chromSizes), params['binSize'])
+        ftmp = fcool + ".tmp"
+        cooler.create_cooler(ftmp, bins,
+                             syntheticPixels(chromSizes, params['binSize'],
+                                             seed),
+                             ordered=True, dtypes={'count': np.int32})
+        os.replace(ftmp, fcool)
+    return fcool
+
+
+def measure(fn, repeat: int):
+    """Measure the peak allocated memory and the best wall time of a function
+
+    Args:
+        fn: callable without argument
+        repeat: `int` number of timed runs
+
+    Returns:
+        `dict` of 'seconds' and 'peakMB'
+    """
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': min(seconds), 'peakMB': peak / 2**20}
+
+
+def benchPreset(dataDir: str, preset: str, repeat: int):
+    """Run all the benchmarks of a preset
+
+    Args:
+        dataDir: `str` directory of the generated files
+        preset: `str` name of the preset
+        repeat: `int` number of timed runs of each stage
+
+    Returns:
+        `dict` stage name to its measurement
+    """
+    params = PRESETS[preset]
+    h = params['h']
+    dBPMax = params['dBPMax']
+    cool1, _ = readMcool(syntheticCooler(dataDir, preset, 1), -1)
+    cool2, _ = readMcool(syntheticCooler(dataDir, preset, 2), -1)
+    chroms = cool1.chroms()[:]
+    chrName = chroms['name'][chroms['length'].idxmax()]
+    dMax = dBPMax // cool1.binsize + 1
+    n1 = coolerInfo(cool1, 'sum')
+    n2 = coolerInfo(cool2, 'sum')
+    pixels1 = cool2pixels(cool1)
+    bins1 = cool1.bins()
+    # inputs of each stage are computed once outside of the timed functions
+    m1 = getSubCoo(pixels1, bins1, chrName)
+    nDiags = min(dMax, m1.shape[0])
+    m1 = trimDiags(m1, nDiags, False)
+    m2 = trimDiags(getSubCoo(cool2pixels(cool2), cool2.bins(), chrName),
+                   nDiags, False)
+    m1Norm = m1.astype(float) / n1
+    m1Smooth = meanFilterSparse(m1Norm, h, nDiags)
+    m2Smooth = meanFilterSparse(m2.astype(float) / n2, h, nDiags)
+    b1 = streamSubBand(cool1, chrName, dMax)
+    b1.data /= n1
+    b2 = streamSubBand(cool2, chrName, dMax)
+    b2.data /= n2
+    b1Smooth = meanFilterBand(b1, h)
+    b2Smooth = meanFilterBand(b2, h)
+    b1Float32 = DiagBand(b1.data.astype(np.float32), b1.diagOffset,
+                         b1.binOffset)
+    stages = {
+        'getSubCoo': lambda: getSubCoo(pixels1, bins1, chrName),
+        'trimDiags': lambda: trimDiags(m1, nDiags, False),
+        'resample': lambda: resample(m1, int(m1.data.sum()) // 2),
+        'meanFilterSparse': lambda: meanFilterSparse(m1Norm, h, nDiags),
+        'upperDiagCsr': lambda: upperDiagCsr(m1Smooth, nDiags),
+        'sccByDiag': lambda: sccByDiag(m1Smooth, m2Smooth, nDiags),
+        'sccByDiagCsr': lambda: sccByDiagCsr(upperDiagCsr(m1Smooth, nDiags),
+                                             upperDiagCsr(m2Smooth, nDiags)),
+        'streamSubBand': lambda: streamSubBand(cool1, chrName, dMax),
+        'meanFilterBand': lambda: meanFilterBand(b1, h),
+        'sccByBand': lambda: sccByDiag(b1Smooth, b2Smooth, nDiags),
+        'hicrepSCC': lambda: hicrepSCC(cool1, cool2, h, dBPMax, False),
+        'meanFilterBandF32': lambda: meanFilterBand(b1Float32, h),
+        'hicrepSCCF32': lambda: hicrepSCC(cool1, cool2, h, dBPMax, False,
+                                              dtype=np.float32),
+    }
+    results = {}
+    for stage, fn in stages.items():
+        results[stage] = measure(fn, repeat)
+        print(f"{preset:>12s} {stage:>18s} {results[stage]['seconds']:12.4f} s"
+              f" {results[stage]['peakMB']:12.1f} MB", flush=True)
+    # deviation of the float32 mode from the float64 one
+    scc64 = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    scc32 = hicrepSCC(cool1, cool2, h, dBPMax, False, dtype=np.float32)
+    smooth64 = meanFilterBand(b1, h).data
+    smooth32 = meanFilterBand(b1Float32, h).data
+    float32Deviation = {
+        'sccMaxAbs': float(np.max(np.abs(scc32 - scc64))),
+        'smoothMaxRel': float(np.max(np.abs(smooth32 - smooth64)) /
+                              np.max(np.abs(smooth64))),
+    }
+    print(f"{preset:>12s} {'float32 deviation':>18s}"
+          f" scc {float32Deviation['sccMaxAbs']:.3e}"
+          f" smoothed band {float32Deviation['smoothMaxRel']:.3e}", flush=True)
+    results['meta'] = {'chrName': chrName, 'nBins': int(m1.shape[0]),
+                       'nDiags': int(nDiags), 'nnz': int(m1.nnz),
+                       'float32Deviation': float32Deviation}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Compare the results against a baseline and report the regressions
+
+    Args:
+        results: `dict` benchmark results
+        baseline: `dict` baseline benchmark results
+        tolerance: `float` relative increase of time or memory over the
+        baseline that is reported as a regression
+
+    Returns:
+        `list` of the regressions found
+    """
+    regressions = []
+    for preset, stages in results['presets'].items():
+        for stage, result in stages.items():
+            base = baseline['presets'].get(preset, {}).get(stage)
+            if stage == 'meta' or base is None:
+                continue
+            for metric in ('seconds', 'peakMB'):
+                ratio = result[metric] / max(base[metric], 1e-9)
+                flag = ""
+                if ratio > 1.0 + tolerance:
+                    flag = " REGRESSION"
+                    regressions.append((preset, stage, metric, ratio))
+                print(f"{preset:>12s} {stage:>18s} {metric:>8s}"
+                      f" {base[metric]:12.4f} -> {result[metric]:12.4f}"
+                      f" ({ratio:6.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hicrep hot path on synthetic Cooler files")
+    parser.add_argument("--presets", type=str, nargs='+',
+                        default=DEFAULT_PRESETS, choices=list(PRESETS),
+                        help="Genome and resolution presets to run")
+    parser.add_argument("--dataDir", type=str,
+                        default=os.path.join(BENCH_DIR, "data"),
+                        help="Directory to keep the synthetic Cooler files")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Report the best wall time of this many runs")
+    parser.add_argument("--out", type=str, default=None,
+                        help="Output the results to this JSON file")
+    parser.add_argument("--saveBaseline", type=str, default=None,
+                        help="Save the results as the baseline of this name\
+                        under benchmarks/baselines")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="Compare the results with the baseline of this\
+                        name previously saved with --saveBaseline and exit\
+                        with non-zero status on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative increase over the baseline reported as\
+                        a regression")
+    args = parser.parse_args()
+
+    baselineDir = os.path.join(BENCH_DIR, "baselines")
+    # check the baseline before running the benchmarks
+    assert args.compare is None or\
+        os.path.exists(os.path.join(baselineDir, args.compare + ".json")),\
+        f"No baseline {args.compare} under {baselineDir}. Save one first with"\
+        f" --saveBaseline"
+    results = {
+        'machine': {'python': platform.python_version(),
+                    'numpy': np.__version__, 'platform': platform.platform(),
+                    'processor': platform.processor()},
+        'presets': {preset: benchPreset(args.dataDir, preset, args.repeat)
+                    for preset in args.presets},
+    }
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.saveBaseline is not None:
+        os.makedirs(baselineDir, exist_ok=True)
+        fbaseline = os.path.join(baselineDir, args.saveBaseline + ".json")
+        with open(fbaseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        fbaseline = os.path.join(baselineDir, args.compare + ".json")
+        with open(fbaseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: bench_import.py [-h] [--repeat REPEAT] [--maxSeconds MAXSECONDS]
+# Description: Benchmark the startup time of the hicrep package and command
+# line tool. Each case is run in a fresh interpreter and the best wall time of
+# --repeat runs is reported together with the numerical modules it loaded.
+# Exits with non-zero status if any case takes longer than --maxSeconds or if
+# importing the package or printing the help loads the numerical modules.
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import sys
+import time
+import argparse
+import subprocess
+
+HEAVY_MODULES = ['numpy', 'scipy', 'pandas', 'h5py', 'cooler']
+
+HELP = ("import sys, hicrep\n"
+        "sys.argv = ['hicrep', '--help']\n"
+        "try:\n"
+        "    hicrep.main()\n"
+        "except SystemExit:\n"
+        "    pass")
+
+# name, code and whether the case may load the numerical modules
+CASES = [
+    ('python', "pass", False),
+    ('import hicrep', "import hicrep", False),
+    ('hicrep --help', HELP, False),
+    ('import hicrep.hicrep', "import hicrep.hicrep", True),
+]
+
+
+def runCase(code: str, repeat: int):
+    """Run code in a fresh interpreter `repeat` times
+
+    Args:
+        code: `str` python code to run
+        repeat: `int` number of runs
+
+    Returns:
+        `tuple` of the best wall time in seconds and the `list` of the
+        numerical modules loaded by the code
+    """
+    code += ("\nimport sys\n"
+             f"print('@loaded', *[m for m in {HEAVY_MODULES} "
+             "if m in sys.modules])")
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             stdout=subprocess.PIPE, encoding='utf-8').stdout
+        best = min(best, time.perf_counter() - start)
+    loaded = out.strip().split("\n")[-1].split()[1:]
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the startup time of hicrep")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Report the best of this many runs of each case")
+    parser.add_argument("--maxSeconds", type=float, default=None,
+                        help="Fail if importing hicrep or printing the help of\
+                        the command line tool takes longer than this")
+    args = parser.parse_args()
+
+    bFail = False
+    print(f"{'case':<24}{'seconds':>10}  loaded")
+    for name, code, bHeavy in CASES:
+        seconds, loaded = runCase(code, args.repeat)
+        print(f"{name:<24}{seconds:>10.3f}  {' '.join(loaded)}")
+        if not bHeavy and len(loaded) > 0:
+            print(f"FAIL {name} loads {' '.join(loaded)}")
+            bFail = True
+        if not bHeavy and args.maxSeconds is not None and\
+                seconds > args.maxSeconds:
+            print(f"FAIL {name} takes longer than {args.maxSeconds} seconds")
+            bFail = True
+    sys.exit(1 if bFail else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,132 @@
 import os
-import numpy as np
-import math
 import sys
 import warnings
-from hicrep.utils import (
-    readMcool, cool2pixels, getSubCoo,
-    trimDiags, meanFilterSparse, varVstran,
-    resample
-    )
-from hicrep.hicrep import (
-    sccOfDiag, hicrepSCC
-    )
+import importlib
+from functools import lru_cache
 
-def main(*args):
-    import argparse
-    import subprocess
-    import re
+# Public names of the submodules re-exported by the package. They are imported
+# on first access rather than with the package, so that the command line tools
+# can print their help and validate their arguments without loading numpy,
+# scipy, pandas, h5py and cooler
+LAZY_EXPORTS = {
+    'readMcool': 'hicrep.utils',
+    'cool2pixels': 'hicrep.utils',
+    'getSubCoo': 'hicrep.utils',
+    'trimDiags': 'hicrep.utils',
+    'meanFilterSparse': 'hicrep.utils',
+    'varVstran': 'hicrep.utils',
+    'resample': 'hicrep.utils',
+    'BandCache': 'hicrep.cache',
+    'StageProfiler': 'hicrep.profiler',
+    'sccOfDiag': 'hicrep.hicrep',
+    'hicrepSCC': 'hicrep.hicrep',
+    'hicrepSCCMatrix': 'hicrep.hicrep',
+    'selectChrNames': 'hicrep.hicrep',
+    'hicrepSCCByH': 'hicrep.hicrep',
+    'selectH': 'hicrep.hicrep',
+    'hicrepSCCMultiRes': 'hicrep.hicrep',
+    'hicrepSCCWindows': 'hicrep.hicrep',
+    'hicrepSCCBootstrap': 'hicrep.hicrep',
+    'bootstrapSummary': 'hicrep.hicrep',
+}
 
-    np.random.seed(10)
+# Submodules that can be accessed as attributes of the package without
+# importing them explicitly
+LAZY_SUBMODULES = ['utils', 'hicrep', 'cache', 'profiler', 'prefetch',
+                   'batch', 'server', 'index']
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("fmcool1", type=str,
-                        help="First cooler multiple-binsize contact files")
-    parser.add_argument("fmcool2", type=str,
-                        help="Second cooler multiple-binsize contact files")
-    parser.add_argument("fout", type=str,
-                        help="Output results to this file. Output format would be\
-                        one column of scc scores for each chromosome")
+
+def __getattr__(name: str):
+    """Import the re-exported names and the submodules on first access"""
+    if name in LAZY_EXPORTS:
+        value = getattr(importlib.import_module(LAZY_EXPORTS[name]), name)
+    elif name in LAZY_SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_EXPORTS) | set(LAZY_SUBMODULES))
+
+
+def addSCCArgs(parser, bH: bool = True, bCohort: bool = False):
+    """Add the command line options shared by all the SCC computing modes
+
+    Args:
+        parser: `argparse.ArgumentParser` parser to add the options to
+        bH: `bool` Whether to add the --h option. Default to True
+        bCohort: `bool` Whether all the inputs are down sampled together by
+        --bDownSample. Default to False
+    """
     parser.add_argument("--binSize", type=int, default=-1,
                         help="Use this to select the bin size from the input mcool\
                         file. Default to -1, meaning that the inputs are treated as\
                         single-binsize .cool files")
-    parser.add_argument("--h", type=int, required=True,
-                        help="Smooth the input contact matrices using a 2d mean\
-                        filter with window size of 1 + 2 * value. This should\
-                        be set according to the bin size. For example, you can try the\
-                        following settings: --binSize=10000 --h=20,\
-                        --binSize=25000 --h=10, --binSize=40000 --h5. Beware that\
-                        these examples might not work in all cases and the user\
-                        should adjust them according to the specific application")
+    if bH:
+        parser.add_argument("--h", type=int, required=True,
+                            help="Smooth the input contact matrices using a 2d mean\
+                            filter with window size of 1 + 2 * value. This should\
+                            be set according to the bin size. For example, you can try the\
+                            following settings: --binSize=10000 --h=20,\
+                            --binSize=25000 --h=10, --binSize=40000 --h5. Beware that\
+                            these examples might not work in all cases and the user\
+                            should adjust them according to the specific application")
     parser.add_argument("--dBPMax", type=int, required=True,
                         help="Only consider contacts at most this number of bp away\
                         from the diagonal. For human genome, the value of\
                         5000000 was used in the original HiCRep paper.")
-    parser.add_argument("--bDownSample", action='store_true', default=False,
-                        help="Down sample the input with more contact counts to\
-                        the the same number of counts as the other input with less\
-                        contact counts. If turned off, the input matrices will be\
-                        normalized by dividing the counts by their respective total\
-                        number of contacts.")
+    addSelectionArgs(parser, bCohort)
+    addCacheArgs(parser)
+
+
+def addCacheArgs(parser):
+    """Add the command line options of the on-disk cache of the smoothed
+    contact matrices
+
+    Args:
+        parser: `argparse.ArgumentParser` parser to add the options to
+    """
+    parser.add_argument("--cacheDir", type=str, default=None,
+                        help="Store the normalized and smoothed contact\
+                        matrices of each chromosome in this directory and\
+                        reuse them in later runs with the same input file and\
+                        parameters. Not used with --bDownSample")
+    parser.add_argument("--cacheSizeGB", type=float, default=None,
+                        help="Evict the least recently used entries of\
+                        --cacheDir when it grows beyond this size in GB.\
+                        Default to no limit")
+
+
+def addSelectionArgs(parser, bCohort: bool = False):
+    """Add the command line options for down sampling and selecting the
+    chromosomes shared by all the SCC computing modes
+
+    Args:
+        parser: `argparse.ArgumentParser` parser to add the options to
+        bCohort: `bool` Whether all the inputs are down sampled together by
+        --bDownSample. Default to False
+    """
+    if bCohort:
+        parser.add_argument("--bDownSample", action='store_true', default=False,
+                            help="Down sample all the inputs to the same number\
+                            of counts as the input with the least contact counts\
+                            on each chromosome, so that every pair is scored at\
+                            the depth of the shallowest input of the whole\
+                            cohort rather than of the pair. Use --ladder to\
+                            down sample each pair to its own common depth. If\
+                            turned off, the input matrices will be normalized by\
+                            dividing the counts by their respective total number\
+                            of contacts.")
+    else:
+        parser.add_argument("--bDownSample", action='store_true', default=False,
+                            help="Down sample the input with more contact counts to\
+                            the the same number of counts as the other input with less\
+                            contact counts. If turned off, the input matrices will be\
+                            normalized by dividing the counts by their respective total\
+                            number of contacts.")
     parser.add_argument("--chrNames", type=str, nargs='*', default=[],
                         help="Only compute the SCC scores on this subset of\
                         chromosomes whose names are provided. The output SCC\
@@ -61,28 +139,271 @@ def main(*args):
                         chromosomes in the input Cooler files by removing those\
                         chromosomes provided here")
 
-    args = parser.parse_args()
 
+def addPrecisionArgs(parser):
+    """Add the command line option of the floating point precision of the
+    contact matrices
+
+    Args:
+        parser: `argparse.ArgumentParser` parser to add the options to
+    """
+    parser.add_argument("--precision", type=str, default="float64",
+                        choices=["float64", "float32"],
+                        help="Floating point precision in which the contact\
+                        matrices are normalized, smoothed and stored. float32\
+                        halves their memory while the SCC statistics are\
+                        still accumulated in float64. Default to float64")
+
+
+def addLadderArgs(parser):
+    """Add the command line option of the down sampling ladder
+
+    Args:
+        parser: `argparse.ArgumentParser` parser to add the options to
+    """
+    parser.add_argument("--ladder", action='store_true', default=False,
+                        help="With --bDownSample, score each pair at the\
+                        deepest depth common to both inputs among nested,\
+                        binomially thinned versions of each input at powers\
+                        of sqrt(2) contacts, instead of resampling the input\
+                        with more contacts for every pair. Each input is\
+                        thinned and smoothed once per depth, which is stored\
+                        in --cacheDir if given")
+
+
+def checkLadderArgs(args):
+    """Validate the down sampling ladder command line option
+
+    Args:
+        args: `argparse.Namespace` parsed command line options
+    """
+    assert not args.ladder or args.bDownSample,\
+        "--ladder only applies with --bDownSample"
+
+
+def checkChrArgs(args):
+    """Validate the chromosome selection command line options
+
+    Args:
+        args: `argparse.Namespace` parsed command line options
+
+    Returns:
+        `tuple` of the chromosome names to include (or None for all) and the
+        set of chromosome names to exclude (or None for none)
+    """
     assert not (args.excludeChr != ['M'] and len(args.chrNames) > 0), f"""
         Please use --chrNames OR --excludeChr arguments but not both.
         """
+    chrNames = args.chrNames
+    excludeChr = set(args.excludeChr)
+
+    if len(excludeChr) != len(args.excludeChr):
+        warnings.warn(f"""
+            Duplicate excludeChr found. Please remove them in --excludeChr""")
+    return (chrNames if len(chrNames) > 0 else None,
+            excludeChr if len(excludeChr) > 0 else None)
+
+
+def cacheFromArgs(args):
+    """Create the on-disk cache of smoothed contact matrices from the command
+    line options
+
+    Args:
+        args: `argparse.Namespace` parsed command line options
+
+    Returns:
+        `BandCache` or None if no cache directory is given
+    """
+    if args.cacheDir is None:
+        return None
+    from hicrep.cache import BandCache
+    maxBytes = None if args.cacheSizeGB is None else int(args.cacheSizeGB * 2**30)
+    return BandCache(args.cacheDir, maxBytes)
+
+
+def readFinestCool(fmcool: str, binSize: int):
+    """Open the input of `mainMultiRes`, which is either a mcool file read at
+    the given bin size or a single-binsize cool file read as is
+
+    Args:
+        fmcool: `str` Input mcool or cool file name
+        binSize: `int` Bin size to select from a mcool file
+
+    Returns:
+        `cooler.api.Cooler` object
+    """
+    import h5py
+    import cooler
+    from hicrep.utils import readMcool
+
+    if cooler.fileops.is_multires_file(fmcool):
+        with h5py.File(fmcool, 'r') as f:
+            available = sorted(int(b) for b in f['resolutions'])
+        assert binSize in available,\
+            f"{fmcool} has no resolution of the smallest --binSizes {binSize}."\
+            f" Available resolutions are {available}"
+        return readMcool(fmcool, binSize)[0]
+    assert cooler.fileops.is_cooler(fmcool),\
+        f"{fmcool} is neither a mcool nor a cool file"
+    return readMcool(fmcool, -1)[0]
+
+
+def parseNamedFiles(fmcools: list):
+    """Parse input files optionally named as name=file, whose names default to
+    the file names without extension
+
+    Args:
+        fmcools: `list` of `str` command line arguments
+
+    Returns:
+        `tuple` of the `list` of names and the `list` of file names
+    """
+    names = []
+    fnames = []
+    for fmcool in fmcools:
+        name, sep, fname = fmcool.partition('=')
+        if not sep:
+            fname = fmcool
+            name = os.path.splitext(os.path.basename(fmcool))[0]
+        names.append(name)
+        fnames.append(fname)
+    assert len(set(names)) == len(names),\
+        f"Duplicate sample names {names}. Please name them as name=file"
+    return names, fnames
+
+
+@lru_cache(maxsize=None)
+def gitRevision(repoDir: str):
+    """Return the git revision and branch of a repository by reading its git
+    directory, which is much faster than running git in a subprocess
+
+    Args:
+        repoDir: `str` top level directory of the repository
+
+    Returns:
+        `tuple` of the `str` revision and branch, where branch is 'HEAD' if
+        the HEAD is detached, or None if `repoDir` is not a git repository
+    """
+    gitDir = os.path.join(repoDir, '.git')
+    if os.path.isfile(gitDir):
+        # worktrees and submodules have a file pointing to the git directory
+        with open(gitDir) as f:
+            line = f.read().strip()
+        if not line.startswith('gitdir:'):
+            return None
+        gitDir = os.path.join(repoDir, line[len('gitdir:'):].strip())
+    headFile = os.path.join(gitDir, 'HEAD')
+    if not os.path.isfile(headFile):
+        return None
+    with open(headFile) as f:
+        head = f.read().strip()
+    if not head.startswith('ref:'):
+        return head, 'HEAD'
+    ref = head[len('ref:'):].strip()
+    branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    # the refs of a worktree are shared with the main git directory
+    commonDir = gitDir
+    commonFile = os.path.join(gitDir, 'commondir')
+    if os.path.isfile(commonFile):
+        with open(commonFile) as f:
+            commonDir = os.path.join(gitDir, f.read().strip())
+    for refDir in [gitDir, commonDir]:
+        refFile = os.path.join(refDir, ref)
+        if os.path.isfile(refFile):
+            with open(refFile) as f:
+                return f.read().strip(), branch
+    packedFile = os.path.join(commonDir, 'packed-refs')
+    if os.path.isfile(packedFile):
+        with open(packedFile) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2 and fields[1] == ref:
+                    return fields[0], branch
+    return None
+
 
+def provenanceHeader():
+    """Build the header of the output file, which records the command line
+    and, if this package is run from a git repository, the git revision. Set
+    the environment variable HICREP_GITREV=0 to skip the latter
+
+    Returns:
+        `str` header of the output file
+    """
     header = "#"+" ".join(sys.argv)+"\n"
 
-    # Check if current script is under revision control
-    gitls = subprocess.Popen('cd '+os.path.dirname(os.path.realpath(__file__)) +
-                             ' && git ls-files --error-unmatch ' + __file__,
-                             shell=True, stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE, encoding='utf-8')
-    if not gitls.stderr.read():
-        gitrev = subprocess.Popen('cd '+os.path.dirname(os.path.realpath(__file__))
-                                  + ' && git rev-parse HEAD --abbrev-ref HEAD',
-                                  shell=True, stdout=subprocess.PIPE,
-                                  stderr=subprocess.PIPE, encoding='utf-8')
-        if not gitrev.stderr.read():
-            p = re.compile("\n")
-            header += "# @rev " + p.sub("\n# @branch ",
-                                        gitrev.stdout.read().strip()) + "\n"
+    if os.environ.get('HICREP_GITREV', '1') == '0':
+        return header
+
+    # Check if this package is at the top level of a git repository rather
+    # than installed
+    repoDir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    rev = gitRevision(repoDir)
+    if rev is not None:
+        header += f"# @rev {rev[0]}\n# @branch {rev[1]}\n"
+    return header
+
+
+def main(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fmcool1", type=str,
+                        help="First cooler multiple-binsize contact files")
+    parser.add_argument("fmcool2", type=str,
+                        help="Second cooler multiple-binsize contact files")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one column of scc scores for each chromosome")
+    addSCCArgs(parser)
+    parser.add_argument("--nWorkers", type=int, default=1,
+                        help="Number of worker processes that compute the SCC\
+                        scores of different chromosomes in parallel. Default\
+                        to 1, meaning no parallelization")
+    parser.add_argument("--prefetch", type=int, nargs='?', const=1, default=0,
+                        help="Read up to this many next chromosomes (1 if no\
+                        value is given) in a background thread while the\
+                        current one is being computed. Not used with\
+                        --nWorkers. Default to 0, meaning no prefetching")
+    parser.add_argument("--bulkLoad", action='store_true', default=False,
+                        help="Read the contacts of all the chromosomes within\
+                        --dBPMax in one pass up front instead of once per\
+                        chromosome, which is faster for genomes with many\
+                        small chromosomes or scaffolds but holds those contacts\
+                        in memory. Not used with --nWorkers")
+    parser.add_argument("--profile", type=str, nargs='?', const='tsv',
+                        default=None, choices=['tsv', 'json'],
+                        help="Record the wall time, CPU time, number of\
+                        non-zero elements in and out, and peak memory of each\
+                        stage of each chromosome and write them to\
+                        fout.profile.tsv or, with \"--profile json\",\
+                        fout.profile.json")
+    parser.add_argument("--profileMemory", action='store_true', default=False,
+                        help="With --profile, also record the peak memory\
+                        allocated during each stage with tracemalloc, which\
+                        slows down the stages. By default, only the peak\
+                        resident set size is recorded")
+    parser.add_argument("--seed", type=int, default=10,
+                        help="Seed of the random number generator used for\
+                        down sampling. Default to 10")
+    addPrecisionArgs(parser)
+    addLadderArgs(parser)
+
+    args = parser.parse_args()
+
+    checkLadderArgs(args)
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.profiler import StageProfiler
+    from hicrep.hicrep import hicrepSCC
+
+    np.random.seed(args.seed)
 
     fmcool1 = args.fmcool1
     fmcool2 = args.fmcool2
@@ -91,18 +412,568 @@ def main(*args):
     h = args.h
     dBPMax = args.dBPMax
     bDownSample = args.bDownSample
-    chrNames = args.chrNames
-    excludeChr = set(args.excludeChr)
-
-    if len(excludeChr) != len(args.excludeChr):
-        warnings.warn(f"""
-            Duplicate excludeChr found. Please remove them in --excludeChr""")
 
     cool1, binSize1 = readMcool(fmcool1, binSize)
     cool2, binSize2 = readMcool(fmcool2, binSize)
 
+    profiler = None if args.profile is None else\
+        StageProfiler(args.profileMemory)
+
     scc = hicrepSCC(cool1, cool2, h, dBPMax, bDownSample,
-                    chrNames if len(chrNames) > 0 else None,
-                    excludeChr if len(excludeChr) > 0 else None)
+                    chrNames, excludeChr, args.nWorkers, cacheFromArgs(args),
+                    profiler, prefetch=args.prefetch,
+                    bBulkLoad=args.bulkLoad, dtype=np.dtype(args.precision),
+                    bLadder=args.ladder)
 
     np.savetxt(fout, scc, "%30.15e", header=header)
+
+    if args.profile == 'tsv':
+        profiler.toTSV(fout + ".profile.tsv")
+    elif args.profile == 'json':
+        profiler.toJSON(fout + ".profile.json")
+
+
+def mainMatrix(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compute all-vs-all SCC scores between multiple Cooler\
+        files, reading and smoothing each input only once per chromosome")
+    parser.add_argument("fmcools", type=str, nargs='+',
+                        help="Cooler multiple-binsize contact files. At least\
+                        2 are required")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one NxN block of scc scores for each chromosome, where N\
+                        is the number of input files ordered as in the command\
+                        line. Each block is preceded by a comment line with the\
+                        chromosome name")
+    addSCCArgs(parser, bCohort=True)
+    addPrecisionArgs(parser)
+    addLadderArgs(parser)
+
+    args = parser.parse_args()
+
+    assert len(args.fmcools) > 1, "Please provide at least 2 input files"
+    checkLadderArgs(args)
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.hicrep import hicrepSCCMatrix, selectChrNames
+
+    np.random.seed(10)
+    header += "# @inputs " + " ".join(args.fmcools) + "\n"
+
+    cools = [readMcool(fmcool, args.binSize)[0] for fmcool in args.fmcools]
+
+    scc = hicrepSCCMatrix(cools, args.h, args.dBPMax, args.bDownSample,
+                          chrNames, excludeChr, cacheFromArgs(args),
+                          dtype=np.dtype(args.precision),
+                          bLadder=args.ladder)
+
+    chrNamesOut = selectChrNames(cools[0], chrNames, excludeChr)
+    with open(args.fout, 'w') as f:
+        f.write(header)
+        for iChr, chrName in enumerate(chrNamesOut):
+            np.savetxt(f, scc[:, :, iChr], "%30.15e", header=f"@chrom {chrName}")
+
+
+def mainHTrain(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compute SCC scores for a range of smoothing window\
+        half-sizes in a single pass over the inputs and select the half-size\
+        at which the SCC score stabilizes")
+    parser.add_argument("fmcool1", type=str,
+                        help="First cooler multiple-binsize contact files")
+    parser.add_argument("fmcool2", type=str,
+                        help="Second cooler multiple-binsize contact files")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one row per half-size with the half-size followed by the\
+                        scc scores of each chromosome. The selected half-size is\
+                        recorded in the header")
+    addSCCArgs(parser, bH=False)
+    addPrecisionArgs(parser)
+    parser.add_argument("--hMin", type=int, default=0,
+                        help="Smallest half-size of the 2d mean filter to try.\
+                        Default to 0")
+    parser.add_argument("--hMax", type=int, default=20,
+                        help="Largest half-size of the 2d mean filter to try.\
+                        Default to 20")
+
+    args = parser.parse_args()
+
+    assert 0 <= args.hMin < args.hMax, "Please provide 0 <= hMin < hMax"
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.hicrep import hicrepSCCByH, selectH, selectChrNames
+
+    np.random.seed(10)
+
+    cool1, binSize1 = readMcool(args.fmcool1, args.binSize)
+    cool2, binSize2 = readMcool(args.fmcool2, args.binSize)
+
+    hs = list(range(args.hMin, args.hMax + 1))
+    scc = hicrepSCCByH(cool1, cool2, hs, args.dBPMax, args.bDownSample,
+                       chrNames, excludeChr, cacheFromArgs(args),
+                       dtype=np.dtype(args.precision))
+
+    header += f"# @selectedH {selectH(hs, scc)}\n"
+    chrNamesOut = selectChrNames(cool1, chrNames, excludeChr)
+    header += "h " + " ".join(chrNamesOut)
+    np.savetxt(args.fout, np.column_stack([hs, scc]), "%30.15e", header=header)
+
+
+def mainMultiRes(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compute SCC scores at several resolutions, reading the\
+        finest one from the input mcool files only once and aggregating it\
+        into the coarser ones in memory")
+    parser.add_argument("fmcool1", type=str,
+                        help="First cooler multiple-binsize contact files")
+    parser.add_argument("fmcool2", type=str,
+                        help="Second cooler multiple-binsize contact files")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one row per bin size with the bin size followed by the\
+                        scc scores of each chromosome")
+    parser.add_argument("--binSizes", type=int, nargs='+', required=True,
+                        help="Bin sizes to compute the SCC scores at. The\
+                        smallest one is read from the input mcool files and\
+                        the others must be multiples of it. Single-binsize\
+                        cool inputs are read as is and all the bin sizes must\
+                        be multiples of their bin size")
+    parser.add_argument("--h", type=int, nargs='+', required=True,
+                        help="Half-size of the 2d mean filter at each bin size,\
+                        or one value for all bin sizes")
+    parser.add_argument("--dBPMax", type=int, nargs='+', required=True,
+                        help="Only consider contacts at most this number of bp\
+                        away from the diagonal at each bin size, or one value\
+                        for all bin sizes")
+    addSelectionArgs(parser)
+    addCacheArgs(parser)
+    addPrecisionArgs(parser)
+
+    args = parser.parse_args()
+
+    nRes = len(args.binSizes)
+    hs = args.h * nRes if len(args.h) == 1 else args.h
+    dBPMaxs = args.dBPMax * nRes if len(args.dBPMax) == 1 else args.dBPMax
+    assert len(hs) == nRes and len(dBPMaxs) == nRes,\
+        "Please provide either one or one per bin size of --h and --dBPMax"
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.hicrep import hicrepSCCMultiRes, selectChrNames
+
+    np.random.seed(10)
+
+    binSize = min(args.binSizes)
+    cool1 = readFinestCool(args.fmcool1, binSize)
+    cool2 = readFinestCool(args.fmcool2, binSize)
+
+    scc = hicrepSCCMultiRes(cool1, cool2, args.binSizes, hs, dBPMaxs,
+                            args.bDownSample, chrNames, excludeChr,
+                            cache=cacheFromArgs(args),
+                            dtype=np.dtype(args.precision))
+
+    chrNamesOut = selectChrNames(cool1, chrNames, excludeChr)
+    header += "binSize " + " ".join(chrNamesOut)
+    np.savetxt(args.fout, np.column_stack([args.binSizes, scc]), "%30.15e",
+               header=header)
+
+
+def mainBatch(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compute SCC scores of a list of pairs of Cooler files,\
+        optionally split into shards across machines, recording the score of\
+        each chromosome in a checkpoint file as soon as it's computed so that\
+        a restarted run skips the chromosomes already done")
+    parser.add_argument("fpairs", type=str,
+                        help="Tab-separated file with two Cooler file names per\
+                        line, or a 4DN metadata sample sheet, in which case all\
+                        pairs of the listed files are scored")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one line per pair and chromosome with the two input\
+                        file names, the chromosome name and the scc score")
+    addSCCArgs(parser)
+    parser.add_argument("--dataDir", type=str, default=None,
+                        help="Directory where the files listed in a sample\
+                        sheet are looked up by their accession. Default to the\
+                        directory of the sample sheet")
+    parser.add_argument("--shard", type=str, default="0/1",
+                        help="Only compute the i-th of N shards of the pairs,\
+                        given as i/N with 0 <= i < N. Default to 0/1, meaning\
+                        all the pairs")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="Record the score of each chromosome of each pair\
+                        in this file and skip those already recorded in it.\
+                        Default to fout.checkpoint.tsv")
+    parser.add_argument("--nWorkers", type=int, default=1,
+                        help="Number of worker processes that compute the SCC\
+                        scores of different chromosomes of a pair in parallel.\
+                        Default to 1, meaning no parallelization")
+    addPrecisionArgs(parser)
+    addLadderArgs(parser)
+
+    args = parser.parse_args()
+
+    checkLadderArgs(args)
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.batch import (
+        readPairs, orderPairs, parseShard, shardPairs, CheckpointStore,
+        runBatch
+        )
+
+    iShard, nShards = parseShard(args.shard)
+    pairs = readPairs(args.fpairs, args.dataDir)
+    iPairs = shardPairs(orderPairs(pairs), iShard, nShards)
+
+    params = dict(fpairs=os.path.realpath(args.fpairs), shard=args.shard,
+                  binSize=args.binSize, h=args.h, dBPMax=args.dBPMax,
+                  bDownSample=args.bDownSample, chrNames=args.chrNames,
+                  excludeChr=sorted(args.excludeChr),
+                  precision=args.precision)
+    if args.ladder:
+        # only recorded when set so that earlier checkpoints stay valid
+        params['ladder'] = True
+    fcheckpoint = args.checkpoint
+    if fcheckpoint is None:
+        fcheckpoint = args.fout + ".checkpoint.tsv"
+    with CheckpointStore(fcheckpoint, params) as store:
+        results = runBatch(pairs, iPairs, store, args.binSize, args.h,
+                           args.dBPMax, args.bDownSample, chrNames, excludeChr,
+                           cacheFromArgs(args), args.nWorkers,
+                           np.dtype(args.precision), args.ladder)
+
+    with open(args.fout, 'w') as f:
+        f.write(header)
+        f.write("#fmcool1\tfmcool2\tchrom\tscc\n")
+        for fmcool1, fmcool2, chrNamesPair, scc in results:
+            for chrName, value in zip(chrNamesPair, scc):
+                f.write(f"{fmcool1}\t{fmcool2}\t{chrName}\t{value:.15e}\n")
+
+
+def mainWindows(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compute SCC scores over sliding genomic windows along\
+        each chromosome and write them as a bedGraph track")
+    parser.add_argument("fmcool1", type=str,
+                        help="First cooler multiple-binsize contact files")
+    parser.add_argument("fmcool2", type=str,
+                        help="Second cooler multiple-binsize contact files")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this bedGraph file with one\
+                        line per window with the chromosome name, start, end\
+                        and scc score of the window, which overlap if\
+                        --stepBP is less than --windowBP. Windows without\
+                        contacts are skipped")
+    addSCCArgs(parser)
+    parser.add_argument("--windowBP", type=int, default=2000000,
+                        help="Size of the windows in bp, rounded to the\
+                        nearest multiple of the bin size. Default to 2000000")
+    parser.add_argument("--stepBP", type=int, default=250000,
+                        help="Distance between the starts of consecutive\
+                        windows in bp, rounded to the nearest multiple of the\
+                        bin size. Default to 250000")
+
+    args = parser.parse_args()
+
+    assert args.windowBP > 0 and args.stepBP > 0,\
+        "Please provide positive --windowBP and --stepBP"
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.hicrep import hicrepSCCWindows, checkCoolers
+
+    np.random.seed(10)
+
+    cool1, binSize1 = readMcool(args.fmcool1, args.binSize)
+    cool2, binSize2 = readMcool(args.fmcool2, args.binSize)
+
+    # the windows move by whole bins
+    binSize = checkCoolers(cool1, cool2)
+    windowBP, stepBP = [max(round(bp / binSize), 1) * binSize
+                        for bp in (args.windowBP, args.stepBP)]
+    if (windowBP, stepBP) != (args.windowBP, args.stepBP):
+        warnings.warn(f"--windowBP {args.windowBP} and --stepBP {args.stepBP}"
+                      f" are rounded to {windowBP} and {stepBP}, the nearest "
+                      f"multiples of the bin size {binSize}")
+    header += f"# @windowBP {windowBP}\n# @stepBP {stepBP}\n"
+
+    results = hicrepSCCWindows(cool1, cool2, args.h, args.dBPMax,
+                               args.bDownSample, windowBP, stepBP,
+                               chrNames, excludeChr, cacheFromArgs(args))
+
+    with open(args.fout, 'w') as f:
+        # genome browsers expect the track line first
+        f.write(f"track type=bedGraph name=\"hicrep SCC\" description=\"SCC in"
+                f" {windowBP} bp windows every {stepBP} bp\"\n")
+        f.write(header)
+        for chrName, starts, ends, scc in results:
+            for start, end, value in zip(starts, ends, scc):
+                if np.isfinite(value):
+                    f.write(f"{chrName}\t{start}\t{end}\t{value:.6f}\n")
+
+
+def mainServer(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Serve SCC scores between a set of Cooler files over HTTP\
+        on localhost, reading and smoothing each input only once and keeping\
+        the smoothed contact matrices in memory. See hicrep.server for the\
+        requests")
+    parser.add_argument("fmcools", type=str, nargs='+',
+                        help="Cooler multiple-binsize contact files, optionally\
+                        named as name=file. The sample names default to the\
+                        file names without extension")
+    addSCCArgs(parser)
+    addPrecisionArgs(parser)
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="Address to listen on. Default to 127.0.0.1, i.e.,\
+                        only local connections")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port to listen on. Default to 8765")
+    parser.add_argument("--memoryGB", type=float, default=None,
+                        help="Evict the least recently used smoothed contact\
+                        matrices from memory when they take more than this\
+                        many GB. Default to no limit")
+    parser.add_argument("--nWorkers", type=int, default=4,
+                        help="Number of threads computing the SCC scores.\
+                        Default to 4")
+    parser.add_argument("--preload", action='store_true', default=False,
+                        help="Read and smooth all the inputs before serving\
+                        instead of on the first request of each")
+
+    args = parser.parse_args()
+
+    assert not args.bDownSample,\
+        "--bDownSample is not supported as it depends on the pair of inputs"
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    names, fnames = parseNamedFiles(args.fmcools)
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.server import SCCServer, serve
+
+    cools = {name: readMcool(fname, args.binSize)[0]
+             for name, fname in zip(names, fnames)}
+    maxBytes = None if args.memoryGB is None else int(args.memoryGB * 2**30)
+    scc = SCCServer(cools, args.h, args.dBPMax, chrNames, excludeChr,
+                    maxBytes, args.nWorkers, cacheFromArgs(args),
+                    np.dtype(args.precision))
+    if args.preload:
+        scc.preload()
+    httpd = serve(scc, args.host, args.port)
+    print(f"Serving {len(cools)} samples on "
+          f"http://{httpd.server_address[0]}:{httpd.server_address[1]}",
+          file=sys.stderr, flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        scc.close()
+
+
+def mainIndex(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build an index of the smoothed contact matrices of a\
+        library of reference Cooler files, against which hicrep-query scores a\
+        new sample without reading the references again")
+    parser.add_argument("findex", type=str,
+                        help="Output index file")
+    parser.add_argument("fmcools", type=str, nargs='+',
+                        help="Reference cooler multiple-binsize contact files,\
+                        optionally named as name=file. The reference names\
+                        default to the file names without extension")
+    addSCCArgs(parser)
+    addPrecisionArgs(parser)
+
+    args = parser.parse_args()
+
+    assert not args.bDownSample,\
+        "--bDownSample is not supported as it depends on the pair of inputs"
+
+    chrNames, excludeChr = checkChrArgs(args)
+
+    names, fnames = parseNamedFiles(args.fmcools)
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.index import buildReferenceIndex
+
+    cools = {name: readMcool(fname, args.binSize)[0]
+             for name, fname in zip(names, fnames)}
+    buildReferenceIndex(args.findex, cools, args.h, args.dBPMax, chrNames,
+                        excludeChr, cacheFromArgs(args),
+                        np.dtype(args.precision))
+
+
+def mainQuery(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Find the references of an index built by hicrep-index\
+        that are the most similar to a sample by their SCC scores")
+    parser.add_argument("findex", type=str,
+                        help="Index file built by hicrep-index")
+    parser.add_argument("fmcool", type=str,
+                        help="Query cooler multiple-binsize contact file")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one line per reference from the most similar with its\
+                        rank, name, mean SCC score over the chromosomes and\
+                        the SCC score of each chromosome")
+    parser.add_argument("--topK", type=int, default=10,
+                        help="Number of references to report. Default to 10")
+    parser.add_argument("--chrNames", type=str, nargs='*', default=[],
+                        help="Only score this subset of the indexed\
+                        chromosomes. Default to all of them")
+    addCacheArgs(parser)
+
+    args = parser.parse_args()
+
+    assert args.topK > 0, "Please provide a positive --topK"
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import cooler
+    from hicrep.utils import readMcool
+    from hicrep.index import ReferenceIndex
+
+    index = ReferenceIndex(args.findex)
+    # the bin size of the index selects the resolution of an mcool query
+    binSize = index.binSize if cooler.fileops.is_multires_file(args.fmcool)\
+        else -1
+    cool, _ = readMcool(args.fmcool, binSize)
+    chrNames = args.chrNames if len(args.chrNames) > 0 else index.chrNames
+    results = index.query(cool, args.topK, chrNames, cacheFromArgs(args))
+
+    with open(args.fout, 'w') as f:
+        f.write(header)
+        f.write("#rank\treference\tmeanSCC\t" + "\t".join(chrNames) + "\n")
+        for rank, (name, meanScc, scc) in enumerate(results, 1):
+            f.write(f"{rank}\t{name}\t{meanScc:.15e}\t" +
+                    "\t".join(f"{value:.15e}" for value in scc) + "\n")
+
+
+def mainBootstrap(*args):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Estimate the mean, standard deviation and percentile\
+        confidence interval of the SCC score of each chromosome from bootstrap\
+        replicates of the contacts of both inputs, which are drawn, smoothed\
+        and scored together in one pass over the inputs")
+    parser.add_argument("fmcool1", type=str,
+                        help="First cooler multiple-binsize contact files")
+    parser.add_argument("fmcool2", type=str,
+                        help="Second cooler multiple-binsize contact files")
+    parser.add_argument("fout", type=str,
+                        help="Output results to this file. Output format would be\
+                        one line per chromosome with its name, the mean and\
+                        standard deviation of the SCC scores of the replicates\
+                        and the bounds of their confidence interval")
+    addSCCArgs(parser)
+    parser.add_argument("--nReplicates", type=int, default=100,
+                        help="Number of bootstrap replicates. Default to 100")
+    parser.add_argument("--ci", type=float, default=0.95,
+                        help="Coverage of the percentile confidence interval.\
+                        Default to 0.95")
+    parser.add_argument("--seed", type=int, default=10,
+                        help="Seed of the random number generator. Default to\
+                        10")
+    parser.add_argument("--replicates", action='store_true', default=False,
+                        help="Also write the SCC score of every replicate to\
+                        fout.replicates.txt with one row per chromosome")
+    addPrecisionArgs(parser)
+
+    args = parser.parse_args()
+
+    assert args.nReplicates > 1, "Please provide at least 2 --nReplicates"
+    assert 0 < args.ci < 1, "Please provide --ci between 0 and 1"
+    assert args.cacheDir is None,\
+        "--cacheDir is not used as the replicates are drawn from the contacts"
+    chrNames, excludeChr = checkChrArgs(args)
+
+    header = provenanceHeader()
+
+    # import the numerical modules only once the arguments are validated so
+    # that --help and invalid arguments return immediately
+    import numpy as np
+    from hicrep.utils import readMcool
+    from hicrep.hicrep import (
+        hicrepSCCBootstrap, bootstrapSummary, selectChrNames
+        )
+
+    cool1, binSize1 = readMcool(args.fmcool1, args.binSize)
+    cool2, binSize2 = readMcool(args.fmcool2, args.binSize)
+
+    scc = hicrepSCCBootstrap(cool1, cool2, args.h, args.dBPMax,
+                             args.bDownSample, args.nReplicates, chrNames,
+                             excludeChr, np.random.default_rng(args.seed),
+                             np.dtype(args.precision))
+    mean, sd, lo, hi = bootstrapSummary(scc, args.ci)
+
+    chrNamesOut = selectChrNames(cool1, chrNames, excludeChr)
+    with open(args.fout, 'w') as f:
+        f.write(header)
+        f.write(f"#chrom\tmean\tsd\tci{args.ci:g}Low\tci{args.ci:g}High\n")
+        for row in zip(chrNamesOut, mean, sd, lo, hi):
+            f.write(row[0] + "".join(f"\t{value:.15e}" for value in row[1:])
+                    + "\n")
+    if args.replicates:
+        np.savetxt(args.fout + ".replicates.txt", scc, "%30.15e",
+                   header=header + "rows: " + " ".join(chrNamesOut))
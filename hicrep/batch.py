@@ -0,0 +1,348 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: batch.py
+# Description: Sharded and resumable SCC scoring of a list of pairs of Cooler
+# files with per-chromosome checkpoints
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+import json
+import glob
+from collections import OrderedDict
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.cache import BandCache
+from hicrep.hicrep import hicrepSCC, selectChrNames
+
+# Seed of the per-pair random number generators used for down sampling, as in
+# the single pair command line tool
+BATCH_SEED = 10
+
+# Number of input files runBatch keeps open, i.e., those of the current and
+# the previous pair, so that consecutive pairs sharing a file don't reopen it
+BATCH_OPEN_COOLERS = 4
+
+
+def readSampleSheet(fsheet: str, dataDir: str = None):
+    """Read the input files listed in a 4DN metadata sample sheet such as
+    tests/data/fly_hi-c/metadata_*.tsv. Each file is looked up by its
+    accession in `dataDir`, i.e., the first file sorted by name that starts
+    with the accession and ends with .cool or .mcool
+
+    Args:
+        fsheet: `str` Sample sheet file name
+        dataDir: `str` Directory of the input files. Default to None, meaning
+        the directory of the sample sheet
+
+    Returns:
+        `list` of `str` input file names in the order of the sample sheet
+    """
+    if dataDir is None:
+        dataDir = os.path.dirname(fsheet)
+    fnames = []
+    header = None
+    with open(fsheet) as f:
+        for line in f:
+            if line.startswith('#') or len(line.strip()) == 0:
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if header is None:
+                header = fields
+                assert 'File Accession' in header,\
+                    f"Sample sheet {fsheet} has no 'File Accession' column"
+                iAcc = header.index('File Accession')
+                continue
+            if len(fields) <= iAcc:
+                continue
+            acc = fields[iAcc].strip()
+            matches = sorted(
+                m for ext in ['cool', 'mcool']
+                for m in glob.glob(os.path.join(dataDir, f"{acc}*.{ext}")))
+            assert len(matches) > 0,\
+                f"No .cool or .mcool file of {acc} is found in {dataDir}"
+            fnames.append(matches[0])
+    return fnames
+
+
+def readPairs(fpairs: str, dataDir: str = None):
+    """Read the pairs of input files to score from either a tab-separated file
+    with two file names per line or a 4DN metadata sample sheet, in which case
+    all pairs of the listed files are scored. Empty lines and lines starting
+    with '#' are ignored
+
+    Args:
+        fpairs: `str` Pair list or sample sheet file name
+        dataDir: `str` Directory of the input files listed in a sample sheet.
+        Default to None, meaning the directory of the sample sheet
+
+    Returns:
+        `list` of `tuple` of two `str` input file names
+    """
+    with open(fpairs) as f:
+        lines = [line.rstrip("\n") for line in f
+                 if not line.startswith('#') and len(line.strip()) > 0]
+    if len(lines) > 0 and 'File Accession' in lines[0].split("\t"):
+        fnames = readSampleSheet(fpairs, dataDir)
+        return [(fnames[i], fnames[j]) for i in range(len(fnames))
+                for j in range(i + 1, len(fnames))]
+    pairs = []
+    for line in lines:
+        fields = line.split("\t")
+        assert len(fields) == 2,\
+            f"Expect 2 tab-separated file names per line in {fpairs} but "\
+            f"got '{line}'"
+        pairs.append((fields[0], fields[1]))
+    return pairs
+
+
+def orderPairs(pairs: list):
+    """Order the pairs so that the pairs sharing an input file run next to
+    each other, so that its cached bands and metadata are reused while they're
+    still hot. Starting from the first pair, the next pair is one not yet
+    ordered that shares a file with the current pair, preferring its second
+    file, or else the first pair not yet ordered
+
+    Args:
+        pairs: `list` of `tuple` of two `str` input file names
+
+    Returns:
+        `list` of `int` indices of the pairs in their new order
+    """
+    byFile = {}
+    for iPair, pair in enumerate(pairs):
+        for fname in pair:
+            byFile.setdefault(fname, []).append(iPair)
+    bDone = np.zeros(len(pairs), dtype=bool)
+    # position of the first pair not yet done in each list of byFile
+    nextOf = dict.fromkeys(byFile, 0)
+
+    def nextPair(fname):
+        iPairs = byFile[fname]
+        while nextOf[fname] < len(iPairs) and bDone[iPairs[nextOf[fname]]]:
+            nextOf[fname] += 1
+        return iPairs[nextOf[fname]] if nextOf[fname] < len(iPairs) else None
+
+    order = []
+    iFirst = 0
+    iPair = None
+    while len(order) < len(pairs):
+        if iPair is None:
+            while bDone[iFirst]:
+                iFirst += 1
+            iPair = iFirst
+        bDone[iPair] = True
+        order.append(iPair)
+        f1, f2 = pairs[iPair]
+        iPair = nextPair(f2)
+        if iPair is None:
+            iPair = nextPair(f1)
+    return order
+
+
+def parseShard(shard: str):
+    """Parse a shard specification 'i/N', meaning the i-th of N shards
+    counting from 0
+
+    Args:
+        shard: `str` shard specification
+
+    Returns:
+        `tuple` of `int` index of the shard and number of shards
+    """
+    fields = shard.split('/')
+    assert len(fields) == 2 and all(x.isdigit() for x in fields),\
+        f"Expect the shard as i/N but got '{shard}'"
+    iShard, nShards = int(fields[0]), int(fields[1])
+    assert 0 <= iShard < nShards,\
+        f"Expect the shard as i/N with 0 <= i < N but got '{shard}'"
+    return iShard, nShards
+
+
+def shardPairs(order: list, iShard: int, nShards: int):
+    """Split the ordered pairs into `nShards` contiguous shards of nearly
+    equal size, so that the pairs sharing an input file mostly stay in the
+    same shard, and return the i-th one
+
+    Args:
+        order: `list` of indices of the pairs as returned by `orderPairs`
+        iShard: `int` index of the shard counting from 0
+        nShards: `int` number of shards
+
+    Returns:
+        `list` of `int` indices of the pairs in the shard
+    """
+    start = iShard * len(order) // nShards
+    stop = (iShard + 1) * len(order) // nShards
+    return order[start:stop]
+
+
+class CheckpointStore:
+    """Append-only tab-separated file of the scc score of each chromosome of
+    each pair as soon as it's computed, so that a restarted batch skips the
+    chromosomes already done. The first line records the parameters of the
+    batch and a restart with different parameters is refused. A line cut
+    short by a crash is ignored
+
+    Attributes:
+        fname: `str` Checkpoint file name
+        params: `dict` Parameters of the batch
+        results: `dict` mapping each pair of input file names to a `dict` of
+        the scc score of each chromosome done
+    """
+
+    def __init__(self, fname: str, params: dict):
+        self.fname = fname
+        self.params = params
+        self.results = {}
+        bNewline = False
+        if os.path.isfile(fname) and os.path.getsize(fname) > 0:
+            with open(fname) as f:
+                lines = f.read().split("\n")
+            assert lines[0] == self.paramsLine(),\
+                f"Checkpoint {fname} was written with different parameters: "\
+                f"{lines[0]}"
+            # the last element is empty unless the last line is cut short
+            bNewline = len(lines[-1]) > 0
+            for line in lines[1:-1]:
+                fields = line.split("\t")
+                if len(fields) != 4:
+                    continue
+                self.results.setdefault((fields[0], fields[1]), {})[fields[2]] =\
+                    float(fields[3])
+            self.file = open(fname, 'a')
+            if bNewline:
+                self.file.write("\n")
+        else:
+            self.file = open(fname, 'w')
+            self.file.write(self.paramsLine() + "\n")
+        self.sync()
+
+    def paramsLine(self):
+        """Return the first line of the checkpoint file"""
+        return "# @params " + json.dumps(self.params, sort_keys=True)
+
+    def done(self, fmcool1: str, fmcool2: str):
+        """Return the scc scores of the chromosomes of a pair already done
+
+        Args:
+            fmcool1: `str` First input file name
+            fmcool2: `str` Second input file name
+
+        Returns:
+            `dict` mapping chromosome names to scc scores
+        """
+        return self.results.get((fmcool1, fmcool2), {})
+
+    def append(self, fmcool1: str, fmcool2: str, chrName: str, scc: float):
+        """Record the scc score of one chromosome of a pair and flush it to
+        disk
+
+        Args:
+            fmcool1: `str` First input file name
+            fmcool2: `str` Second input file name
+            chrName: `str` Chromosome name
+            scc: `float` scc score
+        """
+        self.results.setdefault((fmcool1, fmcool2), {})[chrName] = float(scc)
+        self.file.write(f"{fmcool1}\t{fmcool2}\t{chrName}\t{float(scc)!r}\n")
+        self.sync()
+
+    def sync(self):
+        """Flush the checkpoint file to disk"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def runBatch(pairs: list, iPairs: list, store: CheckpointStore, binSize: int,
+             h: int, dBPMax: int, bDownSample: bool, chrNames: list = None,
+             excludeChr: set = None, cache: BandCache = None,
+             nWorkers: int = 1, dtype=np.float64, bLadder: bool = False):
+    """Compute the scc scores of a list of pairs of input files, skipping the
+    chromosomes already recorded in the checkpoint store and recording the
+    others as soon as they're computed
+
+    Args:
+        pairs: `list` of `tuple` of two `str` input file names
+        iPairs: `list` of `int` indices of the pairs to compute in this order,
+        e.g., as returned by `shardPairs`
+        store: `CheckpointStore` Checkpoint of the chromosomes done
+        binSize: `int` Bin size to read from the input mcool files or -1 for
+        single-binsize .cool files
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input. Each pair draws
+        from its own random number generator seeded by its index in `pairs`,
+        so the results don't depend on the sharding, but the chromosomes
+        computed after a restart get different random draws
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes
+        excludeChr: `set` Set of chromosome names to exclude. Default to None
+        cache: `BandCache` On-disk cache of the smoothed bands. Default to None
+        nWorkers: `int` Number of worker processes that compute the
+        chromosomes of a pair in parallel. Default to 1
+        dtype: Data type in which the contact matrices are normalized,
+        smoothed and stored. Default to np.float64
+        bLadder: `bool` With bDownSample, score each pair at the deepest
+        level of the down sampling ladders common to both inputs, see
+        `hicrepSCC`, so that each input is thinned and smoothed once per level
+        across the pairs when a cache is given. The results then don't depend
+        on the random number generators of the pairs. Default to False
+
+    Returns:
+        `list` of `tuple` of the two input file names, the `list` of
+        chromosome names and `np.ndarray` of their scc scores of each pair in
+        the order of `iPairs`
+    """
+    # the least recently used input files are closed so that the number of
+    # open files doesn't grow with the number of inputs
+    cools = OrderedDict()
+
+    def openCooler(fname):
+        if fname in cools:
+            cools.move_to_end(fname)
+        else:
+            cools[fname] = readMcool(fname, binSize)[0]
+            while len(cools) > BATCH_OPEN_COOLERS:
+                _, cool = cools.popitem(last=False)
+                cool.store.close()
+        return cools[fname]
+
+    results = []
+    try:
+        for iPair in iPairs:
+            fmcool1, fmcool2 = pairs[iPair]
+            cool1 = openCooler(fmcool1)
+            cool2 = openCooler(fmcool2)
+            chrNamesPair = list(selectChrNames(cool1, chrNames, excludeChr))
+            done = store.done(fmcool1, fmcool2)
+            todo = [chrName for chrName in chrNamesPair if chrName not in done]
+            if len(todo) > 0:
+                hicrepSCC(cool1, cool2, h, dBPMax, bDownSample, todo,
+                          nWorkers=nWorkers, cache=cache, dtype=dtype,
+                          bLadder=bLadder,
+                          rng=np.random.default_rng([BATCH_SEED, iPair]),
+                          onChr=lambda chrName, scc:
+                          store.append(fmcool1, fmcool2, chrName, scc))
+            done = store.done(fmcool1, fmcool2)
+            results.append((fmcool1, fmcool2, chrNamesPair,
+                            np.array([done[chrName]
+                                      for chrName in chrNamesPair])))
+    finally:
+        for cool in cools.values():
+            cool.store.close()
+    return results
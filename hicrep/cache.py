@@ -0,0 +1,178 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: cache.py
+# Description: Persistent on-disk cache of smoothed per-chromosome DiagBand
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import cooler
+from hicrep.utils import DiagBand
+
+# Bump this whenever the content of the cached bands changes for the same
+# input and parameters so that the stale entries are never hit
+CACHE_VERSION = 1
+
+
+def atomicWrite(fout: str, write):
+    """Write to a temporary file in the same directory as the output and move
+    it to the output, so that concurrent readers never see partial files
+
+    Args:
+        fout: `str` Output file name
+        write: callable taking the opened temporary file object
+    """
+    fd, ftmp = tempfile.mkstemp(dir=os.path.dirname(fout),
+                                prefix=".tmp-", suffix=os.path.basename(fout))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(ftmp, fout)
+    except BaseException:
+        os.unlink(ftmp)
+        raise
+
+
+class BandCache:
+    """Directory of smoothed and normalized per-chromosome `DiagBand`s stored
+    as .npy files that are memory-mapped when read back. Each entry is keyed
+    by the content hash of the Cooler file, the Cooler group (resolution), the
+    chromosome and all the parameters that determine the band. When the total
+    size of the entries exceeds `maxBytes`, the least recently used entries are
+    evicted
+
+    Attributes:
+        cacheDir: `str` Directory of the cache
+        maxBytes: `int` Maximal total size of the cached bands in bytes. None
+        means no limit
+    """
+
+    def __init__(self, cacheDir: str, maxBytes: int = None):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        os.makedirs(cacheDir, exist_ok=True)
+        self.fileHashes = {}
+
+    def fileHash(self, fname: str):
+        """Return the sha256 hash of the content of a file. The hash is
+        memoized on disk by the file's path, size and modification time so
+        that each file is only read through once
+
+        Args:
+            fname: `str` Input file name
+
+        Returns:
+            `str` hex digest of the file content
+        """
+        fname = os.path.realpath(fname)
+        stat = os.stat(fname)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        if self.fileHashes.get(fname, (None, None))[0] == stamp:
+            return self.fileHashes[fname][1]
+        fmemo = os.path.join(
+            self.cacheDir,
+            "hash-" + hashlib.sha1(fname.encode('utf-8')).hexdigest() + ".json")
+        digest = None
+        if os.path.exists(fmemo):
+            with open(fmemo, 'r') as f:
+                memo = json.load(f)
+            if memo['stamp'] == stamp:
+                digest = memo['sha256']
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(fname, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 24), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            atomicWrite(fmemo, lambda f: f.write(json.dumps(
+                {'file': fname, 'stamp': stamp, 'sha256': digest}).encode('utf-8')))
+        self.fileHashes[fname] = (stamp, digest)
+        return digest
+
+    def key(self, cool: cooler.api.Cooler, chrName: str, h: int, dMax: int,
+            norm: str, dtype=np.float64):
+        """Build the key of a smoothed band
+
+        Args:
+            cool: `cooler.api.Cooler` Input Cooler contact matrix
+            chrName: `str` Name of the chromosome
+            h: `int` Half-size of the mean filter
+            dMax: `int` Exclusive upper bound of the diagonal index
+            norm: `str` Name of the normalization applied to the band
+            dtype: Data type of the band
+
+        Returns:
+            `str` key of the band
+        """
+        # numpy integers, e.g., a dMax derived from the bin size, would be
+        # serialized differently from python ones
+        fields = [CACHE_VERSION, self.fileHash(cool.filename), cool.root,
+                  cool.binsize, chrName, int(h), int(dMax), norm,
+                  np.dtype(dtype).str]
+        return hashlib.sha256(json.dumps(fields, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached band of the key as a read-only memory-mapped
+        `DiagBand` or None if the key is not in the cache
+
+        Args:
+            key: `str` key of the band
+
+        Returns:
+            `DiagBand` or None
+        """
+        fdata = os.path.join(self.cacheDir, key + ".npy")
+        try:
+            with open(os.path.join(self.cacheDir, key + ".json"), 'r') as f:
+                meta = json.load(f)
+            data = np.load(fdata, mmap_mode='r')
+            # mark as recently used
+            os.utime(fdata)
+        except (FileNotFoundError, ValueError):
+            return None
+        return DiagBand(data, meta['diagOffset'], meta['binOffset'])
+
+    def put(self, key: str, band: DiagBand):
+        """Store a band in the cache and evict the least recently used entries
+        if the cache grows beyond `maxBytes`
+
+        Args:
+            key: `str` key of the band
+            band: `DiagBand` band to store
+        """
+        fdata = os.path.join(self.cacheDir, key + ".npy")
+        fmeta = os.path.join(self.cacheDir, key + ".json")
+        atomicWrite(fdata, lambda f: np.save(f, band.data))
+        atomicWrite(fmeta, lambda f: f.write(json.dumps(
+            {'diagOffset': int(band.diagOffset),
+             'binOffset': int(band.binOffset)}).encode('utf-8')))
+        if self.maxBytes is not None:
+            self.evict(self.maxBytes)
+
+    def evict(self, maxBytes: int):
+        """Remove the least recently used bands until their total size is at
+        most `maxBytes`
+
+        Args:
+            maxBytes: `int` Maximal total size of the cached bands in bytes
+        """
+        entries = []
+        for entry in os.scandir(self.cacheDir):
+            if entry.name.endswith(".npy") and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        totalBytes = sum(size for _, size, _ in entries)
+        for _, size, fdata in sorted(entries):
+            if totalBytes <= maxBytes:
+                break
+            for fname in (fdata, fdata[:-len(".npy")] + ".json"):
+                try:
+                    os.unlink(fname)
+                except FileNotFoundError:
+                    pass
+            totalBytes -= size
@@ -9,11 +9,13 @@
 # The algorithm first normalizes the input contact matrices by the total
 # number of contacts and then for each chromosome: 1) mean-filter the input
 # matrices with an input window size; 2) exclude common zero entries in
-# the input matrices; 3) compute the SCC score. It doesn't have the
-# procedure to bootstrap the window-size parameter
+# the input matrices; 3) compute the SCC score. The window-size parameter
+# can be trained with hicrepSCCByH and selectH
 #
 # Distributed under terms of the GNU General Public License v3.0.
 import os
+import zlib
+from typing import Union
 from deprecated import deprecated
 import numpy as np
 import scipy.sparse as sp
@@ -21,12 +23,48 @@ import math
 import sys
 import warnings
 import cooler
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from hicrep.cache import BandCache
+from hicrep.profiler import StageProfiler, profileStage
+from hicrep.prefetch import Prefetcher
+# readMcool, cool2pixels, getSubCoo, trimDiags, meanFilterSparse, resample,
+# upperDiagCsr and getSubBand are not used here but remain importable from
+# hicrep.hicrep
 from hicrep.utils import (
     readMcool, cool2pixels, getSubCoo,
     trimDiags, meanFilterSparse, varVstran,
-    resample, upperDiagCsr, coolerInfo
+    resample, upperDiagCsr, coolerInfo,
+    DiagBand, getSubBand, streamSubBand, meanFilterBand, resampleBand,
+    meanFilterBandRange, coarsenBand, CisPixels, coolerMemoized,
+    coolerDatasetHash, thinBand, resampleBandReplicates,
+    meanFilterDiags
     )
 
+
+# diagStatsCoo scatters the elements into dense diagonal-major arrays instead
+# of matching them by sorted keys if the arrays have at most this many
+# elements per input non-zero element
+DENSE_DIAG_STATS_RATIO = 2
+
+# Number of elements of the inputs of diagStatsDense converted to float64 at a
+# time when they're of lower precision
+DIAG_STATS_BLOCK = 1 << 20
+
+# Maximal number of elements of the stacked bootstrap replicates of one input
+# smoothed and scored at a time by sccOfChrBootstrap
+BOOTSTRAP_BLOCK = 1 << 24
+
+# sccByBandWindows sums the statistics of a window from scratch instead of
+# updating them once the windows moved by this many window sizes since they
+# were last summed, so that the cost is at most doubled
+WINDOW_RESUM = 1
+
+# Seed of the binomial thinning of the down sampling ladder, which must be the
+# same for every pair so that the levels of an input can be reused
+LADDER_SEED = 10
+
+
 @deprecated("Use sccByDiag instead")
 def sccOfDiag(diag1: np.ndarray, diag2: np.ndarray):
     """Get the correlation coefficient and weight of two input
@@ -54,32 +92,204 @@ def sccOfDiag(diag1: np.ndarray, diag2: np.ndarray):
         return (np.nan, np.nan)
     return (rho, ws)
 
-def sccByDiag(m1: sp.coo_matrix, m2: sp.coo_matrix, nDiags: int):
+def sccByDiag(m1: Union[sp.coo_matrix, DiagBand],
+              m2: Union[sp.coo_matrix, DiagBand], nDiags: int):
     """Compute diagonal-wise hicrep SCC score for the two input matrices up to
     nDiags diagonals
 
 
     Args:
-        m1 (sp.coo_matrix): input contact matrix 1
-        m2 (sp.coo_matrix): input contact matrix 2
+        m1 (Union[sp.coo_matrix, DiagBand]): input contact matrix 1
+        m2 (Union[sp.coo_matrix, DiagBand]): input contact matrix 2
         nDiags (int): compute SCC scores for diagonals whose index is in the
         range of [1, nDiags)
     Returns: `float` hicrep SCC scores
     """
-    # convert each diagonal to one row of a csr_matrix in order to compute
-    # diagonal-wise correlation between m1 and m2
-    m1D = upperDiagCsr(m1, nDiags)
-    m2D = upperDiagCsr(m2, nDiags)
-    nSamplesD = (m1D + m2D).getnnz(axis=1)
-    rowSumM1D = m1D.sum(axis=1).A1
-    rowSumM2D = m2D.sum(axis=1).A1
+    if isinstance(m1, DiagBand):
+        return sccByBand(m1, m2, nDiags)
+    assert m1.shape == m2.shape,\
+        "sccByDiag input matrices have different shapes"
+    return sccFromDiagStats(*diagStatsCoo(m1, m2, nDiags))
+
+
+def diagEntries(m: sp.coo_matrix, nDiags: int):
+    """Select the elements of the input matrix on the diagonals in
+    [1, nDiags)
+
+    Args:
+        m (sp.coo_matrix): input matrix
+        nDiags (int): select diagonals with index in the range [1, nDiags)
+    Returns: tuple of 3 `np.ndarray`, the diagonal index minus one, the row
+    index and the value of each selected element
+    """
+    diag = m.col - m.row
+    sel = (diag > 0) & (diag < nDiags)
+    if sel.all():
+        # avoid copying when everything is on the selected diagonals, which is
+        # the case of the output of meanFilterSparse
+        return diag.astype(np.int64) - 1, m.row, m.data
+    idx = np.flatnonzero(sel)
+    return diag[idx].astype(np.int64) - 1, m.row[idx], m.data[idx]
+
+
+def diagStatsDense(x: np.ndarray, y: np.ndarray):
+    """Compute the per-diagonal sufficient statistics needed by
+    `sccFromDiagStats` from two dense arrays each of whose rows is one
+    diagonal. Any trailing axes after the bins, e.g., replicates, are kept in
+    the outputs. The sums are always accumulated in float64; inputs of lower
+    precision are converted a block of diagonals at a time
+
+    Args:
+        x (np.ndarray): diagonals of input matrix 1 as rows
+        y (np.ndarray): diagonals of input matrix 2 as rows
+    Returns: tuple of 6 `np.ndarray` with one element per row (and trailing
+    index), the number of elements that are non-zero in either input, sum of
+    x, sum of y, sum of squares of x, sum of squares of y and sum of x * y
+    """
+    if (x.dtype != np.float64 or y.dtype != np.float64) and x.shape[0] > 0:
+        step = max(DIAG_STATS_BLOCK // max(int(np.prod(x.shape[1:])), 1), 1)
+        stats = [diagStatsDense(x[i:(i + step)].astype(np.float64),
+                                y[i:(i + step)].astype(np.float64))
+                 for i in range(0, x.shape[0], step)]
+        return tuple(np.concatenate(stat) for stat in zip(*stats))
+    return (np.count_nonzero((x != 0) | (y != 0), axis=1),
+            x.sum(axis=1), y.sum(axis=1),
+            np.einsum('ij...,ij...->i...', x, x),
+            np.einsum('ij...,ij...->i...', y, y),
+            np.einsum('ij...,ij...->i...', x, y))
+
+
+def diagStatsSorted(diag1: np.ndarray, key1: np.ndarray, x: np.ndarray,
+                    diag2: np.ndarray, key2: np.ndarray, y: np.ndarray,
+                    nDiags: int):
+    """Compute the per-diagonal sufficient statistics needed by
+    `sccFromDiagStats` from the non-zero elements of two input matrices by
+    merging their sorted keys, without building any intermediate sparse
+    matrix
+
+    Args:
+        diag1 (np.ndarray): diagonal index minus one of each element of x
+        key1 (np.ndarray): unique sorted key of each element of x
+        x (np.ndarray): non-zero values of input matrix 1
+        diag2 (np.ndarray): diagonal index minus one of each element of y
+        key2 (np.ndarray): unique key of each element of y
+        y (np.ndarray): non-zero values of input matrix 2
+        nDiags (int): the diagonal indices are in [1, nDiags)
+    Returns: tuple of 6 `np.ndarray` of length nDiags - 1 as returned by
+    `diagStatsDense`
+    """
+    nD = max(nDiags - 1, 0)
+    # match the elements present in both inputs
+    if key1.size:
+        pos = np.minimum(np.searchsorted(key1, key2), key1.size - 1)
+        both = np.flatnonzero(key1[pos] == key2)
+        pos = pos[both]
+    else:
+        pos = both = np.empty(0, dtype=np.int64)
+    diagBoth = diag2[both]
+    return (np.bincount(diag1, minlength=nD) +
+            np.bincount(diag2, minlength=nD) -
+            np.bincount(diagBoth, minlength=nD),
+            np.bincount(diag1, weights=x, minlength=nD),
+            np.bincount(diag2, weights=y, minlength=nD),
+            np.bincount(diag1, weights=np.square(x), minlength=nD),
+            np.bincount(diag2, weights=np.square(y), minlength=nD),
+            np.bincount(diagBoth, weights=x[pos] * y[both], minlength=nD))
+
+
+def sortUniqueEntries(diag: np.ndarray, key: np.ndarray, values: np.ndarray):
+    """Sort the elements of a matrix by key, sum the duplicated ones and drop
+    the zeros
+
+    Args:
+        diag (np.ndarray): diagonal index minus one of each element
+        key (np.ndarray): key of each element
+        values (np.ndarray): value of each element
+    Returns: tuple of 3 `np.ndarray`, the input arrays with unique sorted keys
+    """
+    if np.any(key[1:] <= key[:-1]):
+        order = np.argsort(key, kind='stable')
+        key = key[order]
+        diag = diag[order]
+        values = values[order]
+        iStart = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+        if iStart.size < key.size:
+            values = np.add.reduceat(values, iStart)
+            key = key[iStart]
+            diag = diag[iStart]
+    if not values.all():
+        idx = np.flatnonzero(values)
+        return diag[idx], key[idx], values[idx]
+    return diag, key, values
+
+
+def diagStatsCoo(m1: sp.coo_matrix, m2: sp.coo_matrix, nDiags: int):
+    """Compute the per-diagonal sufficient statistics needed by
+    `sccFromDiagStats` of two input sp.coo_matrix on diagonals in [1, nDiags)
+    in one pass over their elements. If the diagonals are densely populated,
+    as is the case after smoothing, the elements are scattered into two
+    diagonal-major dense arrays; otherwise the elements are matched by
+    sorted keys. Duplicated elements are summed
+
+    Args:
+        m1 (sp.coo_matrix): input contact matrix 1
+        m2 (sp.coo_matrix): input contact matrix 2
+        nDiags (int): use diagonals with index in the range [1, nDiags)
+    Returns: tuple of 6 `np.ndarray` of length nDiags - 1 as returned by
+    `diagStatsDense`
+    """
+    assert m1.shape == m2.shape,\
+        "diagStatsCoo input matrices have different shapes"
+    nRows, nCols = m1.shape
+    nD = max(min(nDiags, nCols) - 1, 0)
+    diag1, row1, x = diagEntries(m1, nDiags)
+    diag2, row2, y = diagEntries(m2, nDiags)
+    if nD * nRows <= DENSE_DIAG_STATS_RATIO * (x.size + y.size):
+        # bincount also sums the duplicated elements
+        xD = np.bincount(diag1 * nRows + row1, weights=x, minlength=nD * nRows)
+        yD = np.bincount(diag2 * nRows + row2, weights=y, minlength=nD * nRows)
+        stats = diagStatsDense(xD.reshape(nD, nRows), yD.reshape(nD, nRows))
+    else:
+        # key the elements in row-major order as fetched from cooler or else
+        # in diagonal-major order as output by meanFilterSparse so that they
+        # don't need sorting in either case
+        key1 = row1 * np.int64(nCols) + row1 + diag1
+        key2 = row2 * np.int64(nCols) + row2 + diag2
+        if np.any(key1[1:] <= key1[:-1]) or np.any(key2[1:] <= key2[:-1]):
+            key1 = diag1 * nRows + row1
+            key2 = diag2 * nRows + row2
+        stats = diagStatsSorted(*sortUniqueEntries(diag1, key1, x),
+                                *sortUniqueEntries(diag2, key2, y), nD + 1)
+    # pad to nDiags - 1 diagonals if nDiags is beyond the matrix
+    nPad = max(nDiags - 1, 0) - nD
+    return tuple(np.pad(stat, (0, nPad)) for stat in stats)
+
+
+def diagRhoWeights(nSamplesD: np.ndarray, sumX: np.ndarray, sumY: np.ndarray,
+                   sumXX: np.ndarray, sumYY: np.ndarray, sumXY: np.ndarray):
+    """Compute the per-diagonal correlations and their weights in the hicrep
+    SCC score from the per-diagonal sufficient statistics of two input
+    matrices. See `sccFromDiagStats`
+
+    Args:
+        nSamplesD (np.ndarray): number of elements that are non-zero in either
+        input matrix
+        sumX (np.ndarray): sum of input matrix 1
+        sumY (np.ndarray): sum of input matrix 2
+        sumXX (np.ndarray): sum of squares of input matrix 1
+        sumYY (np.ndarray): sum of squares of input matrix 2
+        sumXY (np.ndarray): sum of the element-wise product of the inputs
+    Returns: tuple of 2 `np.ndarray` of the broadcast shape of the inputs, the
+    correlation and the weight of each diagonal, which are zero where they
+    are undefined
+    """
     # ignore zero-division warnings because the corresponding elements in the
     # output don't contribute to the SCC scores
     with np.errstate(divide='ignore', invalid='ignore'):
-        cov = m1D.multiply(m2D).sum(axis=1).A1 - rowSumM1D * rowSumM2D / nSamplesD
+        cov = sumXY - sumX * sumY / nSamplesD
         rhoD = cov / np.sqrt(
-            (m1D.power(2).sum(axis=1).A1 - np.square(rowSumM1D) / nSamplesD ) *
-            (m2D.power(2).sum(axis=1).A1 - np.square(rowSumM2D) / nSamplesD ))
+            (sumXX - np.square(sumX) / nSamplesD ) *
+            (sumYY - np.square(sumY) / nSamplesD ))
         wsD = nSamplesD * varVstran(nSamplesD)
         # Convert NaN and Inf resulting from div by 0 to zeros.
         # posinf and neginf added to fix behavior seen in 4DN datasets
@@ -87,32 +297,141 @@ def sccByDiag(m1: sp.coo_matrix, m2: sp.coo_matrix, nDiags: int):
         # as an SCC score
         wsNan2Zero = np.nan_to_num(wsD, copy=True, posinf=0.0, neginf=0.0)
         rhoNan2Zero = np.nan_to_num(rhoD, copy=True, posinf=0.0, neginf=0.0)
+    return rhoNan2Zero, wsNan2Zero
 
-    return rhoNan2Zero @ wsNan2Zero / wsNan2Zero.sum()
 
+def sccFromDiagStats(nSamplesD: np.ndarray, sumX: np.ndarray, sumY: np.ndarray,
+                     sumXX: np.ndarray, sumYY: np.ndarray, sumXY: np.ndarray):
+    """Compute hicrep SCC score from the per-diagonal sufficient statistics of
+    two input matrices, i.e., each element of the inputs is for one diagonal.
+    The diagonals are along the last axis of the inputs and any leading axes
+    are broadcast, so that the scores of many pairs can be computed at once
 
-def hicrepSCC(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
-              h: int, dBPMax: int, bDownSample: bool,
-              chrNames: list = None, excludeChr: set = None):
-    """Compute hicrep score between two input Cooler contact matrices
+    Args:
+        nSamplesD (np.ndarray): number of elements that are non-zero in either
+        input matrix
+        sumX (np.ndarray): sum of input matrix 1
+        sumY (np.ndarray): sum of input matrix 2
+        sumXX (np.ndarray): sum of squares of input matrix 1
+        sumYY (np.ndarray): sum of squares of input matrix 2
+        sumXY (np.ndarray): sum of the element-wise product of the inputs
+    Returns: `float` hicrep SCC scores or `np.ndarray` of them over the
+    broadcast leading axes of the inputs
+    """
+    rhoD, wsD = diagRhoWeights(nSamplesD, sumX, sumY, sumXX, sumYY, sumXY)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (rhoD * wsD).sum(axis=-1) / wsD.sum(axis=-1)
+
+
+def sccByDiagCsr(m1D: sp.csr_matrix, m2D: sp.csr_matrix):
+    """Compute hicrep SCC score from two input matrices already converted by
+    `upperDiagCsr`, i.e., each row is one diagonal of the contact matrix. This
+    allows reusing the diagonal matrices when scoring one sample against many
+
+    Args:
+        m1D (sp.csr_matrix): diagonals of input contact matrix 1 as rows
+        m2D (sp.csr_matrix): diagonals of input contact matrix 2 as rows
+    Returns: `float` hicrep SCC scores
+    """
+    assert m1D.shape == m2D.shape,\
+        "sccByDiagCsr input matrices have different shapes"
+    return sccFromDiagStats((m1D + m2D).getnnz(axis=1),
+                            m1D.sum(axis=1).A1, m2D.sum(axis=1).A1,
+                            m1D.power(2).sum(axis=1).A1,
+                            m2D.power(2).sum(axis=1).A1,
+                            m1D.multiply(m2D).sum(axis=1).A1)
+
+
+def sccByBand(b1: DiagBand, b2: DiagBand, nDiags: int):
+    """Compute diagonal-wise hicrep SCC score for the two input `DiagBand`s
+    up to nDiags diagonals
+
+    Args:
+        b1 (DiagBand): input band of contact matrix 1
+        b2 (DiagBand): input band of contact matrix 2
+        nDiags (int): compute SCC scores for diagonals whose index is in the
+        range of [1, nDiags)
+    Returns: `float` hicrep SCC scores
+    """
+    assert b1.data.shape == b2.data.shape and b1.diagOffset == b2.diagOffset,\
+        "sccByBand input bands have different shapes"
+    rows = slice(max(1 - b1.diagOffset, 0), max(nDiags - b1.diagOffset, 0))
+    return sccFromDiagStats(*diagStatsDense(b1.data[rows], b2.data[rows]))
+
+
+def cohortDiagStats(bands: list, nDiags: int):
+    """Compute the per-diagonal sufficient statistics needed by
+    `sccFromDiagStats` of all pairs of the input `DiagBand`s, one diagonal at
+    a time. The sums and sums of squares only depend on one input and are
+    computed once per input. The cross products and the number of elements
+    non-zero in both inputs of all pairs are computed with one matrix product
+    over the diagonal of every input stacked as rows, so that the memory
+    scales with N * N + N * number of bins
+
+    Args:
+        bands (list): N `DiagBand`s of the same shape
+        nDiags (int): use diagonals with index in the range [1, nDiags)
+    Yields: tuple of 6 `np.ndarray` of shape (N, N) as returned by
+    `diagStatsDense` for each pair on one diagonal
+    """
+    b0 = bands[0]
+    assert all(b.data.shape == b0.data.shape and b.diagOffset == b0.diagOffset
+               for b in bands), "cohortDiagStats input bands have different shapes"
+    rows = range(max(1 - b0.diagOffset, 0), max(nDiags - b0.diagOffset, 0))
+    nCools = len(bands)
+    x = np.empty((nCools, b0.data.shape[1]))
+    for row in rows:
+        # copy one diagonal of every input at a time to bound the memory
+        for i, b in enumerate(bands):
+            x[i] = b.data[row]
+        sumX = x.sum(axis=1)
+        sumXX = np.einsum('ij,ij->i', x, x)
+        bNZ = (x != 0).astype(np.float32)
+        nnzX = bNZ.sum(axis=1, dtype=np.float64)
+        sumXY = x @ x.T
+        # the matrix product rounds differently from the sums of squares, which
+        # decides whether a near-constant diagonal has zero variance. Use the
+        # sums of squares as the self cross products so that each input scores
+        # against itself exactly as `diagStatsDense` does
+        np.fill_diagonal(sumXY, sumXX)
+        yield (nnzX[:, None] + nnzX[None, :] - bNZ @ bNZ.T,
+               sumX[:, None], sumX[None, :], sumXX[:, None], sumXX[None, :],
+               sumXY)
+
+
+def sccByBandCohort(bands: list, nDiags: int):
+    """Compute diagonal-wise hicrep SCC scores between all pairs of the input
+    `DiagBand`s up to nDiags diagonals. The weighted correlations are summed
+    one diagonal at a time over the statistics of `cohortDiagStats`
+
+    Args:
+        bands (list): N `DiagBand`s of the same shape
+        nDiags (int): compute SCC scores for diagonals whose index is in the
+        range of [1, nDiags)
+    Returns: `np.ndarray` of shape (N, N) of hicrep SCC scores
+    """
+    nCools = len(bands)
+    sumRhoWs = np.zeros((nCools, nCools))
+    sumWs = np.zeros((nCools, nCools))
+    for stats in cohortDiagStats(bands, nDiags):
+        rhoD, wsD = diagRhoWeights(*stats)
+        sumRhoWs += rhoD * wsD
+        sumWs += wsD
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sumRhoWs / sumWs
+
+
+def checkCoolers(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler):
+    """Check that two input Cooler contact matrices share the same binning and
+    chromosomes and return their common bin size
 
     Args:
         cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
         cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
-        h: `int` Half-size of the mean filter used to smooth the
-        input matrics
-        dBPMax `int` Only include contacts that are at most this genomic
-        distance (bp) away
-        bDownSample: `bool` Down sample the input with more contacts
-        to the same number of contacts as in the other input
-        chrNames: `list` List of chromosome names whose SCC to
-        compute. Default to None, which means all chromosomes in the
-        genome are used to compute SCC
-        excludeChr: `set` Set of chromosome names to exclude from SCC
-        computation. Default to None.
 
     Returns:
-        `float` scc scores for each chromosome
+        `int` bin size of the inputs. If the inputs have non-uniform bins, the
+        median bin size is returned
     """
     binSize1 = cool1.binsize
     binSize2 = cool2.binsize
@@ -122,38 +441,85 @@ def hicrepSCC(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
         f"Input cool files have different number of bins"
     assert coolerInfo(cool1, 'nchroms') == coolerInfo(cool2, 'nchroms'),\
         f"Input cool files have different number of chromosomes"
-    assert (cool1.chroms()[:] == cool2.chroms()[:]).all()[0],\
-        f"Input file have different chromosome names"
+    # compare the hashes of the h5 datasets, which are memoized per file, so
+    # that a file paired with many others is read only once
+    for path in ['chroms/name', 'chroms/length']:
+        assert coolerDatasetHash(cool1, path) == coolerDatasetHash(cool2, path),\
+            f"Input file have different chromosome names or lengths"
     binSize = binSize1
-    bins1 = cool1.bins()
-    bins2 = cool2.bins()
     if binSize is None:
         # sometimes bin size can be None, e.g., input cool file has
         # non-uniform size bins.
-        assert np.all(bins1[:] == bins2[:]),\
-            f"Input cooler files don't have a unique bin size most likely "\
-            f"because non-uniform bin size was used and the bins are defined "\
-            f"differently for the two input cooler files"
+        for path in ['bins/chrom', 'bins/start', 'bins/end']:
+            assert coolerDatasetHash(cool1, path) ==\
+                coolerDatasetHash(cool2, path),\
+                f"Input cooler files don't have a unique bin size most likely "\
+                f"because non-uniform bin size was used and the bins are "\
+                f"defined differently for the two input cooler files"
         # In that case, use the median bin size
-        binSize = int(np.median((bins1[:]["end"] - bins1[:]["start"]).values))
+        binSize = coolerMedianBinSize(cool1)
         warnings.warn(f"Input cooler files don't have a unique bin size most "\
                       f"likely because non-uniform bin size was used. HicRep "\
                       f"will use median bin size from the first cooler file "\
                       f"to determine maximal diagonal index to include", RuntimeWarning)
+    return binSize
+
+
+def coolerMedianBinSize(cool: cooler.api.Cooler):
+    """Return the median bin size of a Cooler file read directly from h5. The
+    result is memoized per file
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler object
+
+    Returns:
+        `int` median bin size
+    """
+    def compute():
+        with cool.open('r') as grp:
+            return int(np.median(grp['bins/end'][:] - grp['bins/start'][:]))
+    return coolerMemoized(cool, 'medianBinSize', compute)
+
+
+def diagCutoff(cool: cooler.api.Cooler, binSize: int, dBPMax: int):
+    """Convert the maximal genomic distance into an exclusive upper bound of
+    the diagonal index
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        binSize: `int` Bin size of the input
+        dBPMax: `int` Only include contacts that are at most this genomic
+        distance (bp) away. -1 means no limit
+
+    Returns:
+        `int` exclusive upper bound of the diagonal index
+    """
     if dBPMax == -1:
         # this is the exclusive upper bound
-        dMax = coolerInfo(cool1, 'nbins')
+        dMax = coolerInfo(cool, 'nbins')
     else:
         dMax = dBPMax // binSize + 1
     assert dMax > 1, f"Input dBPmax is smaller than binSize"
-    p1 = cool2pixels(cool1)
-    p2 = cool2pixels(cool2)
-    # get the total number of contacts as normalizing constant
-    n1 = coolerInfo(cool1, 'sum')
-    n2 = coolerInfo(cool2, 'sum')
+    return dMax
+
+
+def selectChrNames(cool: cooler.api.Cooler, chrNames: list = None,
+                   excludeChr: set = None):
+    """Resolve the list of chromosomes whose SCC to compute
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used
+        excludeChr: `set` Set of chromosome names to exclude. Default to None.
+
+    Returns:
+        `list` chromosome names in the order their SCC scores are reported
+    """
     # Use dict here so that the chrNames don't duplicate
     if chrNames is None:
-        chrNamesDict = dict.fromkeys(cool1.chroms()[:]['name'].tolist())
+        chrNamesDict = dict.fromkeys(cool.chroms()[:]['name'].tolist())
     else:
         chrNamesDict = dict.fromkeys(chrNames)
     # It's important to preserve the order of the input chrNames so that the
@@ -165,44 +531,1292 @@ def hicrepSCC(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
     # filter out excluded chromosomes
     if excludeChr is None:
         excludeChr = set()
-    chrNames = [ chrName for chrName in chrNamesDict if chrName not in excludeChr ]
+    return [ chrName for chrName in chrNamesDict if chrName not in excludeChr ]
+
+
+def smoothedBand(cool: cooler.api.Cooler, chrName: str, h: int, dMax: int,
+                 n: float, cache: BandCache = None,
+                 profiler: StageProfiler = None, sample: int = None,
+                 band: DiagBand = None, dtype=np.float64):
+    """Read one chromosome of a Cooler contact matrix, normalize it by the
+    total number of contacts and smooth it
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        chrName: `str` Name of the chromosome
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        n: `float` Total number of contacts used for normalization
+        cache: `BandCache` If provided, the band is looked up from and
+        stored to this cache. Default to None
+        profiler: `StageProfiler` If provided, record the stages to it.
+        Default to None
+        sample: `int` Index of the input reported to the profiler
+        band: `DiagBand` Unsmoothed band of the chromosome as returned by
+        `streamSubBand` if it's already read, which is then normalized in
+        place. Default to None, which means the band is read from `cool`
+        dtype: Data type in which the band is normalized, smoothed and
+        stored. Default to np.float64
+
+    Returns:
+        `DiagBand` smoothed band of the chromosome
+    """
+    if cache is not None:
+        with profileStage(profiler, 'cacheGet', chrName, sample) as record:
+            key = cache.key(cool, chrName, h, dMax, 'sum', dtype)
+            band = record['output'] = cache.get(key)
+        if band is not None:
+            return band
+    if band is None:
+        with profileStage(profiler, 'streamSubBand', chrName, sample) as record:
+            band = record['output'] = streamSubBand(cool, chrName, dMax,
+                                                    dtype=dtype)
+    with profileStage(profiler, 'normalize', chrName, sample, band) as record:
+        band.data = band.data.astype(dtype, copy=False)
+        band.data /= n
+        record['output'] = band
+    if h > 0:
+        with profileStage(profiler, 'meanFilterBand', chrName, sample, band) as record:
+            band = record['output'] = meanFilterBand(band, h)
+    if cache is not None:
+        with profileStage(profiler, 'cachePut', chrName, sample, band):
+            cache.put(key, band)
+    return band
+
+
+def drawSeeds(rng: np.random.Generator, n: int):
+    """Draw one seed per chromosome for the down sampling up front so that
+    the results don't depend on how the chromosomes are scheduled
+
+    Args:
+        rng: `np.random.Generator` Random number generator. If None, the
+        global numpy random state is used
+        n: `int` Number of seeds
+
+    Returns:
+        `np.ndarray` of `n` int seeds
+    """
+    if rng is None:
+        return np.random.randint(np.iinfo(np.int32).max, size=n)
+    return rng.integers(np.iinfo(np.int32).max, size=n)
+
+
+def ladderDepth(level: int):
+    """Return the number of contacts of a level of the down sampling ladder,
+    i.e., the levels are the powers of sqrt(2)
+
+    Args:
+        level: `int` Level of the ladder
+
+    Returns:
+        `float` number of contacts
+    """
+    return 2.0 ** (level / 2)
+
+
+def ladderLevel(size: float):
+    """Return the deepest level of the down sampling ladder with at most
+    `size` contacts
+
+    Args:
+        size: `float` Number of contacts
+
+    Returns:
+        `int` level of the ladder, which is 0 if `size` is less than 1
+    """
+    if size < 1:
+        return 0
+    level = int(math.floor(2 * math.log2(size)))
+    # correct the round-off of the logarithm
+    while ladderDepth(level + 1) <= size:
+        level += 1
+    while level > 0 and ladderDepth(level) > size:
+        level -= 1
+    return level
+
+
+def bandTotal(cool: cooler.api.Cooler, chrName: str, dMax: int,
+              cache: BandCache = None, profiler: StageProfiler = None,
+              sample: int = None, band: DiagBand = None, dtype=np.float64):
+    """Return the number of contacts within the band of one chromosome of a
+    Cooler contact matrix, which is memoized per process and stored in the
+    cache so that the band is only read if its down sampling ladder isn't
+    cached
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        chrName: `str` Name of the chromosome
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        cache: `BandCache` If provided, the total is looked up from and
+        stored to this cache. Default to None
+        profiler: `StageProfiler` If provided, record the stages to it.
+        Default to None
+        sample: `int` Index of the input reported to the profiler
+        band: `DiagBand` Unsmoothed band of the chromosome as returned by
+        `streamSubBand` if it's already read. Default to None
+        dtype: Data type of the band if it's read. Default to np.float64
+
+    Returns:
+        `tuple` of the `float` number of contacts and the unsmoothed
+        `DiagBand` if it's given or read, otherwise None
+    """
+    if band is not None:
+        return float(band.data.sum(dtype=np.float64)), band
+    bands = []
+
+    def compute():
+        if cache is not None:
+            key = cache.key(cool, chrName, 0, dMax, 'total', np.float64)
+            cached = cache.get(key)
+            if cached is not None:
+                return float(cached.data[0, 0])
+        with profileStage(profiler, 'streamSubBand', chrName, sample) as record:
+            bands.append(streamSubBand(cool, chrName, dMax, dtype=dtype))
+            record['output'] = bands[0]
+        total = float(bands[0].data.sum(dtype=np.float64))
+        if cache is not None:
+            cache.put(key, DiagBand(np.array([[total]])))
+        return total
+
+    total = coolerMemoized(cool, f"bandTotal:{chrName}:{dMax}", compute)
+    return total, bands[0] if len(bands) > 0 else None
+
+
+def ladderBands(cool: cooler.api.Cooler, chrName: str, h: int, dMax: int,
+                levels: list, cache: BandCache = None,
+                profiler: StageProfiler = None, sample: int = None,
+                band: DiagBand = None, dtype=np.float64):
+    """Return the smoothed bands of one chromosome of a Cooler contact matrix
+    at levels of its down sampling ladder. The ladder is a nested series of
+    binomially thinned versions of the band with `ladderDepth(level)` contacts
+    on average. The top level is the deepest one with at most the number of
+    contacts of the band, thinned from the band, and every other level is
+    thinned from the level above it. Each thinning step draws from its own
+    random number generator seeded by `LADDER_SEED`, the chromosome name and
+    the level, so the levels of an input don't depend on which levels are
+    requested together or which pair they're used for. Only the requested
+    levels are smoothed. Unlike `smoothedBand`, the counts are not normalized
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        chrName: `str` Name of the chromosome
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        levels: `list` of `int` levels to return, at most the top level
+        cache: `BandCache` If provided, the smoothed levels are looked up from
+        and stored to this cache. Default to None
+        profiler: `StageProfiler` If provided, record the stages to it.
+        Default to None
+        sample: `int` Index of the input reported to the profiler
+        band: `DiagBand` Unsmoothed band of the chromosome as returned by
+        `streamSubBand` if it's already read. Default to None, which means
+        the band is read from `cool` if any level isn't cached
+        dtype: Data type in which the bands are smoothed and stored. Default
+        to np.float64
+
+    Returns:
+        `dict` mapping each level to its smoothed `DiagBand`
+    """
+    total, band = bandTotal(cool, chrName, dMax, cache, profiler, sample, band,
+                            dtype)
+    top = ladderLevel(total)
+    levels = sorted(set(levels), reverse=True)
+    assert len(levels) == 0 or (levels[-1] >= 0 and levels[0] <= top),\
+        f"Levels {levels} of chromosome {chrName} are not in [0, {top}]"
+    result = {}
+    keys = {}
+    if cache is not None:
+        for level in levels:
+            keys[level] = cache.key(cool, chrName, h, dMax,
+                                    f"ladder:{LADDER_SEED}:{level}", dtype)
+            with profileStage(profiler, 'cacheGet', chrName, sample) as record:
+                cached = record['output'] = cache.get(keys[level])
+            if cached is not None:
+                result[level] = cached
+    missing = [level for level in levels if level not in result]
+    if len(missing) == 0:
+        return result
+    if band is None:
+        with profileStage(profiler, 'streamSubBand', chrName, sample) as record:
+            band = record['output'] = streamSubBand(cool, chrName, dMax,
+                                                    dtype=dtype)
+    band.data = band.data.astype(dtype, copy=False)
+    chrSeed = zlib.crc32(chrName.encode('utf-8'))
+    p = min(ladderDepth(top) / total, 1.0) if total > 0 else 1.0
+    for level in range(top, missing[-1] - 1, -1):
+        rng = np.random.default_rng([LADDER_SEED, chrSeed, level])
+        with profileStage(profiler, 'thinBand', chrName, sample, band) as record:
+            band = record['output'] = thinBand(band, p, rng)
+        p = ladderDepth(level - 1) / ladderDepth(level)
+        if level not in missing:
+            continue
+        smoothed = band
+        if h > 0:
+            with profileStage(profiler, 'meanFilterBand', chrName, sample, band) as record:
+                smoothed = record['output'] = meanFilterBand(band, h)
+        if cache is not None:
+            with profileStage(profiler, 'cachePut', chrName, sample, smoothed):
+                cache.put(keys[level], smoothed)
+        result[level] = smoothed
+    return result
+
+
+def pairBands(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+             chrName: str, h: int, dMax: int, bDownSample: bool,
+             n1: float, n2: float, seed: int = None, cache: BandCache = None,
+             profiler: StageProfiler = None, bands: tuple = None,
+             dtype=np.float64, bLadder: bool = False):
+    """Read, normalize or down sample, and smooth the bands of one chromosome
+    of two input Cooler contact matrices as used to compute their hicrep score
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        chrName: `str` Name of the chromosome
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input
+        n1: `float` Total number of contacts in input 1 used for normalization
+        n2: `float` Total number of contacts in input 2 used for normalization
+        seed: `int` Seed of the random number generator used for down
+        sampling. Default to None, which means the global numpy random state
+        is used
+        cache: `BandCache` Cache of the smoothed bands. It's not used when
+        bDownSample is True unless bLadder is True. Default to None
+        profiler: `StageProfiler` If provided, record the wall time, CPU time,
+        number of non-zero elements and memory of each stage to it. Default to
+        None
+        bands: `tuple` of the unsmoothed `DiagBand`s of the chromosome of the
+        two inputs as returned by `streamSubBand` if they're already read,
+        e.g., by `prefetchBands`. Either band can be None, meaning it's read
+        from the input. Default to None
+        dtype: Data type in which the bands are normalized, smoothed and
+        stored. The scc statistics are accumulated in float64 regardless.
+        Default to np.float64
+        bLadder: `bool` When bDownSample is True, instead of resampling the
+        input with more contacts, use both inputs at the deepest level of
+        their down sampling ladders that is common to both, see
+        `ladderBands`, so that the levels computed for an input are reused
+        with every other input. seed is not used. Default to False
+
+    Returns:
+        `tuple` of the two smoothed `DiagBand`s
+    """
+    b1, b2 = (None, None) if bands is None else bands
+    if bDownSample and bLadder:
+        total1, b1 = bandTotal(cool1, chrName, dMax, cache, profiler, 1, b1,
+                               dtype)
+        total2, b2 = bandTotal(cool2, chrName, dMax, cache, profiler, 2, b2,
+                               dtype)
+        level = ladderLevel(min(total1, total2))
+        b1 = ladderBands(cool1, chrName, h, dMax, [level], cache, profiler, 1,
+                         b1, dtype)[level]
+        b2 = ladderBands(cool2, chrName, h, dMax, [level], cache, profiler, 2,
+                         b2, dtype)[level]
+    elif bDownSample:
+        if b1 is None:
+            with profileStage(profiler, 'streamSubBand', chrName, 1) as record:
+                b1 = record['output'] = streamSubBand(cool1, chrName, dMax,
+                                                      dtype=dtype)
+        if b2 is None:
+            with profileStage(profiler, 'streamSubBand', chrName, 2) as record:
+                b2 = record['output'] = streamSubBand(cool2, chrName, dMax,
+                                                      dtype=dtype)
+        b1.data = b1.data.astype(dtype, copy=False)
+        b2.data = b2.data.astype(dtype, copy=False)
+    else:
+        b1 = smoothedBand(cool1, chrName, h, dMax, n1, cache, profiler, 1, b1,
+                          dtype)
+        b2 = smoothedBand(cool2, chrName, h, dMax, n2, cache, profiler, 2, b2,
+                          dtype)
+    assert b1.data.shape == b2.data.shape,\
+        "Contact matrices of chromosome %s have different input shape" % (chrName)
+    if bDownSample and not bLadder:
+        # do downsampling
+        rng = None if seed is None else np.random.default_rng(seed)
+        size1 = b1.data.sum(dtype=np.float64)
+        size2 = b2.data.sum(dtype=np.float64)
+        if size1 > size2:
+            with profileStage(profiler, 'resampleBand', chrName, 1, b1) as record:
+                b1 = record['output'] = resampleBand(b1, size2, rng)
+        elif size2 > size1:
+            with profileStage(profiler, 'resampleBand', chrName, 2, b2) as record:
+                b2 = record['output'] = resampleBand(b2, size1, rng)
+        if h > 0:
+            # apply smoothing
+            with profileStage(profiler, 'meanFilterBand', chrName, 1, b1) as record:
+                b1 = record['output'] = meanFilterBand(b1, h)
+            with profileStage(profiler, 'meanFilterBand', chrName, 2, b2) as record:
+                b2 = record['output'] = meanFilterBand(b2, h)
+    return b1, b2
+
+
+def sccOfChr(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+             chrName: str, h: int, dMax: int, bDownSample: bool,
+             n1: float, n2: float, seed: int = None, cache: BandCache = None,
+             profiler: StageProfiler = None, bands: tuple = None,
+             dtype=np.float64, bLadder: bool = False):
+    """Compute hicrep score of one chromosome between two input Cooler contact
+    matrices. See `pairBands` for the arguments
+
+    Returns:
+        `float` scc score of the chromosome
+    """
+    b1, b2 = pairBands(cool1, cool2, chrName, h, dMax, bDownSample, n1, n2,
+                       seed, cache, profiler, bands, dtype, bLadder)
+    with profileStage(profiler, 'sccByDiag', chrName):
+        return sccByDiag(b1, b2, b1.nDiags)
+
+
+# Cooler handles opened by each worker process of hicrepSCC
+sccWorkerCoolers = None
+
+
+def initSCCWorker(uri1: str, uri2: str):
+    """Open the input Cooler files in a worker process so that the workers
+    don't share the h5py file handles with the parent process
+
+    Args:
+        uri1: `str` URI of Cooler contact matrix 1
+        uri2: `str` URI of Cooler contact matrix 2
+    """
+    global sccWorkerCoolers
+    sccWorkerCoolers = (cooler.Cooler(uri1), cooler.Cooler(uri2))
+
+
+def sccOfChrWorker(chrName: str, seed: int, bProfile: bool,
+                   bTraceMemory: bool = False, **kwargs):
+    """Run `sccOfChr` in a worker process initialized by `initSCCWorker`
+
+    Args:
+        chrName: `str` Name of the chromosome
+        seed: `int` Seed of the random number generator used for down
+        sampling
+        bProfile: `bool` Profile the stages in the worker
+        bTraceMemory: `bool` Record the peak allocated memory of the stages,
+        see `StageProfiler`. Default to False
+        kwargs: the rest of the keyword arguments to `sccOfChr`
+
+    Returns:
+        `tuple` of the scc score of the chromosome and the list of the
+        profiling records of the worker
+    """
+    cool1, cool2 = sccWorkerCoolers
+    if not bProfile:
+        return sccOfChr(cool1, cool2, chrName, seed=seed, **kwargs), []
+    profiler = StageProfiler(bTraceMemory)
+    try:
+        scc = sccOfChr(cool1, cool2, chrName, seed=seed, profiler=profiler,
+                       **kwargs)
+    finally:
+        profiler.stop()
+    return scc, profiler.records
+
+
+def prefetchBands(cools: list, chrName: str, h: int, dMax: int,
+                  bDownSample: bool, cache: BandCache = None,
+                  dtype=np.float64, bLadder: bool = False):
+    """Read the unsmoothed bands of one chromosome of the inputs for
+    `sccOfChr`, skipping those whose smoothed band is in the cache
+
+    Args:
+        cools: `list` of `cooler.api.Cooler` Input Cooler contact matrices
+        chrName: `str` Name of the chromosome
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        bDownSample: `bool` Whether the inputs are down sampled, in which
+        case the cache is not used unless bLadder is True
+        cache: `BandCache` Cache of the smoothed bands. Default to None
+        dtype: Data type of the bands. Default to np.float64
+        bLadder: `bool` When bDownSample is True, the inputs are scored at
+        the deepest level of their down sampling ladders common to all of
+        them, see `pairBands`, so a band is skipped if that level is in the
+        cache. Default to False
+
+    Returns:
+        `tuple` of `DiagBand` or None for each input
+    """
+    if bDownSample and bLadder:
+        # the totals are looked up from the cache and only the bands whose
+        # total isn't cached are read to count them
+        totals, bands = zip(*[bandTotal(cool, chrName, dMax, cache,
+                                        dtype=dtype) for cool in cools])
+        level = ladderLevel(min(totals))
+        bands = list(bands)
+        for i, cool in enumerate(cools):
+            if bands[i] is not None or cache is not None and\
+                    cache.get(cache.key(cool, chrName, h, dMax,
+                                        f"ladder:{LADDER_SEED}:{level}",
+                                        dtype)) is not None:
+                continue
+            bands[i] = streamSubBand(cool, chrName, dMax, dtype=dtype)
+        return tuple(bands)
+    bands = []
+    for cool in cools:
+        if not bDownSample and cache is not None and\
+                cache.get(cache.key(cool, chrName, h, dMax, 'sum',
+                                    dtype)) is not None:
+            bands.append(None)
+        else:
+            bands.append(streamSubBand(cool, chrName, dMax, dtype=dtype))
+    return tuple(bands)
+
+
+def hicrepSCC(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+              h: int, dBPMax: int, bDownSample: bool,
+              chrNames: list = None, excludeChr: set = None,
+              nWorkers: int = 1, cache: BandCache = None,
+              profiler: StageProfiler = None,
+              rng: np.random.Generator = None, prefetch: int = 0,
+              bBulkLoad: bool = False, onChr=None, dtype=np.float64,
+              bLadder: bool = False):
+    """Compute hicrep score between two input Cooler contact matrices
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        nWorkers: `int` Number of worker processes that compute the
+        chromosomes in parallel. Default to 1, which means the chromosomes
+        are computed one after another in the current process
+        cache: `BandCache` On-disk cache of the smoothed bands. If provided,
+        the bands of the inputs found in the cache are not read or smoothed
+        again and the computed ones are added to it. It's not used when
+        bDownSample is True unless bLadder is True. Default to None
+        profiler: `StageProfiler` If provided, record the wall time, CPU time,
+        number of non-zero elements and memory of each stage of each
+        chromosome to it. With nWorkers > 1, the stages are profiled within
+        the worker processes. Default to None
+        rng: `np.random.Generator` Random number generator from which the
+        seeds of the per-chromosome down sampling are drawn when bDownSample
+        is True. Default to None, which means the global numpy random state
+        is used
+        prefetch: `int` If positive, read the next chromosomes of both inputs
+        in a background thread while the current one is being computed,
+        keeping at most this many chromosomes read ahead. It's not used with
+        nWorkers > 1. Default to 0, meaning no prefetching
+        bBulkLoad: `bool` Read the pixels of all the chromosomes within dBPMax
+        of both inputs in one sequential pass up front with `CisPixels`
+        instead of querying the inputs once per chromosome, which is faster
+        for genomes with many small chromosomes or scaffolds at the cost of
+        holding those pixels in memory. It's not used with nWorkers > 1 and
+        prefetch is ignored. Default to False
+        onChr: callable taking the chromosome name and its scc score, called
+        as soon as each chromosome is computed in the order of the
+        chromosomes, e.g., to checkpoint the results. Default to None
+        dtype: Data type in which the contact matrices are normalized,
+        smoothed and stored, e.g., np.float32 to halve the memory of the
+        smoothed bands. The scc statistics are accumulated in float64
+        regardless. Default to np.float64
+        bLadder: `bool` When bDownSample is True, score both inputs at the
+        deepest level of their down sampling ladders common to both instead of
+        resampling the input with more contacts, see `ladderBands`. The levels
+        are reproducible and stored in the cache, so that scoring an input
+        against many others thins and smooths it only once per level. rng is
+        not used. Default to False
+
+    Returns:
+        `float` scc scores for each chromosome
+    """
+    binSize = checkCoolers(cool1, cool2)
+    dMax = diagCutoff(cool1, binSize, dBPMax)
+    # get the total number of contacts as normalizing constant
+    n1 = coolerInfo(cool1, 'sum')
+    n2 = coolerInfo(cool2, 'sum')
+    chrNames = selectChrNames(cool1, chrNames, excludeChr)
+    if bDownSample:
+        seeds = drawSeeds(rng, len(chrNames))
+    else:
+        seeds = [None] * len(chrNames)
+    kwargs = dict(h=h, dMax=dMax, bDownSample=bDownSample, n1=n1, n2=n2,
+                  cache=cache, dtype=dtype, bLadder=bLadder)
     scc = np.full(len(chrNames), -2.0)
+    if nWorkers > 1 and len(chrNames) > 1:
+        with ProcessPoolExecutor(max_workers=min(nWorkers, len(chrNames)),
+                                 initializer=initSCCWorker,
+                                 initargs=(cool1.uri, cool2.uri)) as pool:
+            # map() returns the results in the order of chrNames
+            results = pool.map(partial(sccOfChrWorker,
+                                       bProfile=profiler is not None,
+                                       bTraceMemory=profiler is not None and
+                                       profiler.bTraceMemory, **kwargs),
+                               chrNames, seeds)
+            for iChr, (result, records) in enumerate(results):
+                scc[iChr] = result
+                if onChr is not None:
+                    onChr(chrNames[iChr], result)
+                if profiler is not None:
+                    profiler.records.extend(records)
+    elif bBulkLoad:
+        with profileStage(profiler, 'CisPixels', None, 1):
+            cis1 = CisPixels(cool1, dMax)
+        with profileStage(profiler, 'CisPixels', None, 2):
+            cis2 = CisPixels(cool2, dMax)
+        for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+            bands = (cis1.band(chrName), cis2.band(chrName))
+            scc[iChr] = sccOfChr(cool1, cool2, chrName, seed=seed,
+                                 profiler=profiler, bands=bands, **kwargs)
+            if onChr is not None:
+                onChr(chrName, scc[iChr])
+    elif prefetch > 0:
+        fetch = partial(prefetchBands, [cool1, cool2], h=h, dMax=dMax,
+                        bDownSample=bDownSample, cache=cache, dtype=dtype,
+                        bLadder=bLadder)
+        with Prefetcher(fetch, chrNames, prefetch) as prefetcher:
+            results = iter(prefetcher)
+            for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+                # time how long the computation waits for the reads
+                with profileStage(profiler, 'prefetchWait', chrName):
+                    _, bands = next(results)
+                scc[iChr] = sccOfChr(cool1, cool2, chrName, seed=seed,
+                                     profiler=profiler, bands=bands, **kwargs)
+                if onChr is not None:
+                    onChr(chrName, scc[iChr])
+    else:
+        for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+            scc[iChr] = sccOfChr(cool1, cool2, chrName, seed=seed,
+                                 profiler=profiler, **kwargs)
+            if onChr is not None:
+                onChr(chrName, scc[iChr])
+    return scc
+
+
+def hicrepSCCMatrix(cools: list, h: int, dBPMax: int, bDownSample: bool,
+                    chrNames: list = None, excludeChr: set = None,
+                    cache: BandCache = None, rng: np.random.Generator = None,
+                    dtype=np.float64, bLadder: bool = False):
+    """Compute all-vs-all hicrep scores between a list of input Cooler contact
+    matrices. Unlike calling `hicrepSCC` on every pair, each input is fetched,
+    normalized and smoothed only once per chromosome and the scores of all
+    pairs are computed together from per-input statistics and one matrix
+    product per diagonal by `sccByBandCohort`
+
+    Args:
+        cools: `list` of `cooler.api.Cooler` Input Cooler contact matrices
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Down sample all the inputs to the same number of
+        contacts as the input with the least contacts of the whole cohort on
+        each chromosome, so that every pair is scored at that cohort-wide
+        depth. This differs from `hicrepSCC`, which down samples each pair to
+        the depth of its shallower input, so the scores of a pair are only the
+        same as those of `hicrepSCC` if bLadder is True
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        cache: `BandCache` On-disk cache of the smoothed bands. It's not used
+        when bDownSample is True unless bLadder is True. Default to None
+        rng: `np.random.Generator` Random number generator from which the
+        seeds of the per-chromosome down sampling are drawn when bDownSample
+        is True. Default to None, which means the global numpy random state
+        is used
+        dtype: Data type in which the contact matrices are normalized,
+        smoothed and stored. The scc statistics are accumulated in float64
+        regardless. Default to np.float64
+        bLadder: `bool` When bDownSample is True, score each pair at the
+        deepest level of the down sampling ladders common to both inputs as
+        `hicrepSCC` does with bLadder, and each input against itself at its
+        top level, instead of down sampling all the inputs to the least deep
+        one. Each input is read once and thinned and smoothed once per level
+        it needs, and the pairs at the same level are scored together by
+        `sccByBandCohort`. Default to False
+
+    Returns:
+        `np.ndarray` of shape (N, N, number of chromosomes) where N is the
+        number of inputs. Element [i, j] is the array of per-chromosome scc
+        scores between input i and j as returned by `hicrepSCC`
+    """
+    nCools = len(cools)
+    assert nCools > 1, "hicrepSCCMatrix needs at least 2 input Cooler files"
+    binSize = checkCoolers(cools[0], cools[1])
+    for cool in cools[2:]:
+        assert checkCoolers(cools[0], cool) == binSize,\
+            f"Input cool files have different bin sizes"
+    dMax = diagCutoff(cools[0], binSize, dBPMax)
+    # get the total number of contacts as normalizing constant
+    ns = [coolerInfo(cool, 'sum') for cool in cools]
+    chrNames = selectChrNames(cools[0], chrNames, excludeChr)
+    scc = np.full((nCools, nCools, len(chrNames)), -2.0)
+    seeds = drawSeeds(rng, len(chrNames)) if bDownSample else None
     for iChr, chrName in enumerate(chrNames):
-        # normalize by total number of contacts
-        mS1 = getSubCoo(p1, bins1, chrName)
-        assert mS1.size > 0, "Contact matrix 1 of chromosome %s is empty" % (chrName)
-        assert mS1.shape[0] == mS1.shape[1],\
-            "Contact matrix 1 of chromosome %s is not square" % (chrName)
-        mS2 = getSubCoo(p2, bins2, chrName)
-        assert mS2.size > 0, "Contact matrix 2 of chromosome %s is empty" % (chrName)
-        assert mS2.shape[0] == mS2.shape[1],\
-            "Contact matrix 2 of chromosome %s is not square" % (chrName)
-        assert mS1.shape == mS2.shape,\
+        if bDownSample and bLadder:
+            scc[:, :, iChr] = sccOfChrLadder(cools, chrName, h, dMax, cache,
+                                             dtype)
+            continue
+        if bDownSample:
+            bs = [streamSubBand(cool, chrName, dMax, dtype=dtype)
+                  for cool in cools]
+        else:
+            bs = [smoothedBand(cool, chrName, h, dMax, n, cache, dtype=dtype)
+                  for cool, n in zip(cools, ns)]
+        assert all(b.data.shape == bs[0].data.shape for b in bs),\
+            "Contact matrices of chromosome %s have different input shape"\
+            % (chrName)
+        nDiags = bs[0].nDiags
+        if bDownSample:
+            # down sample everyone to the least deep input of the cohort
+            sizes = [b.data.sum(dtype=np.float64) for b in bs]
+            sizeMin = min(sizes)
+            rngChr = np.random.default_rng(seeds[iChr])
+            bs = [resampleBand(b, sizeMin, rngChr) if size > sizeMin else b
+                  for b, size in zip(bs, sizes)]
+            if h > 0:
+                # apply smoothing
+                bs = [meanFilterBand(b, h) for b in bs]
+        scc[:, :, iChr] = sccByBandCohort(bs, nDiags)
+    return scc
+
+
+def sccOfChrLadder(cools: list, chrName: str, h: int, dMax: int,
+                   cache: BandCache = None, dtype=np.float64):
+    """Compute hicrep scores of one chromosome between all pairs of the input
+    Cooler contact matrices at the deepest level of the down sampling ladders
+    common to each pair. See `hicrepSCCMatrix` with bLadder
+
+    Args:
+        cools: `list` of `cooler.api.Cooler` Input Cooler contact matrices
+        chrName: `str` Name of the chromosome
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        cache: `BandCache` Cache of the smoothed levels. Default to None
+        dtype: Data type in which the bands are smoothed and stored. Default
+        to np.float64
+
+    Returns:
+        `np.ndarray` of shape (N, N) of scc scores where N is the number of
+        inputs
+    """
+    totals = []
+    raws = []
+    for cool in cools:
+        total, band = bandTotal(cool, chrName, dMax, cache, dtype=dtype)
+        totals.append(total)
+        raws.append(band)
+    # the diagonal is the top level of each input as in hicrepSCC
+    levels = np.array([[ladderLevel(min(t1, t2)) for t2 in totals]
+                       for t1 in totals])
+    bs = [ladderBands(cool, chrName, h, dMax, levels[i], cache, band=band,
+                      dtype=dtype)
+          for i, (cool, band) in enumerate(zip(cools, raws))]
+    # drop the unsmoothed bands as soon as the levels are computed
+    del raws
+    nDiags = next(iter(bs[0].values())).nDiags
+    scc = np.full(levels.shape, -2.0)
+    for level in np.unique(levels):
+        iCools = np.flatnonzero((levels == level).any(axis=1))
+        sccLevel = sccByBandCohort([bs[i][level] for i in iCools], nDiags)
+        sel = levels[np.ix_(iCools, iCools)] == level
+        scc[np.ix_(iCools, iCools)] = np.where(
+            sel, sccLevel, scc[np.ix_(iCools, iCools)])
+    return scc
+
+
+def sccOfChrByH(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                chrName: str, hs: list, dMax: int, bDownSample: bool,
+                n1: float, n2: float, seed: int = None,
+                cache: BandCache = None, profiler: StageProfiler = None,
+                dtype=np.float64):
+    """Compute the hicrep SCC score of one chromosome for each of a list of
+    smoothing window half-sizes. Each input is read, normalized or down
+    sampled only once and the smoothing of all the half-sizes shares one
+    prefix sum per input
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        chrName: `str` Name of the chromosome
+        hs: `list` of `int` Half-sizes of the mean filter
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input
+        n1: `float` Total number of contacts in input 1 used for normalization
+        n2: `float` Total number of contacts in input 2 used for normalization
+        seed: `int` Seed of the random number generator used for down
+        sampling. Default to None, which means the global numpy random state
+        is used
+        cache: `BandCache` Cache of the unsmoothed normalized bands. It's not
+        used when bDownSample is True. Default to None
+        profiler: `StageProfiler` If provided, record the stages to it.
+        Default to None
+        dtype: Data type in which the bands are normalized, smoothed and
+        stored. The scc statistics are accumulated in float64 regardless.
+        Default to np.float64
+
+    Returns:
+        `np.ndarray` scc scores of the chromosome for each half-size
+    """
+    if bDownSample:
+        with profileStage(profiler, 'streamSubBand', chrName, 1) as record:
+            b1 = record['output'] = streamSubBand(cool1, chrName, dMax,
+                                                  dtype=dtype)
+        with profileStage(profiler, 'streamSubBand', chrName, 2) as record:
+            b2 = record['output'] = streamSubBand(cool2, chrName, dMax,
+                                                  dtype=dtype)
+        b1.data = b1.data.astype(dtype, copy=False)
+        b2.data = b2.data.astype(dtype, copy=False)
+        rng = None if seed is None else np.random.default_rng(seed)
+        size1 = b1.data.sum(dtype=np.float64)
+        size2 = b2.data.sum(dtype=np.float64)
+        if size1 > size2:
+            with profileStage(profiler, 'resampleBand', chrName, 1, b1) as record:
+                b1 = record['output'] = resampleBand(b1, size2, rng)
+        elif size2 > size1:
+            with profileStage(profiler, 'resampleBand', chrName, 2, b2) as record:
+                b2 = record['output'] = resampleBand(b2, size1, rng)
+    else:
+        b1 = smoothedBand(cool1, chrName, 0, dMax, n1, cache, profiler, 1,
+                          dtype=dtype)
+        b2 = smoothedBand(cool2, chrName, 0, dMax, n2, cache, profiler, 2,
+                          dtype=dtype)
+    assert b1.data.shape == b2.data.shape,\
+        "Contact matrices of chromosome %s have different input shape" % (chrName)
+    nDiags = b1.nDiags
+    scc = np.full(len(hs), -2.0)
+    with profileStage(profiler, 'meanFilterBandRange', chrName):
+        for iH, ((h, s1), (_, s2)) in enumerate(
+                zip(meanFilterBandRange(b1, hs), meanFilterBandRange(b2, hs))):
+            scc[iH] = sccByDiag(s1, s2, nDiags)
+    return scc
+
+
+def hicrepSCCByH(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                 hs: list, dBPMax: int, bDownSample: bool,
+                 chrNames: list = None, excludeChr: set = None,
+                 cache: BandCache = None, rng: np.random.Generator = None,
+                 profiler: StageProfiler = None, dtype=np.float64):
+    """Compute hicrep score between two input Cooler contact matrices for each
+    of a list of smoothing window half-sizes in a single pass over the inputs,
+    e.g., to select the half-size with `selectH`
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        hs: `list` of `int` Half-sizes of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input. The same down
+        sampled inputs are used for all half-sizes
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        cache: `BandCache` On-disk cache of the unsmoothed normalized bands.
+        It's not used when bDownSample is True. Default to None
+        rng: `np.random.Generator` Random number generator from which the
+        seeds of the per-chromosome down sampling are drawn when bDownSample
+        is True. Default to None, which means the global numpy random state
+        is used
+        profiler: `StageProfiler` If provided, record the wall time, CPU time,
+        number of non-zero elements and memory of each stage of each
+        chromosome to it. Default to None
+        dtype: Data type in which the contact matrices are normalized,
+        smoothed and stored as in `hicrepSCC`. Default to np.float64
+
+    Returns:
+        `np.ndarray` of shape (len(hs), number of chromosomes) scc scores for
+        each half-size and chromosome
+    """
+    assert len(hs) > 0 and min(hs) >= 0,\
+        f"Half-sizes of the mean filter must be non-negative"
+    binSize = checkCoolers(cool1, cool2)
+    dMax = diagCutoff(cool1, binSize, dBPMax)
+    n1 = coolerInfo(cool1, 'sum')
+    n2 = coolerInfo(cool2, 'sum')
+    chrNames = selectChrNames(cool1, chrNames, excludeChr)
+    seeds = drawSeeds(rng, len(chrNames)) if bDownSample else\
+        [None] * len(chrNames)
+    scc = np.full((len(hs), len(chrNames)), -2.0)
+    for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+        scc[:, iChr] = sccOfChrByH(cool1, cool2, chrName, hs, dMax,
+                                   bDownSample, n1, n2, seed, cache, profiler,
+                                   dtype)
+    return scc
+
+
+def selectH(hs: list, scc: np.ndarray, minIncrease: float = 0.01):
+    """Select the smoothing window half-size by the stabilization of the SCC
+    score as in the original R implementation of HiCRep: the half-sizes are
+    scanned in increasing order and the first one whose SCC score, rounded to
+    2 decimal places, increases by less than `minIncrease` when the half-size
+    increases by 1 is selected. The original publication recommends training
+    the half-size on down sampled data
+
+    Args:
+        hs: `list` of `int` consecutive increasing half-sizes
+        scc: `np.ndarray` scc scores for each half-size as the first axis. If
+        it has more than one axis, e.g., one score per chromosome as returned
+        by `hicrepSCCByH`, the mean over the other axes is used
+        minIncrease: `float` Minimal increase of the SCC score to keep
+        increasing the half-size. Default to 0.01
+
+    Returns:
+        `int` selected half-size
+    """
+    assert np.all(np.diff(hs) == 1),\
+        f"Half-sizes must be consecutive increasing integers to select from"
+    scc = np.asarray(scc, dtype=float)
+    sccH = np.round(np.nanmean(scc.reshape(len(hs), -1), axis=1), 2)
+    for iH in range(len(hs) - 1):
+        if np.round(sccH[iH + 1] - sccH[iH], 2) < minIncrease:
+            return hs[iH]
+    return hs[-1]
+
+
+def sccOfChrMultiRes(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                     chrName: str, factors: list, hs: list, dMaxs: list,
+                     bDownSample: bool, n1: float, n2: float,
+                     seed: int = None, cache: BandCache = None,
+                     dtype=np.float64):
+    """Compute the hicrep SCC score of one chromosome at several resolutions
+    that are multiples of the resolution of the inputs. The inputs are read
+    only once and aggregated in memory into each coarser resolution
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        chrName: `str` Name of the chromosome
+        factors: `list` of `int` Number of bins of the inputs aggregated into
+        one bin at each resolution
+        hs: `list` of `int` Half-size of the mean filter at each resolution
+        dMaxs: `list` of `int` Exclusive upper bound of the diagonal index to
+        include at each resolution
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input
+        n1: `float` Total number of contacts in input 1 used for normalization
+        n2: `float` Total number of contacts in input 2 used for normalization
+        seed: `int` Seed of the random number generator used for down
+        sampling. Default to None, which means the global numpy random state
+        is used
+        cache: `BandCache` Cache of the coarsened and smoothed bands. An input
+        is only read if one of its resolutions isn't in the cache. It's not
+        used when bDownSample is True. Default to None
+        dtype: Data type in which the bands are coarsened, normalized,
+        smoothed and stored. The scc statistics are accumulated in float64
+        regardless. Default to np.float64
+
+    Returns:
+        `np.ndarray` scc scores of the chromosome at each resolution
+    """
+    # read all the diagonals that fall within dMax at any resolution
+    nDiags = max(dMax * factor for factor, dMax in zip(factors, dMaxs))
+    cools = [cool1, cool2]
+    ns = [n1, n2]
+    # input bands at the resolution of the inputs, read on first use
+    fines = [None, None]
+    rng = None if seed is None else np.random.default_rng(seed)
+    scc = np.full(len(factors), -2.0)
+    for iRes, (factor, h, dMax) in enumerate(zip(factors, hs, dMaxs)):
+        bs = [None, None]
+        keys = [None, None]
+        if cache is not None and not bDownSample:
+            keys = [cache.key(cool, chrName, h, dMax, f"sum:coarsen:{factor}",
+                              dtype) for cool in cools]
+            bs = [cache.get(key) for key in keys]
+        for i in range(2):
+            if bs[i] is not None:
+                continue
+            if fines[i] is None:
+                fines[i] = streamSubBand(cools[i], chrName, nDiags,
+                                         dtype=dtype)
+                fines[i].data = fines[i].data.astype(dtype, copy=False)
+            bs[i] = coarsenBand(fines[i], factor, dMax)
+            if not bDownSample:
+                bs[i].data /= ns[i]
+                if h > 0:
+                    bs[i] = meanFilterBand(bs[i], h)
+                if cache is not None:
+                    cache.put(keys[i], bs[i])
+        c1, c2 = bs
+        assert c1.data.shape == c2.data.shape,\
             "Contact matrices of chromosome %s have different input shape" % (chrName)
-        nDiags = mS1.shape[0] if dMax < 0 else min(dMax, mS1.shape[0])
-        rho = np.full(nDiags, np.nan)
-        ws = np.full(nDiags, np.nan)
-        # remove major diagonal and all the diagonals >= nDiags
-        # to save computation time
-        m1 = trimDiags(mS1, nDiags, False)
-        m2 = trimDiags(mS2, nDiags, False)
-        del mS1
-        del mS2
         if bDownSample:
-            # do downsampling
-            size1 = m1.sum()
-            size2 = m2.sum()
+            size1 = c1.data.sum(dtype=np.float64)
+            size2 = c2.data.sum(dtype=np.float64)
             if size1 > size2:
-                m1 = resample(m1, size2).astype(float)
+                c1 = resampleBand(c1, size2, rng)
             elif size2 > size1:
-                m2 = resample(m2, size1).astype(float)
+                c2 = resampleBand(c2, size1, rng)
+            if h > 0:
+                c1 = meanFilterBand(c1, h)
+                c2 = meanFilterBand(c2, h)
+        scc[iRes] = sccByDiag(c1, c2, c1.nDiags)
+    return scc
+
+
+def hicrepSCCMultiRes(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                      binSizes: list, hs: list, dBPMaxs: list,
+                      bDownSample: bool, chrNames: list = None,
+                      excludeChr: set = None, rng: np.random.Generator = None,
+                      cache: BandCache = None, dtype=np.float64):
+    """Compute hicrep score between two input Cooler contact matrices at
+    several resolutions from a single read of each chromosome at the
+    resolution of the inputs. This gives the same scores as `hicrepSCC` on the
+    coarser resolutions of a mcool file created by `cooler zoomify`
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1 at the finest
+        resolution
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2 at the finest
+        resolution
+        binSizes: `list` of `int` Bin sizes to compute SCC at, each of which
+        must be a multiple of the bin size of the inputs
+        hs: `list` of `int` Half-size of the mean filter at each bin size
+        dBPMaxs: `list` of `int` Only include contacts that are at most this
+        genomic distance (bp) away at each bin size. -1 means no limit
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        rng: `np.random.Generator` Random number generator from which the
+        seeds of the per-chromosome down sampling are drawn when bDownSample
+        is True. Default to None, which means the global numpy random state
+        is used
+        cache: `BandCache` On-disk cache of the coarsened and smoothed bands.
+        It's not used when bDownSample is True. Default to None
+        dtype: Data type in which the contact matrices are coarsened,
+        normalized, smoothed and stored as in `hicrepSCC`. Default to
+        np.float64
+
+    Returns:
+        `np.ndarray` of shape (len(binSizes), number of chromosomes) scc
+        scores for each bin size and chromosome
+    """
+    assert len(binSizes) == len(hs) == len(dBPMaxs),\
+        f"Please provide one h and one dBPMax for each bin size"
+    binSize = checkCoolers(cool1, cool2)
+    assert cool1.binsize is not None,\
+        f"Input cool files must have uniform bins to be coarsened"
+    assert all(b > 0 and b % binSize == 0 for b in binSizes),\
+        f"Bin sizes {binSizes} must be multiples of the input bin size {binSize}"
+    factors = [b // binSize for b in binSizes]
+    nBins = coolerInfo(cool1, 'nbins')
+    dMaxs = [-(-nBins // factor) if dBPMax == -1 else
+             diagCutoff(cool1, b, dBPMax)
+             for factor, b, dBPMax in zip(factors, binSizes, dBPMaxs)]
+    n1 = coolerInfo(cool1, 'sum')
+    n2 = coolerInfo(cool2, 'sum')
+    chrNames = selectChrNames(cool1, chrNames, excludeChr)
+    seeds = drawSeeds(rng, len(chrNames)) if bDownSample else\
+        [None] * len(chrNames)
+    scc = np.full((len(binSizes), len(chrNames)), -2.0)
+    for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+        scc[:, iChr] = sccOfChrMultiRes(cool1, cool2, chrName, factors, hs,
+                                        dMaxs, bDownSample, n1, n2, seed,
+                                        cache, dtype)
+    return scc
+
+
+def accumulateDiagStats(stats: np.ndarray, x: np.ndarray, y: np.ndarray,
+                        lo: np.ndarray, hi: np.ndarray, sign: float):
+    """Add to or subtract from the per-diagonal sufficient statistics of
+    `sccFromDiagStats` the elements of a range of columns of each diagonal of
+    two inputs
+
+    Args:
+        stats: `np.ndarray` of shape (6, number of diagonals) statistics in
+        the order returned by `diagStatsDense`, updated in place
+        x: `np.ndarray` diagonals of input matrix 1 as rows
+        y: `np.ndarray` diagonals of input matrix 2 as rows
+        lo: `np.ndarray` inclusive lower bound of the columns of each diagonal
+        hi: `np.ndarray` exclusive upper bound of the columns of each diagonal
+        sign: `float` 1 to add or -1 to subtract the elements
+    """
+    lengths = np.maximum(hi - lo, 0)
+    nElems = lengths.sum()
+    if nElems == 0:
+        return
+    nD = lengths.size
+    iDiag = np.repeat(np.arange(nD), lengths)
+    iCol = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) +\
+        np.arange(nElems)
+    xs = x[iDiag, iCol].astype(np.float64)
+    ys = y[iDiag, iCol].astype(np.float64)
+    for stat, weights in zip(stats, [(xs != 0) | (ys != 0), xs, ys, xs * xs,
+                                     ys * ys, xs * ys]):
+        stat += sign * np.bincount(iDiag, weights=weights, minlength=nD)
+
+
+def sccByBandWindows(b1: DiagBand, b2: DiagBand, nDiags: int, winBins: int,
+                     stepBins: int):
+    """Compute hicrep SCC scores of the two input `DiagBand`s restricted to
+    sliding windows of bins, i.e., over the elements (i, j) with both i and
+    j within the window, on the diagonals whose index is in the range
+    [1, nDiags). The per-diagonal statistics are updated from one window to
+    the next by adding the elements entering the window and subtracting
+    those leaving it, so the cost of each step scales with the step instead
+    of the window size. To bound the round-off accumulated by these updates,
+    the statistics are summed from scratch instead once the windows moved by
+    `WINDOW_RESUM` window sizes since they were last summed
+
+    Args:
+        b1 (DiagBand): input band of contact matrix 1
+        b2 (DiagBand): input band of contact matrix 2
+        nDiags (int): use diagonals with index in the range [1, nDiags)
+        winBins (int): number of bins of each window
+        stepBins (int): number of bins between the starts of the windows
+    Returns: tuple of 2 `np.ndarray`, the first bin of each window relative
+    to the band and the scc score of each window. If the last window doesn't
+    reach the end of the band, a final window ending at the end of the band is
+    added. If the band has fewer bins than `winBins`, there's a single window
+    of the whole band
+    """
+    assert b1.data.shape == b2.data.shape and b1.diagOffset == b2.diagOffset,\
+        "sccByBandWindows input bands have different shapes"
+    assert winBins > 0 and stepBins > 0,\
+        f"Invalid window size {winBins} and step {stepBins}"
+    rowLo = max(1 - b1.diagOffset, 0)
+    rowHi = max(min(nDiags, b1.nDiags) - b1.diagOffset, rowLo)
+    x = b1.data[rowLo:rowHi]
+    y = b2.data[rowLo:rowHi]
+    d = np.arange(rowLo, rowHi) + b1.diagOffset
+    nBins = b1.nBins
+    starts = np.arange(0, max(nBins - winBins, 0) + 1, stepBins)
+    if starts[-1] + winBins < nBins:
+        starts = np.append(starts, nBins - winBins)
+    scc = np.empty(starts.size)
+    stats = np.zeros((6, d.size))
+    # element (i, i + d) is in the window [s, e) if s <= i < e - d
+    lo = np.zeros(d.size, dtype=np.int64)
+    hi = np.zeros(d.size, dtype=np.int64)
+    # number of bins the window moved since the statistics were last summed
+    # from scratch
+    nMoved = 0
+    for iWin, start in enumerate(starts):
+        stop = min(start + winBins, nBins)
+        newLo = np.full(d.size, start)
+        newHi = np.maximum(stop - d, start)
+        nMoved += start - lo[0] if d.size > 0 else 0
+        if nMoved >= WINDOW_RESUM * winBins:
+            # bound the round-off accumulated by the updates
+            stats[:] = 0
+            accumulateDiagStats(stats, x, y, newLo, newHi, 1)
+            nMoved = 0
         else:
-            # just normalize by total contacts
-            m1 = m1.astype(float) / n1
-            m2 = m2.astype(float) / n2
+            # both bounds only move forward
+            accumulateDiagStats(stats, x, y, lo, np.minimum(hi, newLo), -1)
+            accumulateDiagStats(stats, x, y, np.maximum(hi, newLo), newHi, 1)
+        lo, hi = newLo, newHi
+        scc[iWin] = sccFromDiagStats(*stats)
+    return starts, scc
+
+
+def hicrepSCCWindows(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                     h: int, dBPMax: int, bDownSample: bool, winBP: int,
+                     stepBP: int, chrNames: list = None,
+                     excludeChr: set = None, cache: BandCache = None,
+                     rng: np.random.Generator = None):
+    """Compute hicrep scores between two input Cooler contact matrices over
+    sliding genomic windows along each chromosome with `sccByBandWindows`.
+    Each chromosome is read, normalized and smoothed once as in `hicrepSCC`,
+    so the smoothing near the window edges uses the contacts outside of the
+    window
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Down sample the input with more contacts
+        to the same number of contacts as in the other input on each
+        chromosome
+        winBP: `int` Size of the windows in bp, which must be a multiple of
+        the bin size
+        stepBP: `int` Distance between the starts of the windows in bp, which
+        must be a multiple of the bin size
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        cache: `BandCache` On-disk cache of the smoothed bands. It's not used
+        when bDownSample is True. Default to None
+        rng: `np.random.Generator` Random number generator from which the
+        seeds of the per-chromosome down sampling are drawn when bDownSample
+        is True. Default to None, which means the global numpy random state
+        is used
+
+    Returns:
+        `list` of one `tuple` per chromosome of its name and 3 `np.ndarray`,
+        the start (bp), end (bp) and scc score of each window
+    """
+    binSize = checkCoolers(cool1, cool2)
+    dMax = diagCutoff(cool1, binSize, dBPMax)
+    assert winBP > 0 and stepBP > 0 and winBP % binSize == 0 and\
+        stepBP % binSize == 0,\
+        f"Window size {winBP} and step {stepBP} must be positive multiples "\
+        f"of the bin size {binSize}"
+    winBins = winBP // binSize
+    stepBins = stepBP // binSize
+    n1 = coolerInfo(cool1, 'sum')
+    n2 = coolerInfo(cool2, 'sum')
+    chrNames = selectChrNames(cool1, chrNames, excludeChr)
+    seeds = drawSeeds(rng, len(chrNames)) if bDownSample else\
+        [None] * len(chrNames)
+    results = []
+    for chrName, seed in zip(chrNames, seeds):
+        b1, b2 = pairBands(cool1, cool2, chrName, h, dMax, bDownSample, n1, n2,
+                           seed, cache)
+        starts, scc = sccByBandWindows(b1, b2, b1.nDiags, winBins, stepBins)
+        binLo, binHi = cool1.extent(chrName)
+        with cool1.open('r') as grp:
+            binStarts = grp['bins/start'][binLo:binHi]
+            binEnds = grp['bins/end'][binLo:binHi]
+        stops = np.minimum(starts + winBins, binHi - binLo)
+        results.append((chrName, binStarts[starts], binEnds[stops - 1], scc))
+    return results
+
+
+def sccOfChrBootstrap(b1: DiagBand, b2: DiagBand, h: int, nReplicates: int,
+                      bDownSample: bool, rng: np.random.Generator = None):
+    """Compute the hicrep scores of bootstrap replicates of one chromosome.
+    Each replicate resamples the contacts of both unsmoothed bands with
+    replacement, to the number of contacts of each band or, with bDownSample,
+    of the band with fewer contacts. The replicates are drawn as one matrix
+    per input in a single multinomial draw from the non-zero elements found
+    once, stacked along a trailing axis and smoothed and scored together, at
+    most `BOOTSTRAP_BLOCK` elements per input at a time. The scores don't
+    depend on the normalization of the bands, so they're not normalized
+
+    Args:
+        b1: `DiagBand` unsmoothed band of input 1 as returned by
+        `streamSubBand`
+        b2: `DiagBand` unsmoothed band of input 2 of the same shape
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        nReplicates: `int` Number of bootstrap replicates
+        bDownSample: `bool` Resample both inputs to the number of contacts of
+        the input with fewer contacts
+        rng: `np.random.Generator` Random number generator. Default to None,
+        which means the global numpy random state is used
+
+    Returns:
+        `np.ndarray` of the scc score of each replicate
+    """
+    assert b1.data.shape == b2.data.shape and b1.diagOffset == b2.diagOffset,\
+        "sccOfChrBootstrap input bands have different shapes"
+    idx1 = np.flatnonzero(b1.data)
+    idx2 = np.flatnonzero(b2.data)
+    size1 = b1.data.sum(dtype=np.float64)
+    size2 = b2.data.sum(dtype=np.float64)
+    if bDownSample:
+        size1 = size2 = min(size1, size2)
+    rows = slice(max(1 - b1.diagOffset, 0), max(b1.nDiags - b1.diagOffset, 0))
+    step = max(BOOTSTRAP_BLOCK // max(b1.data.size, 1), 1)
+    scc = np.empty(nReplicates)
+    for i in range(0, nReplicates, step):
+        nDraws = min(step, nReplicates - i)
+        x = resampleBandReplicates(b1, size1, nDraws, rng, idx1)
+        y = resampleBandReplicates(b2, size2, nDraws, rng, idx2)
         if h > 0:
-            # apply smoothing
-            m1 = meanFilterSparse(m1, h)
-            m2 = meanFilterSparse(m2, h)
-        scc[iChr] = sccByDiag(m1, m2, nDiags)
+            x = meanFilterDiags(x, b1.diagOffset, h, b1.diagOffset, b1.nDiags)
+            y = meanFilterDiags(y, b2.diagOffset, h, b2.diagOffset, b2.nDiags)
+        # the statistics have the replicates along the last axis while
+        # sccFromDiagStats reduces the diagonals along the last axis
+        stats = diagStatsDense(x[rows], y[rows])
+        scc[i:(i + nDraws)] = sccFromDiagStats(*(stat.T for stat in stats))
     return scc
+
+
+def hicrepSCCBootstrap(cool1: cooler.api.Cooler, cool2: cooler.api.Cooler,
+                       h: int, dBPMax: int, bDownSample: bool,
+                       nReplicates: int = 100, chrNames: list = None,
+                       excludeChr: set = None,
+                       rng: np.random.Generator = None, dtype=np.float64):
+    """Compute the hicrep scores of bootstrap replicates of each chromosome
+    between two input Cooler contact matrices, reading each chromosome only
+    once. See `sccOfChrBootstrap`
+
+    Args:
+        cool1: `cooler.api.Cooler` Input Cooler contact matrix 1
+        cool2: `cooler.api.Cooler` Input Cooler contact matrix 2
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        bDownSample: `bool` Resample both inputs to the number of contacts of
+        the input with fewer contacts on each chromosome
+        nReplicates: `int` Number of bootstrap replicates. Default to 100
+        chrNames: `list` List of chromosome names whose SCC to
+        compute. Default to None, which means all chromosomes in the
+        genome are used to compute SCC
+        excludeChr: `set` Set of chromosome names to exclude from SCC
+        computation. Default to None.
+        rng: `np.random.Generator` Random number generator from which the
+        seed of each chromosome is drawn. Default to None, which means the
+        global numpy random state is used
+        dtype: Data type in which the replicates are smoothed. The scc
+        statistics are accumulated in float64 regardless. Default to
+        np.float64
+
+    Returns:
+        `np.ndarray` of shape (number of chromosomes, nReplicates) of scc
+        scores
+    """
+    assert nReplicates > 0, f"Invalid number of replicates {nReplicates}"
+    binSize = checkCoolers(cool1, cool2)
+    dMax = diagCutoff(cool1, binSize, dBPMax)
+    chrNames = selectChrNames(cool1, chrNames, excludeChr)
+    seeds = drawSeeds(rng, len(chrNames))
+    scc = np.empty((len(chrNames), nReplicates))
+    for iChr, (chrName, seed) in enumerate(zip(chrNames, seeds)):
+        b1 = streamSubBand(cool1, chrName, dMax, dtype=dtype)
+        b2 = streamSubBand(cool2, chrName, dMax, dtype=dtype)
+        assert b1.data.shape == b2.data.shape,\
+            "Contact matrices of chromosome %s have different input shape"\
+            % (chrName)
+        scc[iChr] = sccOfChrBootstrap(b1, b2, h, nReplicates, bDownSample,
+                                      np.random.default_rng(seed))
+    return scc
+
+
+def bootstrapSummary(scc: np.ndarray, ci: float = 0.95):
+    """Summarize the bootstrap replicates of the scc scores, ignoring the
+    replicates whose score is NaN
+
+    Args:
+        scc: `np.ndarray` of shape (number of chromosomes, number of
+        replicates) as returned by `hicrepSCCBootstrap`
+        ci: `float` Coverage of the percentile confidence interval. Default to
+        0.95
+
+    Returns:
+        `tuple` of 4 `np.ndarray` with one element per chromosome, the mean,
+        the standard deviation and the lower and upper bounds of the
+        confidence interval of the scores
+    """
+    assert 0 < ci < 1, f"Invalid confidence interval coverage {ci}"
+    alpha = (1 - ci) / 2
+    with warnings.catch_warnings():
+        # chromosomes without valid scores give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return (np.nanmean(scc, axis=1), np.nanstd(scc, axis=1, ddof=1),
+                np.nanquantile(scc, alpha, axis=1),
+                np.nanquantile(scc, 1 - alpha, axis=1))
@@ -0,0 +1,337 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: index.py
+# Description: Memory-mapped index of the smoothed contact matrices of a
+# library of reference Cooler files against which one sample is scored at once
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+import json
+import numpy as np
+import cooler
+from hicrep.utils import DiagBand, coolerInfo, coolerDatasetHash
+from hicrep.cache import BandCache, atomicWrite
+from hicrep.hicrep import (
+    checkCoolers, diagCutoff, selectChrNames, smoothedBand, sccFromDiagStats
+    )
+
+# First bytes of an index file
+INDEX_MAGIC = b"HICREPIX"
+
+# Bump this whenever the layout of the index file changes
+INDEX_VERSION = 1
+
+# The arrays in an index file start at multiples of this many bytes
+INDEX_ALIGN = 64
+
+# Maximal number of elements of the reference bands converted to float64 and
+# multiplied with the query at a time by `ReferenceIndex.sccOfChr`
+INDEX_SCAN_BLOCK = 1 << 22
+
+# h5 datasets that must be identical between the references and the query
+INDEX_CHECKED_DATASETS = ['chroms/name', 'chroms/length']
+
+
+def alignOffset(offset: int):
+    """Round up a byte offset to a multiple of `INDEX_ALIGN`"""
+    return -(-offset // INDEX_ALIGN) * INDEX_ALIGN
+
+
+def bandStats(data: np.ndarray):
+    """Compute the per-diagonal statistics of a band that only depend on it
+
+    Args:
+        data: `np.ndarray` diagonals of a `DiagBand` as rows
+
+    Returns:
+        `np.ndarray` of shape (3, number of rows) of the sum, the sum of
+        squares and the number of non-zero elements of each row in float64
+    """
+    stats = np.empty((3, data.shape[0]))
+    for k, row in enumerate(data):
+        row = row.astype(np.float64, copy=False)
+        stats[0, k] = row.sum()
+        stats[1, k] = row @ row
+        stats[2, k] = np.count_nonzero(row)
+    return stats
+
+
+def buildReferenceIndex(fout: str, cools: dict, h: int, dBPMax: int,
+                        chrNames: list = None, excludeChr: set = None,
+                        cache: BandCache = None, dtype=np.float64):
+    """Write the normalized and smoothed bands of each chromosome of a library
+    of references, as used by `hicrepSCC` without down sampling, and their
+    per-diagonal sums, sums of squares and numbers of non-zero elements into
+    one index file. The file starts with `INDEX_MAGIC`, the size of the JSON
+    header as a little-endian uint64 and the header, which records the
+    parameters, the references and the byte offsets of the arrays. For each
+    chromosome, the bands of all the references are stored as one array of
+    shape (number of references, number of diagonals, number of bins),
+    followed by their statistics as a float64 array of shape (3, number of
+    references, number of diagonals). The file is written to a temporary file
+    that is moved to `fout` once complete
+
+    Args:
+        fout: `str` Output index file name
+        cools: `dict` mapping reference names to `cooler.api.Cooler` Input
+        Cooler contact matrices
+        h: `int` Half-size of the mean filter used to smooth the
+        input matrics
+        dBPMax `int` Only include contacts that are at most this genomic
+        distance (bp) away
+        chrNames: `list` List of chromosome names to index. Default to None,
+        which means all chromosomes
+        excludeChr: `set` Set of chromosome names to exclude. Default to None
+        cache: `BandCache` On-disk cache of the smoothed bands. Default to None
+        dtype: Data type in which the bands are normalized, smoothed and
+        stored. The statistics are always computed in float64. Default to
+        np.float64
+
+    Returns:
+        `dict` header of the index
+    """
+    assert len(cools) > 0, "The index needs at least 1 reference Cooler file"
+    names = list(cools)
+    cool0 = cools[names[0]]
+    binSize = checkCoolers(cool0, cool0)
+    for name in names[1:]:
+        assert checkCoolers(cool0, cools[name]) == binSize,\
+            f"Reference cool files have different bin sizes"
+    dMax = diagCutoff(cool0, binSize, dBPMax)
+    dtype = np.dtype(dtype)
+    nRefs = len(names)
+    chroms = []
+    offset = 0
+    for chrName in selectChrNames(cool0, chrNames, excludeChr):
+        binLo, binHi = cool0.extent(chrName)
+        nBins = binHi - binLo
+        # the shape of the bands returned by streamSubBand
+        nRows = max(min(dMax, nBins) - 1, 0)
+        bandsOffset = offset
+        statsOffset = alignOffset(bandsOffset +
+                                  nRefs * nRows * nBins * dtype.itemsize)
+        offset = alignOffset(statsOffset + 3 * nRefs * nRows * 8)
+        chroms.append(dict(name=chrName, binOffset=int(binLo), nBins=int(nBins),
+                           nRows=int(nRows), bandsOffset=int(bandsOffset),
+                           statsOffset=int(statsOffset)))
+    header = dict(
+        version=INDEX_VERSION, binSize=int(binSize), h=int(h), dMax=int(dMax),
+        dtype=dtype.str, references=names,
+        files=[cools[name].filename for name in names],
+        nContacts=[float(coolerInfo(cools[name], 'sum')) for name in names],
+        hashes={path: coolerDatasetHash(cool0, path)
+                for path in INDEX_CHECKED_DATASETS},
+        chroms=chroms, nbytes=int(offset))
+    headerBytes = json.dumps(header).encode('utf-8')
+    dataOffset = alignOffset(len(INDEX_MAGIC) + 8 + len(headerBytes))
+
+    def write(f):
+        f.write(INDEX_MAGIC)
+        f.write(np.uint64(len(headerBytes)).astype('<u8').tobytes())
+        f.write(headerBytes)
+        f.truncate(dataOffset + offset)
+        for chrom in chroms:
+            stats = np.empty((3, nRefs, chrom['nRows']))
+            for iRef, name in enumerate(names):
+                band = smoothedBand(cools[name], chrom['name'], h, dMax,
+                                    header['nContacts'][iRef], cache,
+                                    dtype=dtype)
+                assert band.data.shape == (chrom['nRows'], chrom['nBins']),\
+                    f"Band of chromosome {chrom['name']} of reference {name} "\
+                    f"has an unexpected shape {band.data.shape}"
+                f.seek(dataOffset + chrom['bandsOffset'] +
+                       iRef * band.data.size * dtype.itemsize)
+                f.write(np.ascontiguousarray(band.data, dtype=dtype).tobytes())
+                stats[:, iRef] = bandStats(band.data)
+            f.seek(dataOffset + chrom['statsOffset'])
+            f.write(stats.astype('<f8').tobytes())
+
+    atomicWrite(fout, write)
+    return header
+
+
+class ReferenceIndex:
+    """Read-only memory-mapped index of reference bands written by
+    `buildReferenceIndex`. A query sample is read and smoothed once per
+    chromosome and scored against all the references by scanning their bands
+    a block of references at a time: the cross products of every diagonal are
+    computed with batched dot products and combined with the precomputed
+    statistics of the references, so that no reference is read from its
+    Cooler file or smoothed again
+
+    Attributes:
+        fname: `str` Index file name
+        header: `dict` Header of the index, see `buildReferenceIndex`
+        references: `list` of `str` reference names
+        chroms: `dict` mapping chromosome names to their entries of the header
+        dtype: Data type of the stored bands
+    """
+
+    def __init__(self, fname: str):
+        self.fname = fname
+        with open(fname, 'rb') as f:
+            magic = f.read(len(INDEX_MAGIC))
+            assert magic == INDEX_MAGIC, f"{fname} is not a hicrep index file"
+            size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            self.header = json.loads(f.read(size).decode('utf-8'))
+        assert self.header['version'] == INDEX_VERSION,\
+            f"Index {fname} has version {self.header['version']} but "\
+            f"version {INDEX_VERSION} is expected. Please rebuild it"
+        self.references = self.header['references']
+        self.chroms = {chrom['name']: chrom for chrom in self.header['chroms']}
+        self.dtype = np.dtype(self.header['dtype'])
+        dataOffset = alignOffset(len(INDEX_MAGIC) + 8 + size)
+        assert os.path.getsize(fname) >= dataOffset + self.header['nbytes'],\
+            f"Index {fname} is truncated"
+        self.data = np.memmap(fname, dtype=np.uint8, mode='r',
+                              offset=dataOffset, shape=(self.header['nbytes'],))
+
+    @property
+    def binSize(self):
+        """`int` bin size of the references"""
+        return self.header['binSize']
+
+    @property
+    def chrNames(self):
+        """`list` names of the indexed chromosomes"""
+        return list(self.chroms)
+
+    def bands(self, chrName: str):
+        """Return the bands of one chromosome of all the references
+
+        Args:
+            chrName: `str` Chromosome name
+
+        Returns:
+            `np.ndarray` memory-mapped array of shape (number of references,
+            number of diagonals, number of bins)
+        """
+        chrom = self.chroms[chrName]
+        shape = (len(self.references), chrom['nRows'], chrom['nBins'])
+        nbytes = int(np.prod(shape)) * self.dtype.itemsize
+        start = chrom['bandsOffset']
+        return self.data[start:(start + nbytes)].view(self.dtype).reshape(shape)
+
+    def stats(self, chrName: str):
+        """Return the per-diagonal statistics of one chromosome of all the
+        references
+
+        Args:
+            chrName: `str` Chromosome name
+
+        Returns:
+            `np.ndarray` memory-mapped array of shape (3, number of
+            references, number of diagonals) of the sums, the sums of squares
+            and the numbers of non-zero elements
+        """
+        chrom = self.chroms[chrName]
+        shape = (3, len(self.references), chrom['nRows'])
+        start = chrom['statsOffset']
+        return self.data[start:(start + int(np.prod(shape)) * 8)]\
+            .view('<f8').reshape(shape)
+
+    def checkQuery(self, cool: cooler.api.Cooler):
+        """Check that a query Cooler contact matrix has the same binning and
+        chromosomes as the references
+
+        Args:
+            cool: `cooler.api.Cooler` Query Cooler contact matrix
+        """
+        assert cool.binsize == self.binSize,\
+            f"Query has bin size {cool.binsize} but the index has bin size "\
+            f"{self.binSize}"
+        for path, digest in self.header['hashes'].items():
+            assert coolerDatasetHash(cool, path) == digest,\
+                f"Query and index have different chromosome names or lengths"
+
+    def sccOfChr(self, band: DiagBand, chrName: str):
+        """Compute the hicrep scores of one chromosome between a smoothed
+        query band and all the references
+
+        Args:
+            band: `DiagBand` smoothed band of the query as returned by
+            `smoothedBand` with the parameters of the index
+            chrName: `str` Chromosome name
+
+        Returns:
+            `np.ndarray` scc score of each reference
+        """
+        bands = self.bands(chrName)
+        stats = self.stats(chrName)
+        assert band.data.shape == bands.shape[1:],\
+            f"Query band of chromosome {chrName} has shape {band.data.shape} "\
+            f"but the index has shape {bands.shape[1:]}"
+        y = band.data.astype(np.float64, copy=False)
+        yStats = bandStats(y)
+        bNZY = y != 0
+        nRefs = bands.shape[0]
+        sumXY = np.zeros((nRefs, y.shape[0]))
+        nnzXY = np.zeros((nRefs, y.shape[0]))
+        step = max(INDEX_SCAN_BLOCK // max(y.size, 1), 1)
+        for i in range(0, nRefs, step):
+            x = bands[i:(i + step)].astype(np.float64, copy=False)
+            # one dot product per reference and diagonal
+            sumXY[i:(i + step)] = np.einsum('ikj,kj->ik', x, y)
+            nnzXY[i:(i + step)] = np.count_nonzero((x != 0) & bNZY, axis=2)
+        return sccFromDiagStats(stats[2] + yStats[2] - nnzXY, stats[0],
+                                yStats[0], stats[1], yStats[1], sumXY)
+
+    def scores(self, cool: cooler.api.Cooler, chrNames: list = None,
+               cache: BandCache = None):
+        """Compute the hicrep scores of each chromosome between a query and
+        all the references. The query is read and smoothed once per chromosome
+
+        Args:
+            cool: `cooler.api.Cooler` Query Cooler contact matrix
+            chrNames: `list` Names of the chromosomes to score. Default to
+            None, meaning all the indexed chromosomes
+            cache: `BandCache` On-disk cache of the smoothed bands of the query.
+            Default to None
+
+        Returns:
+            `np.ndarray` of shape (number of references, number of
+            chromosomes) of scc scores
+        """
+        self.checkQuery(cool)
+        if chrNames is None:
+            chrNames = self.chrNames
+        for chrName in chrNames:
+            assert chrName in self.chroms,\
+                f"Chromosome {chrName} is not in the index"
+        n = coolerInfo(cool, 'sum')
+        scc = np.empty((len(self.references), len(chrNames)))
+        for j, chrName in enumerate(chrNames):
+            band = smoothedBand(cool, chrName, self.header['h'],
+                                self.header['dMax'], n, cache,
+                                dtype=self.dtype)
+            scc[:, j] = self.sccOfChr(band, chrName)
+        return scc
+
+    def query(self, cool: cooler.api.Cooler, k: int = 10,
+              chrNames: list = None, cache: BandCache = None):
+        """Find the references most similar to a query, ranked by the mean of
+        their scc scores over the chromosomes, ignoring NaN scores
+
+        Args:
+            cool: `cooler.api.Cooler` Query Cooler contact matrix
+            k: `int` Number of references to return. Default to 10
+            chrNames: `list` Names of the chromosomes to score. Default to
+            None, meaning all the indexed chromosomes
+            cache: `BandCache` On-disk cache of the smoothed bands of the query.
+            Default to None
+
+        Returns:
+            `list` of at most k `tuple` of the reference name, its mean scc
+            score and `np.ndarray` of its scc score of each chromosome, from
+            the most similar
+        """
+        scc = self.scores(cool, chrNames, cache)
+        nValid = np.isfinite(scc).sum(axis=1)
+        meanScc = np.where(nValid > 0,
+                           np.nansum(scc, axis=1) / np.maximum(nValid, 1),
+                           np.nan)
+        # NaN sort last
+        order = np.argsort(-meanScc, kind='stable')[:k]
+        return [(self.references[i], float(meanScc[i]), scc[i]) for i in order]
@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: prefetch.py
+# Description: Background reading of the next chromosomes while the current
+# one is being computed
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import queue
+import threading
+
+# Marks the end of the items in the queue of a Prefetcher
+PREFETCH_DONE = object()
+
+
+class Prefetcher:
+    """Call a function on each of a list of items in a background thread ahead
+    of the consumer, e.g., to read the next chromosomes from disk while the
+    current one is being smoothed and scored. The results are yielded in the
+    order of the items. At most `depth` results wait in the queue, so at most
+    `depth + 1` results are held besides the one being consumed. An exception
+    raised by the function is re-raised to the consumer
+
+    Use as a context manager so that the background thread is stopped even if
+    the consumer stops early:
+
+        with Prefetcher(fetch, items, depth=1) as prefetcher:
+            for item, result in prefetcher:
+                ...
+
+    Attributes:
+        queue: `queue.Queue` bounded queue of the results
+    """
+
+    def __init__(self, fetch, items: list, depth: int = 1):
+        assert depth > 0, f"Prefetch queue depth must be positive"
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       args=(fetch, list(items)), daemon=True)
+        self.thread.start()
+
+    def run(self, fetch, items: list):
+        """Body of the background thread
+
+        Args:
+            fetch: callable taking one item
+            items: `list` of items
+        """
+        for item in items:
+            try:
+                result = (item, fetch(item), None)
+            except BaseException as e:
+                result = (item, None, e)
+            if not self.put(result) or result[2] is not None:
+                return
+        self.put(PREFETCH_DONE)
+
+    def put(self, result):
+        """Put a result in the queue, waiting for space in the queue until the
+        prefetcher is closed
+
+        Args:
+            result: the result to put
+
+        Returns:
+            `bool` whether the result is put before the prefetcher is closed
+        """
+        while not self.stopEvent.is_set():
+            try:
+                self.queue.put(result, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        while True:
+            result = self.queue.get()
+            if result is PREFETCH_DONE:
+                return
+            item, value, error = result
+            if error is not None:
+                raise error
+            yield item, value
+
+    def close(self):
+        """Stop the background thread and drop the results not consumed"""
+        self.stopEvent.set()
+        self.thread.join()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,168 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: profiler.py
+# Description: Per-stage timing and memory instrumentation of the hicrep
+# pipeline
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import sys
+import json
+import time
+import tracemalloc
+import numpy as np
+from contextlib import contextmanager, nullcontext
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# Columns of the profiling report
+PROFILE_FIELDS = ['chrName', 'stage', 'sample', 'wallSeconds', 'cpuSeconds',
+                  'nnzIn', 'nnzOut', 'peakAllocMB', 'maxRssMB']
+
+
+def nnzOf(m):
+    """Return the number of non-zero elements of a `DiagBand`, a scipy sparse
+    matrix or a numpy array, or None if the input is None
+
+    Args:
+        m: input matrix
+
+    Returns:
+        `int` number of non-zero elements
+    """
+    if m is None:
+        return None
+    if hasattr(m, 'nnz'):
+        return int(m.nnz)
+    return int(np.count_nonzero(getattr(m, 'data', m)))
+
+
+def maxRssMB():
+    """Return the peak resident set size of the current process in MB or None
+    if it's not available on this platform
+
+    Returns:
+        `float` peak resident set size in MB
+    """
+    if resource is None:
+        return None
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return maxRss / 2**20 if sys.platform == 'darwin' else maxRss / 2**10
+
+
+class StageProfiler:
+    """Record the wall time, CPU time, number of non-zero elements going in
+    and out, and the peak memory of each stage of the pipeline. The peak
+    memory is reported as the high-water mark of the resident set size of
+    the process at the end of the stage and, if bTraceMemory is set, as the
+    peak of the bytes allocated through tracemalloc during the stage, which is
+    started by the profiler if it's not already tracing. As tracemalloc slows
+    down every allocation, the latter is off by default
+
+    Attributes:
+        records: `list` of `dict` one per stage run with keys in
+        `PROFILE_FIELDS`
+        bTraceMemory: `bool` Whether the peak allocated memory is recorded
+        with tracemalloc. Default to False
+    """
+
+    def __init__(self, bTraceMemory: bool = False):
+        self.records = []
+        self.bTraceMemory = bTraceMemory
+        self.bStartedTracing = bTraceMemory and not tracemalloc.is_tracing()
+        if self.bStartedTracing:
+            tracemalloc.start()
+
+    def stop(self):
+        """Stop tracemalloc if it was started by this profiler. The records
+        are kept but no more stage should be profiled afterwards
+        """
+        if self.bStartedTracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.bStartedTracing = False
+
+    @contextmanager
+    def stage(self, stage: str, chrName: str, sample: int = None, mIn=None):
+        """Context manager that records one run of a stage. The caller can set
+        the output of the stage as 'output' of the yielded record so that its
+        number of non-zero elements is recorded
+
+        Args:
+            stage: `str` name of the stage
+            chrName: `str` name of the chromosome
+            sample: `int` index of the input the stage runs on. Default to
+            None, meaning the stage runs on both inputs
+            mIn: input matrix of the stage whose number of non-zero elements
+            is recorded. Default to None
+
+        Yields:
+            `dict` record of the stage
+        """
+        record = dict.fromkeys(PROFILE_FIELDS)
+        record.update(chrName=chrName, stage=stage, sample=sample,
+                      nnzIn=nnzOf(mIn))
+        # tracemalloc.reset_peak() is only available since python 3.9
+        bResetPeak = self.bTraceMemory and hasattr(tracemalloc, 'reset_peak')
+        if bResetPeak:
+            tracemalloc.reset_peak()
+            allocStart = tracemalloc.get_traced_memory()[0]
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wallSeconds'] = time.perf_counter() - wallStart
+            record['cpuSeconds'] = time.process_time() - cpuStart
+            if bResetPeak:
+                record['peakAllocMB'] =\
+                    (tracemalloc.get_traced_memory()[1] - allocStart) / 2**20
+            record['maxRssMB'] = maxRssMB()
+            record['nnzOut'] = nnzOf(record.pop('output', None))
+            self.records.append(record)
+
+    def toTSV(self, fout: str):
+        """Write the records as a tab-separated table
+
+        Args:
+            fout: `str` Output file name
+        """
+        with open(fout, 'w') as f:
+            f.write("\t".join(PROFILE_FIELDS) + "\n")
+            for record in self.records:
+                f.write("\t".join("NA" if record[k] is None else str(record[k])
+                                  for k in PROFILE_FIELDS) + "\n")
+
+    def toJSON(self, fout: str):
+        """Write the records as a JSON list
+
+        Args:
+            fout: `str` Output file name
+        """
+        with open(fout, 'w') as f:
+            json.dump(self.records, f, indent=1)
+
+
+def profileStage(profiler: StageProfiler, stage: str, chrName: str,
+                 sample: int = None, mIn=None):
+    """Return `profiler.stage(...)` or a no-op context manager yielding a
+    throw-away record if `profiler` is None, so that the instrumented code
+    doesn't need to check whether profiling is enabled
+
+    Args:
+        profiler: `StageProfiler` or None
+        stage: `str` name of the stage
+        chrName: `str` name of the chromosome
+        sample: `int` index of the input the stage runs on
+        mIn: input matrix of the stage
+
+    Returns:
+        context manager yielding `dict` record of the stage
+    """
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(stage, chrName, sample, mIn)
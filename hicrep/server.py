@@ -0,0 +1,318 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: server.py
+# Description: Long-running local server that keeps the smoothed contact
+# matrices of a set of Cooler files in memory and answers SCC queries
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import json
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from hicrep.cache import BandCache
+from hicrep.hicrep import (
+    checkCoolers, diagCutoff, selectChrNames, smoothedBand, sccByDiag
+    )
+from hicrep.utils import coolerInfo
+
+
+class BandLRU:
+    """Thread-safe in-memory cache of `DiagBand`s bounded by the total size of
+    their data, evicting the least recently used ones. Concurrent requests of
+    the same missing entry wait for a single computation of it
+
+    Attributes:
+        maxBytes: `int` Maximal total size of the bands in bytes. None means
+        no limit. The entry just computed is never evicted, so one entry may
+        exceed the limit
+        nbytes: `int` Total size of the bands in bytes
+        hits: `int` Number of requests found in the cache
+        misses: `int` Number of requests computed
+    """
+
+    def __init__(self, maxBytes: int = None):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Return the band of a key, computing it if it's not cached
+
+        Args:
+            key: hashable key of the band
+            compute: callable without argument returning the `DiagBand`
+
+        Returns:
+            `DiagBand` of the key
+        """
+        with self.lock:
+            future = self.entries.get(key)
+            bCompute = future is None
+            if bCompute:
+                future = self.entries[key] = Future()
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if not bCompute:
+            return future.result()
+        try:
+            band = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.entries[key]
+            future.set_exception(e)
+            raise
+        future.set_result(band)
+        with self.lock:
+            self.nbytes += band.data.nbytes
+            self.evict(key)
+        return band
+
+    def evict(self, keep):
+        """Evict the least recently used computed entries other than `keep`
+        until the total size is within the limit. Must be called with the lock
+        held
+
+        Args:
+            keep: key of the entry not to evict
+        """
+        if self.maxBytes is None:
+            return
+        for key in list(self.entries):
+            if self.nbytes <= self.maxBytes:
+                break
+            future = self.entries[key]
+            if key == keep or not future.done():
+                continue
+            del self.entries[key]
+            self.nbytes -= future.result().data.nbytes
+
+
+class SCCServer:
+    """Smoothed bands of a set of Cooler files held in a `BandLRU` from which
+    the hicrep scores of any pair of them are computed without reading or
+    smoothing the inputs again. The bands are normalized and smoothed as in
+    `hicrepSCC` without down sampling. The scores of the pairs and
+    chromosomes of a request are computed concurrently on a pool of threads
+
+    Attributes:
+        cools: `dict` mapping sample names to `cooler.api.Cooler`
+        h: `int` Half-size of the mean filter used to smooth the inputs
+        dMax: `int` Exclusive upper bound of the diagonal index to include
+        chrNames: `list` Names of the chromosomes scored by default
+        bands: `BandLRU` Smoothed bands keyed by sample and chromosome names
+    """
+
+    def __init__(self, cools: dict, h: int, dBPMax: int,
+                 chrNames: list = None, excludeChr: set = None,
+                 maxBytes: int = None, nWorkers: int = 4,
+                 cache: BandCache = None, dtype=np.float64):
+        """
+        Args:
+            cools: `dict` mapping sample names to `cooler.api.Cooler` Input
+            Cooler contact matrices
+            h: `int` Half-size of the mean filter used to smooth the
+            input matrics
+            dBPMax `int` Only include contacts that are at most this genomic
+            distance (bp) away
+            chrNames: `list` List of chromosome names to score by default.
+            Default to None, which means all chromosomes
+            excludeChr: `set` Set of chromosome names to exclude. Default to
+            None
+            maxBytes: `int` Maximal total size of the bands held in memory.
+            Default to None, meaning no limit
+            nWorkers: `int` Number of threads computing the scores. Default to
+            4
+            cache: `BandCache` On-disk cache of the smoothed bands from which
+            the bands evicted from memory are read back. Default to None
+            dtype: Data type of the smoothed bands. Default to np.float64
+        """
+        assert len(cools) > 0, "SCCServer needs at least 1 input Cooler file"
+        self.cools = dict(cools)
+        names = list(self.cools)
+        cool0 = self.cools[names[0]]
+        binSize = checkCoolers(cool0, cool0)
+        for name in names[1:]:
+            assert checkCoolers(cool0, self.cools[name]) == binSize,\
+                f"Input cool files have different bin sizes"
+        self.h = h
+        self.dMax = diagCutoff(cool0, binSize, dBPMax)
+        self.chrNames = selectChrNames(cool0, chrNames, excludeChr)
+        self.ns = {name: coolerInfo(cool, 'sum')
+                   for name, cool in self.cools.items()}
+        self.bands = BandLRU(maxBytes)
+        self.cache = cache
+        self.dtype = dtype
+        self.pool = ThreadPoolExecutor(max_workers=nWorkers)
+
+    def band(self, name: str, chrName: str):
+        """Return the smoothed band of one chromosome of a sample
+
+        Args:
+            name: `str` Sample name
+            chrName: `str` Chromosome name
+
+        Returns:
+            `DiagBand` smoothed band
+        """
+        assert name in self.cools, f"Unknown sample {name}"
+        assert chrName in self.chrNames or chrName in\
+            self.cools[name].chromnames, f"Unknown chromosome {chrName}"
+        return self.bands.get(
+            (name, chrName),
+            lambda: smoothedBand(self.cools[name], chrName, self.h, self.dMax,
+                                 self.ns[name], self.cache, dtype=self.dtype))
+
+    def preload(self):
+        """Read and smooth all the chromosomes of all the samples"""
+        futures = [self.pool.submit(self.band, name, chrName)
+                   for name in self.cools for chrName in self.chrNames]
+        for future in futures:
+            future.result()
+
+    def sccOfChr(self, name1: str, name2: str, chrName: str):
+        """Compute hicrep score of one chromosome between two samples
+
+        Args:
+            name1: `str` First sample name
+            name2: `str` Second sample name
+            chrName: `str` Chromosome name
+
+        Returns:
+            `float` scc score
+        """
+        b1 = self.band(name1, chrName)
+        b2 = self.band(name2, chrName)
+        return float(sccByDiag(b1, b2, b1.nDiags))
+
+    def scc(self, query: str, references: list = None, chrNames: list = None):
+        """Compute hicrep scores between one sample and each of a list of
+        samples
+
+        Args:
+            query: `str` Sample name
+            references: `list` of `str` sample names. Default to None, meaning
+            all the samples other than `query`
+            chrNames: `list` Chromosome names to score. Default to None,
+            meaning the default chromosomes of the server
+
+        Returns:
+            `dict` mapping each reference to the `list` of scc scores of the
+            chromosomes
+        """
+        if references is None:
+            references = [name for name in self.cools if name != query]
+        if chrNames is None:
+            chrNames = self.chrNames
+        futures = {ref: [self.pool.submit(self.sccOfChr, query, ref, chrName)
+                         for chrName in chrNames]
+                   for ref in references}
+        return {ref: [future.result() for future in fs]
+                for ref, fs in futures.items()}
+
+    def stats(self):
+        """Return the state of the in-memory cache
+
+        Returns:
+            `dict` of the number of entries, their total size in bytes, the
+            size limit and the numbers of hits and misses
+        """
+        with self.bands.lock:
+            return dict(entries=len(self.bands.entries),
+                        nbytes=self.bands.nbytes,
+                        maxBytes=self.bands.maxBytes,
+                        hits=self.bands.hits, misses=self.bands.misses)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class SCCRequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface of the `SCCServer` set as the `scc` attribute of the
+    HTTP server. All responses are JSON:
+
+        GET /samples: {"samples": [...], "chrNames": [...]}
+        GET /stats: state of the in-memory cache, see `SCCServer.stats`
+        POST /scc with {"query": name, "references": [names],
+            "chrNames": [names]}, where "references" and "chrNames" are
+            optional: {"chrNames": [...], "scc": {reference: [scores]}}
+
+    Errors are reported with status 400 or 404 and {"error": message}.
+    Unexpected errors are logged to stderr and reported with status 500
+    """
+
+    def reply(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        scc = self.server.scc
+        if self.path == '/samples':
+            self.reply(200, dict(samples=list(scc.cools),
+                                 chrNames=list(scc.chrNames)))
+        elif self.path == '/stats':
+            self.reply(200, scc.stats())
+        else:
+            self.reply(404, dict(error=f"Unknown path {self.path}"))
+
+    def do_POST(self):
+        if self.path != '/scc':
+            self.reply(404, dict(error=f"Unknown path {self.path}"))
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            assert 'query' in request, "Missing query sample"
+            chrNames = request.get('chrNames')
+            scores = self.server.scc.scc(request['query'],
+                                         request.get('references'), chrNames)
+        except (AssertionError, KeyError, ValueError) as e:
+            self.reply(400, dict(error=str(e)))
+            return
+        except Exception as e:
+            self.log_error("Error answering POST %s: %r", self.path, e)
+            traceback.print_exc()
+            self.reply(500, dict(error=f"{type(e).__name__}: {e}"))
+            return
+        chrNames = self.server.scc.chrNames if chrNames is None else chrNames
+        # NaN isn't valid JSON
+        self.reply(200, dict(chrNames=list(chrNames), scc={
+            ref: [None if np.isnan(v) else v for v in values]
+            for ref, values in scores.items()}))
+
+    def log_request(self, code='-', size='-'):
+        # don't log every request to stderr, only the errors
+        pass
+
+
+def serve(scc: SCCServer, host: str = '127.0.0.1', port: int = 0):
+    """Create a threaded HTTP server of a `SCCServer`. Call its
+    `serve_forever()` to answer the requests and `shutdown()` from another
+    thread to stop it
+
+    Args:
+        scc: `SCCServer` to serve
+        host: `str` Address to listen on. Default to localhost only
+        port: `int` Port to listen on. Default to 0, meaning any free port,
+        which can be read from the `server_address` of the server
+
+    Returns:
+        `ThreadingHTTPServer`
+    """
+    httpd = ThreadingHTTPServer((host, port), SCCRequestHandler)
+    httpd.daemon_threads = True
+    httpd.scc = scc
+    return httpd
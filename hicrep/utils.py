@@ -7,6 +7,8 @@
 # Description: Utility functions
 #
 # Distributed under terms of the GNU General Public License v3.0.
+import os
+import hashlib
 from typing import Union
 from contextlib import suppress
 import numpy as np
@@ -89,6 +91,309 @@ def getSubCoo(pixels: cooler.core.RangeSelector2D, bins: cooler.core.RangeSelect
     return pixels2Coo(mSub, binsSub)
 
 
+class DiagBand:
+    """Diagonals of the upper triangle of a square contact matrix stored as a
+    dense diagonal-major array, i.e., `data[k, i]` is the element
+    `m[i, i + diagOffset + k]`. Each row holds one diagonal whose elements
+    beyond the end of the diagonal are padded with zeros. Once smoothed, the
+    band of diagonals used by hicrep is nearly dense so this is both more
+    compact and faster to work with than the sparse matrix formats
+
+    Attributes:
+        data: `np.ndarray` of shape (nDiags - diagOffset, nBins)
+        diagOffset: `int` diagonal index of the first row of `data`
+        binOffset: `int` genome-wide index of the first bin of the matrix
+    """
+
+    def __init__(self, data: np.ndarray, diagOffset: int = 1, binOffset: int = 0):
+        self.data = data
+        self.diagOffset = diagOffset
+        self.binOffset = binOffset
+
+    @property
+    def nBins(self):
+        """`int` number of bins, i.e., the size of the square matrix"""
+        return self.data.shape[1]
+
+    @property
+    def nDiags(self):
+        """`int` exclusive upper bound of the diagonal index"""
+        return self.diagOffset + self.data.shape[0]
+
+    def toCoo(self):
+        """Convert to a scipy coo_matrix of shape (nBins, nBins)
+
+        Returns:
+            `sp.coo_matrix` of the upper triangle band
+        """
+        iDiag, iRow = np.nonzero(self.data)
+        return sp.coo_matrix((self.data[iDiag, iRow],
+                              (iRow, iRow + iDiag + self.diagOffset)),
+                             shape=(self.nBins, self.nBins))
+
+
+def pixels2Band(bin1: np.ndarray, bin2: np.ndarray, counts: np.ndarray,
+                nBins: int, nDiags: int, binOffset: int = 0):
+    """Accumulate the pixels of the upper triangle of a square contact matrix
+    into a `DiagBand` of the diagonals whose index is in the range [1, nDiags).
+    The pixels on other diagonals are dropped and duplicated pixels are summed
+
+    Args:
+        bin1: `np.ndarray` genome-wide row bin index of each pixel
+        bin2: `np.ndarray` genome-wide column bin index of each pixel
+        counts: `np.ndarray` value of each pixel
+        nBins: `int` number of bins of the square matrix
+        nDiags: `int` exclusive upper bound of the diagonal index
+        binOffset: `int` genome-wide index of the first bin of the matrix
+
+    Returns:
+        `DiagBand` of the diagonals [1, nDiags)
+    """
+    nRows = max(nDiags - 1, 0)
+    diags = bin2 - bin1
+    idx = np.where((diags > 0) & (diags < nDiags))
+    rows = bin1[idx] - binOffset
+    data = np.bincount((diags[idx] - 1) * nBins + rows, weights=counts[idx],
+                       minlength=nRows * nBins).reshape(nRows, nBins)
+    return DiagBand(data, 1, binOffset)
+
+
+def getSubBand(pixels: cooler.core.RangeSelector2D,
+               bins: cooler.core.RangeSelector1D, regionStr: str, dMax: int):
+    """Fetch a region from a Cooler contact matrix and return the diagonals
+    whose index is in the range [1, min(dMax, number of bins in the region))
+    as a `DiagBand`, without converting to any sparse matrix format
+
+    Args:
+        pixels: Input Cooler range selector object of the contact matrix
+        bins: Input Cooler range selector object of the bin definition
+        regionStr: String for selecting genomic region
+        dMax: `int` exclusive upper bound of the diagonal index. If negative,
+        all the diagonals are kept
+
+    Returns:
+        `DiagBand` of the region
+    """
+    mSub = pixels.fetch(regionStr)
+    assert mSub.shape[0] > 0, f"Contact matrix of region {regionStr} is empty"
+    bin1 = mSub['bin1_id'].to_numpy()
+    bin2 = mSub['bin2_id'].to_numpy()
+    # Assume Cooler always use upper triangle
+    assert (bin1 <= bin2).all(),\
+        f"Contact matrix of region {regionStr} has lower-triangle entries"
+    binsSub = bins.fetch(regionStr)
+    nBins = binsSub.shape[0]
+    nDiags = nBins if dMax < 0 else min(dMax, nBins)
+    return pixels2Band(bin1, bin2, mSub['count'].to_numpy(), nBins, nDiags,
+                       binsSub.index[0])
+
+
+def bandPixelSpans(bin1Offset: np.ndarray, nDiags: int, maxGap: int,
+                   chunkSize: int):
+    """Find the contiguous spans of the pixels table that hold the pixels
+    within nDiags diagonals of a range of rows. The pixels of each row are
+    sorted by column, so those on diagonals [0, nDiags) are at most the first
+    nDiags pixels of the row and the rest of the row is skipped. Spans that
+    are at most `maxGap` pixels apart are merged so that the pixels are read in
+    few large slices, and the merged spans are split to hold at most
+    `chunkSize` pixels
+
+    Args:
+        bin1Offset: `np.ndarray` the `indexes/bin1_offset` of the rows and of
+        the row after the last one
+        nDiags: `int` exclusive upper bound of the diagonal index. If
+        negative, all the diagonals are kept
+        maxGap: `int` maximal number of skipped pixels between two merged
+        spans
+        chunkSize: `int` maximal number of pixels of a span
+
+    Returns:
+        tuple of 2 `np.ndarray`, the inclusive start and exclusive stop of each
+        span in the pixels table
+    """
+    starts = bin1Offset[:-1]
+    stops = bin1Offset[1:] if nDiags < 0 else\
+        np.minimum(bin1Offset[1:], starts + nDiags)
+    idx = np.flatnonzero(stops > starts)
+    if idx.size == 0:
+        return starts[:0], stops[:0]
+    starts = starts[idx]
+    stops = stops[idx]
+    bNewSpan = starts[1:] - stops[:-1] > maxGap
+    starts = starts[np.concatenate([[True], bNewSpan])]
+    stops = stops[np.concatenate([bNewSpan, [True]])]
+    # split the spans longer than chunkSize
+    nChunks = -(-(stops - starts) // chunkSize)
+    iSpan = np.repeat(np.arange(starts.size), nChunks)
+    iChunk = np.arange(iSpan.size) - np.repeat(np.cumsum(nChunks) - nChunks,
+                                               nChunks)
+    chunkStarts = starts[iSpan] + iChunk * chunkSize
+    return chunkStarts, np.minimum(chunkStarts + chunkSize, stops[iSpan])
+
+
+def streamSubBand(cool: cooler.api.Cooler, regionStr: str, dMax: int,
+                  chunkSize: int = 1 << 22, maxGap: int = None,
+                  dtype=np.float64):
+    """Read a region from a Cooler contact matrix into a `DiagBand` of the
+    diagonals whose index is in the range [1, min(dMax, number of bins in the
+    region)). Unlike `getSubBand`, the pixels are read directly from the h5
+    datasets without going through pandas. Only the spans of the pixels table
+    that can hold pixels within the band are read, which are found from the
+    `indexes/bin1_offset` of the rows (see `bandPixelSpans`), and each span of
+    at most `chunkSize` pixels is accumulated into the band before the next one
+    is read, so the peak memory is bounded by the size of the band instead of
+    the number of non-zero pixels in the region
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler contact matrix
+        regionStr: String for selecting genomic region
+        dMax: `int` exclusive upper bound of the diagonal index. If negative,
+        all the diagonals are kept
+        chunkSize: `int` maximal number of pixels read at a time
+        maxGap: `int` read through gaps of at most this many pixels between
+        the spans instead of starting a new read. Default to None, meaning the
+        chunk size of the h5 dataset, as a skipped part of a compressed chunk
+        is decompressed anyway
+        dtype: Data type of the band. Default to np.float64
+
+    Returns:
+        `DiagBand` of the region
+    """
+    binLo, binHi = cool.extent(regionStr)
+    nBins = binHi - binLo
+    nDiags = nBins if dMax < 0 else min(dMax, nBins)
+    band = DiagBand(np.zeros((max(nDiags - 1, 0), nBins), dtype=dtype), 1,
+                    binLo)
+    bandFlat = band.data.reshape(-1)
+    with cool.open('r') as grp:
+        bin1Offset = grp['indexes']['bin1_offset'][binLo:(binHi + 1)]
+        assert bin1Offset[-1] > bin1Offset[0],\
+            f"Contact matrix of region {regionStr} is empty"
+        pixels = grp['pixels']
+        if maxGap is None:
+            chunks = pixels['bin2_id'].chunks
+            maxGap = 1 << 13 if chunks is None else chunks[0]
+        for spanStart, spanStop in zip(*bandPixelSpans(bin1Offset, nDiags,
+                                                       maxGap, chunkSize)):
+            bin2 = pixels['bin2_id'][spanStart:spanStop]
+            counts = pixels['count'][spanStart:spanStop]
+            # the row of each pixel follows from the offsets of the rows
+            bin1 = np.searchsorted(bin1Offset, np.arange(spanStart, spanStop),
+                                   side='right') - 1 + binLo
+            # Assume Cooler always use upper triangle
+            assert (bin1 <= bin2).all(),\
+                f"Contact matrix of region {regionStr} has lower-triangle entries"
+            diags = bin2 - bin1
+            idx = np.where((diags > 0) & (diags < nDiags) & (bin2 < binHi))
+            # each pixel is a unique element of the matrix, so the counts can
+            # be assigned instead of accumulated
+            bandFlat[(diags[idx] - 1) * nBins + bin1[idx] - binLo] = counts[idx]
+    return band
+
+
+class CisPixels:
+    """The pixels of all the chromosomes of a Cooler contact matrix within a
+    band of diagonals, read in a single sequential pass over the pixels table
+    instead of one query per chromosome. Only the spans of the table that can
+    hold pixels within the band are read (see `bandPixelSpans`) and only the
+    pixels off the main diagonal and within the same chromosome are kept.
+    As the pixels are sorted by row, those of each chromosome are contiguous
+    and are handed out as views without copying
+
+    Attributes:
+        chromNames: `list` of `str` names of the chromosomes
+        chromIds: `dict` index of each chromosome name
+        chromOffset: `np.ndarray` `indexes/chrom_offset` of the Cooler file,
+        i.e., the genome-wide index of the first bin of each chromosome and
+        the total number of bins
+        dMax: `int` exclusive upper bound of the diagonal index. If negative,
+        all the diagonals are kept
+        bin1: `np.ndarray` row bin index of each kept pixel
+        bin2: `np.ndarray` column bin index of each kept pixel
+        counts: `np.ndarray` value of each kept pixel
+        pixelOffset: `np.ndarray` index of the first kept pixel of each
+        chromosome and the number of kept pixels
+    """
+
+    def __init__(self, cool: cooler.api.Cooler, dMax: int,
+                 chunkSize: int = 1 << 22, maxGap: int = None):
+        """Read the pixels
+
+        Args:
+            cool: `cooler.api.Cooler` Input Cooler contact matrix
+            dMax: `int` exclusive upper bound of the diagonal index. If
+            negative, all the diagonals are kept
+            chunkSize: `int` maximal number of pixels read at a time
+            maxGap: `int` read through gaps of at most this many pixels between
+            the spans instead of starting a new read. Default to None, meaning
+            the chunk size of the h5 dataset
+        """
+        self.dMax = dMax
+        with cool.open('r') as grp:
+            self.chromNames = list(grp['chroms']['name'][:].astype(str))
+            self.chromIds = {name: i for i, name in enumerate(self.chromNames)}
+            self.chromOffset = grp['indexes']['chrom_offset'][:]
+            bin1Offset = grp['indexes']['bin1_offset'][:]
+            pixels = grp['pixels']
+            if maxGap is None:
+                chunks = pixels['bin2_id'].chunks
+                maxGap = 1 << 13 if chunks is None else chunks[0]
+            # exclusive upper bound of the bins of the chromosome of each bin
+            chromEnd = np.repeat(self.chromOffset[1:], np.diff(self.chromOffset))
+            bin1s, bin2s, counts = [], [], []
+            for spanStart, spanStop in zip(*bandPixelSpans(bin1Offset, dMax,
+                                                           maxGap, chunkSize)):
+                bin2 = pixels['bin2_id'][spanStart:spanStop]
+                count = pixels['count'][spanStart:spanStop]
+                bin1 = np.searchsorted(bin1Offset, np.arange(spanStart, spanStop),
+                                       side='right') - 1
+                # Assume Cooler always use upper triangle
+                assert (bin1 <= bin2).all(),\
+                    f"Contact matrix has lower-triangle entries"
+                bKeep = (bin2 > bin1) & (bin2 < chromEnd[bin1])
+                if dMax >= 0:
+                    bKeep &= bin2 - bin1 < dMax
+                idx = np.flatnonzero(bKeep)
+                bin1s.append(bin1[idx])
+                bin2s.append(bin2[idx])
+                counts.append(count[idx])
+        self.bin1 = np.concatenate(bin1s) if bin1s else np.empty(0, np.int64)
+        self.bin2 = np.concatenate(bin2s) if bin2s else np.empty(0, np.int64)
+        self.counts = np.concatenate(counts) if counts else np.empty(0)
+        self.pixelOffset = np.searchsorted(self.bin1, self.chromOffset)
+
+    def pixels(self, chrName: str):
+        """Return the kept pixels of one chromosome
+
+        Args:
+            chrName: `str` Name of the chromosome
+
+        Returns:
+            tuple of 3 `np.ndarray` views, the genome-wide row bin index, the
+            genome-wide column bin index and the value of each pixel
+        """
+        iChr = self.chromIds[chrName]
+        idx = slice(self.pixelOffset[iChr], self.pixelOffset[iChr + 1])
+        return self.bin1[idx], self.bin2[idx], self.counts[idx]
+
+    def band(self, chrName: str):
+        """Return the same band of one chromosome as `streamSubBand`
+
+        Args:
+            chrName: `str` Name of the chromosome
+
+        Returns:
+            `DiagBand` of the chromosome
+        """
+        iChr = self.chromIds[chrName]
+        binLo, binHi = self.chromOffset[iChr:(iChr + 2)]
+        nBins = binHi - binLo
+        nDiags = nBins if self.dMax < 0 else min(self.dMax, nBins)
+        bin1, bin2, counts = self.pixels(chrName)
+        assert bin1.size > 0, f"Contact matrix of region {chrName} is empty"
+        return pixels2Band(bin1, bin2, counts, nBins, nDiags, binLo)
+
+
 def trimDiags(a: sp.coo_matrix, iDiagMax: int, bKeepMain: bool):
     """Remove diagonal elements whose diagonal index is >= iDiagMax
     or is == 0
@@ -129,14 +434,200 @@ def upperDiagCsr(m: sp.coo_matrix, nDiags: int):
     ans.eliminate_zeros()
     return ans
 
-def meanFilterSparse(a: sp.coo_matrix, h: int):
+# Number of elements of the input of boxSumAxis0 whose prefix sum is held in
+# float64 at a time
+BOX_SUM_BLOCK = 1 << 20
+
+
+def boxSumAxis0(a: np.ndarray, h: int):
+    """Sum each element of the input with its h neighbors on both sides along
+    the first axis, treating the elements beyond the edges as zeros. This is
+    done with a prefix sum so that the cost doesn't depend on h. The prefix
+    sum is accumulated in float64 over blocks of columns, so that a float32
+    input doesn't lose precision in the differences of the prefix sum while
+    only one block is held in float64
+
+    Args:
+        a: `np.ndarray` input array of at least 2 dimensions
+        h: `int` half-size of the summing window
+
+    Returns:
+        `np.ndarray` of the same shape and type as the input
+    """
+    nRows = a.shape[0]
+    iRows = np.arange(nRows)
+    iHi = np.minimum(iRows + h + 1, nRows)
+    iLo = np.maximum(iRows - h, 0)
+    ans = np.empty_like(a)
+    nTrailing = int(np.prod(a.shape[2:]))
+    step = max(BOX_SUM_BLOCK // max((nRows + 1) * nTrailing, 1), 1)
+    for j in range(0, a.shape[1], step):
+        cumSum = np.zeros((nRows + 1, min(step, a.shape[1] - j)) + a.shape[2:],
+                          dtype=np.promote_types(a.dtype, np.float64))
+        np.cumsum(a[:, j:(j + step)], axis=0, out=cumSum[1:])
+        ans[:, j:(j + step)] = cumSum[iHi] - cumSum[iLo]
+    return ans
+
+
+def shiftDiags(a: np.ndarray, dLo: int, bToCol: bool):
+    """Convert a stack of diagonals of a n-by-n matrix between the row-indexed
+    layout, where a[k, i] = m[i, i + dLo + k], and the column-indexed layout,
+    where a[k, j] = m[j - dLo - k, j]. Elements that fall out of the matrix
+    are dropped and the vacated elements are set to zero
+
+    Args:
+        a: `np.ndarray` input diagonals, one diagonal per row
+        dLo: `int` diagonal index of the first row
+        bToCol: `bool` If true, convert from the row-indexed layout to the
+        column-indexed layout; otherwise convert the other way around
+
+    Returns:
+        `np.ndarray` of the same shape as the input
+    """
+    n = a.shape[1]
+    ans = np.zeros_like(a)
+    for k in range(a.shape[0]):
+        d = dLo + k if bToCol else -(dLo + k)
+        if abs(d) >= n:
+            continue
+        if d >= 0:
+            ans[k, d:] = a[k, :n-d]
+        else:
+            ans[k, :n+d] = a[k, -d:]
+    return ans
+
+
+def meanFilterDiags(a: np.ndarray, dLo: int, h: int, oLo: int, oHi: int):
+    """Apply a mean filter of size 2*h + 1 to a n-by-n matrix stored as a
+    stack of row-indexed diagonals (see `shiftDiags`) and return the filtered
+    diagonals in the range [oLo, oHi). The diagonals not stored in the input
+    are zeros. The 2D box sum is separable into a sum over the neighboring
+    diagonals at a fixed row followed by a sum over the neighboring diagonals
+    at a fixed column, so only the band of diagonals within 2*h of the output
+    are ever allocated. The number of neighbors at the edges are counted in
+    the same way as `meanFilterSparse`. Any trailing axes of the input after
+    the bins, e.g., replicates, are filtered independently
+
+    Args:
+        a: `np.ndarray` input diagonals, one diagonal per row
+        dLo: `int` diagonal index of the first row of the input
+        h: `int` half-size of the filter
+        oLo: `int` inclusive lower bound of the output diagonal index
+        oHi: `int` exclusive upper bound of the output diagonal index
+
+    Returns:
+        `np.ndarray` of shape (oHi - oLo, n) of filtered row-indexed diagonals
+    """
+    n = a.shape[1]
+    # stage 1 sums over [d - h, d + h] at fixed row for d in [oLo - h, oHi + h),
+    # which needs the input diagonals in [oLo - 2h, oHi + 2h)
+    pLo = oLo - 2 * h
+    padded = np.zeros((oHi - oLo + 4 * h, n) + a.shape[2:], dtype=a.dtype)
+    iLo = max(dLo, pLo)
+    iHi = min(dLo + a.shape[0], oHi + 2 * h)
+    if iHi > iLo:
+        padded[(iLo - pLo):(iHi - pLo)] = a[(iLo - dLo):(iHi - dLo)]
+    rowSum = boxSumAxis0(padded, h)[h:-h] if h > 0 else padded
+    del padded
+    return meanFilterCols(rowSum, h, oLo, oHi)
+
+
+def meanFilterCols(rowSum: np.ndarray, h: int, oLo: int, oHi: int):
+    """Finish the mean filter of `meanFilterDiags` from the output of its
+    first stage, i.e., the sums over the neighboring diagonals at fixed row of
+    the diagonals in [oLo - h, oHi + h)
+
+    Args:
+        rowSum: `np.ndarray` row-indexed diagonals summed at fixed row
+        h: `int` half-size of the filter
+        oLo: `int` inclusive lower bound of the output diagonal index
+        oHi: `int` exclusive upper bound of the output diagonal index
+
+    Returns:
+        `np.ndarray` of shape (oHi - oLo, n) of filtered row-indexed diagonals
+    """
+    n = rowSum.shape[1]
+    # stage 2 sums over the same column, i.e., the column-indexed diagonals
+    # in [d - h, d + h]
+    colSum = boxSumAxis0(shiftDiags(rowSum, oLo - h, True), h)
+    ans = shiftDiags(colSum[h:(h + oHi - oLo)], oLo, False)
+    del colSum
+    # Assign different number of neighbors to the edge to better
+    # match what the original R implementation of HiCRep does
+    iBins = np.arange(n)
+    nDim = h + 1 + np.minimum(np.minimum(iBins, n - 1 - iBins), h)
+    # broadcast over the trailing axes
+    nDim = nDim.reshape((n,) + (1,) * (ans.ndim - 2))
+    for k in range(ans.shape[0]):
+        d = oLo + k
+        ans[k] /= nDim * nDim[np.clip(iBins + d, 0, n - 1)]
+    return ans
+
+
+def meanFilterDiagsRange(a: np.ndarray, dLo: int, hs: list, oLo: int,
+                         oHi: int):
+    """Apply the mean filter of `meanFilterDiags` for each of a list of
+    half-sizes, sharing one prefix sum over the diagonals at fixed row among
+    all of them so that the input is only padded and summed once. As in
+    `boxSumAxis0`, the prefix sum is accumulated in float64 and the outputs
+    are cast back to the type of the input
+
+    Args:
+        a: `np.ndarray` input diagonals, one diagonal per row
+        dLo: `int` diagonal index of the first row of the input
+        hs: `list` of `int` half-sizes of the filter
+        oLo: `int` inclusive lower bound of the output diagonal index
+        oHi: `int` exclusive upper bound of the output diagonal index
+
+    Yields:
+        tuple of `int` half-size and `np.ndarray` of shape (oHi - oLo, n) of
+        filtered row-indexed diagonals. A half-size of 0 yields the unfiltered
+        diagonals
+    """
+    hMax = max(hs)
+    n = a.shape[1]
+    # pad the input for the largest filter so that the prefix sum covers the
+    # diagonals in [oLo - 2 * hMax, oHi + 2 * hMax)
+    pLo = oLo - 2 * hMax
+    nRows = oHi - oLo + 4 * hMax
+    cumSum = np.zeros((nRows + 1, n),
+                      dtype=np.promote_types(a.dtype, np.float64))
+    iLo = max(dLo, pLo)
+    iHi = min(dLo + a.shape[0], oHi + 2 * hMax)
+    if iHi > iLo:
+        cumSum[(iLo - pLo + 1):(iHi - pLo + 1)] = a[(iLo - dLo):(iHi - dLo)]
+    np.cumsum(cumSum, axis=0, out=cumSum)
+    for h in hs:
+        if h == 0:
+            ans = np.zeros((oHi - oLo, n), dtype=a.dtype)
+            iLo = max(dLo, oLo)
+            iHi = min(dLo + a.shape[0], oHi)
+            if iHi > iLo:
+                ans[(iLo - oLo):(iHi - oLo)] = a[(iLo - dLo):(iHi - dLo)]
+            yield h, ans
+            continue
+        # sum over [d - h, d + h] at fixed row for d in [oLo - h, oHi + h)
+        rowSum = cumSum[(oLo - pLo + 1):(oHi + 2 * h - pLo + 1)] -\
+            cumSum[(oLo - 2 * h - pLo):(oHi - pLo)]
+        yield h, meanFilterCols(rowSum.astype(a.dtype, copy=False), h, oLo,
+                                oHi)
+
+
+def meanFilterSparse(a: sp.coo_matrix, h: int, nDiags: int = None):
     """Apply a mean filter to an input sparse matrix. This convolves
     the input with a kernel of size 2*h + 1 with constant entries and
-    subsequently reshape the output to be of the same shape as input
+    subsequently reshape the output to be of the same shape as input.
+    The filter is applied on the band of diagonals covered by the input
+    (see `meanFilterDiags`) so that the cost scales with the band width
+    instead of the full matrix
 
     Args:
         a: `sp.coo_matrix`, Input matrix to be filtered
         h: `int` half-size of the filter
+        nDiags: `int` If provided, only compute the output on the diagonals
+        whose index is in the range [1, nDiags), which are the only ones used
+        by `sccByDiag`. Default to None, which means the whole output is
+        computed
 
     Returns:
         `sp.coo_matrix` filterd matrix
@@ -146,26 +637,107 @@ def meanFilterSparse(a: sp.coo_matrix, h: int):
         "meanFilterSparse input matrix is not scipy.sparse.coo_matrix"
     assert a.shape[0] == a.shape[1],\
         "meanFilterSparse cannot handle non-square matrix"
-    fSize = 2 * h + 1
-    # filter is a square matrix of constant 1 of shape (fSize, fSize)
-    shapeOut = np.array(a.shape) + fSize - 1
-    mToeplitz = sp.diags(np.ones(fSize),
-                         np.arange(-fSize+1, 1),
-                         shape=(shapeOut[1], a.shape[1]),
-                         format='csr')
-    ans = sp.coo_matrix((mToeplitz @ a) @ mToeplitz.T)
-    # remove the edges since we don't care about them if we are smoothing
-    # the matrix itself
-    ansNoEdge = ans.tocsr()[h:(h+a.shape[0]), h:(h+a.shape[1])].tocoo()
-    # Assign different number of neighbors to the edge to better
-    # match what the original R implementation of HiCRep does
-    rowDist2Edge = np.minimum(ansNoEdge.row, ansNoEdge.shape[0] - 1 - ansNoEdge.row)
-    nDim1 = h + 1 + np.minimum(rowDist2Edge, h)
-    colDist2Edge = np.minimum(ansNoEdge.col, ansNoEdge.shape[1] - 1 - ansNoEdge.col)
-    nDim2 = h + 1 + np.minimum(colDist2Edge, h)
-    nNeighbors = nDim1 * nDim2
-    ansNoEdge.data /= nNeighbors
-    return ansNoEdge
+    n = a.shape[0]
+    if a.nnz == 0:
+        return sp.coo_matrix(a.shape, dtype=float)
+    diags = a.col.astype(np.int64) - a.row
+    dLo = diags.min()
+    dHi = diags.max() + 1
+    # only the diagonals within h of the input can be non-zero
+    oLo = max(dLo - 2 * h, -n + 1)
+    oHi = min(dHi + 2 * h, n)
+    if nDiags is not None:
+        oLo = max(oLo, 1)
+        oHi = min(oHi, nDiags)
+        if oHi <= oLo:
+            return sp.coo_matrix(a.shape, dtype=float)
+    # store the diagonals row-indexed, summing up the duplicated entries
+    nRows = dHi - dLo
+    band = np.bincount((diags - dLo) * n + a.row, weights=a.data,
+                       minlength=nRows * n).reshape(nRows, n)
+    ans = meanFilterDiags(band, dLo, h, oLo, oHi)
+    del band
+    iDiag, iRow = np.nonzero(ans)
+    return sp.coo_matrix((ans[iDiag, iRow], (iRow, iRow + iDiag + oLo)),
+                         shape=a.shape)
+
+
+def meanFilterBand(band: DiagBand, h: int):
+    """Apply the same mean filter as `meanFilterSparse` to a `DiagBand`,
+    treating the diagonals not stored in the band as zeros, and return the
+    filtered diagonals of the same range as the input
+
+    Args:
+        band: `DiagBand` Input band to be filtered
+        h: `int` half-size of the filter
+
+    Returns:
+        `DiagBand` filterd band
+    """
+    assert h > 0, "meanFilterBand half-size must be greater than 0"
+    data = meanFilterDiags(band.data, band.diagOffset, h,
+                           band.diagOffset, band.nDiags)
+    return DiagBand(data, band.diagOffset, band.binOffset)
+
+
+def meanFilterBandRange(band: DiagBand, hs: list):
+    """Apply the same mean filter as `meanFilterBand` for each of a list of
+    half-sizes. See `meanFilterDiagsRange`
+
+    Args:
+        band: `DiagBand` Input band to be filtered
+        hs: `list` of `int` half-sizes of the filter. A half-size of 0 gives
+        a copy of the input band
+
+    Yields:
+        tuple of `int` half-size and `DiagBand` filtered band
+    """
+    assert min(hs) >= 0, "meanFilterBandRange half-sizes must be non-negative"
+    for h, data in meanFilterDiagsRange(band.data, band.diagOffset, hs,
+                                        band.diagOffset, band.nDiags):
+        yield h, DiagBand(data, band.diagOffset, band.binOffset)
+
+
+def coarsenBand(band: DiagBand, factor: int, nDiags: int,
+                binOffset: int = 0):
+    """Aggregate every `factor` consecutive bins of a `DiagBand` into one bin,
+    as in the coarser resolutions of a mcool file, and return the diagonals of
+    the coarse matrix whose index is in the range [1, nDiags). The contacts
+    within a coarse bin, i.e., on its main diagonal, are dropped. The input
+    must hold all the diagonals whose index is less than `nDiags * factor` for
+    the output to be complete
+
+    Args:
+        band: `DiagBand` Input band
+        factor: `int` Number of bins of the input aggregated into one bin
+        nDiags: `int` Exclusive upper bound of the diagonal index of the output
+        binOffset: `int` Genome-wide bin index of the first bin of the output.
+        Default to 0
+
+    Returns:
+        `DiagBand` coarse band
+    """
+    assert factor >= 1, f"Invalid coarsening factor {factor}"
+    nBins = band.nBins
+    nBinsC = -(-nBins // factor)
+    nDiagsC = min(nDiags, nBinsC)
+    ans = np.zeros((max(nDiagsC - 1, 0), nBinsC), dtype=band.data.dtype)
+    iBins = np.arange(nBins)
+    iBinsC = iBins // factor
+    offset = iBins % factor
+    for k in range(band.data.shape[0]):
+        d = band.diagOffset + k
+        # the coarse diagonal index of element (i, i + d) is
+        # (i % factor + d) // factor, which takes at most 2 values
+        dC = (offset + d) // factor
+        for iDiagC in {d // factor, (d + factor - 1) // factor}:
+            if 0 < iDiagC < nDiagsC:
+                idx = np.flatnonzero(dC == iDiagC)
+                ans[iDiagC - 1] += np.bincount(iBinsC[idx],
+                                               weights=band.data[k, idx],
+                                               minlength=nBinsC)
+    return DiagBand(ans, 1, binOffset)
+
 
 def varVstran(n: Union[int, np.ndarray]):
     """
@@ -192,25 +764,231 @@ def varVstran(n: Union[int, np.ndarray]):
         return np.where(n < 2, np.nan, (1 + 1.0 / n) / 12.0)
 
 
-def resample(m: sp.coo_matrix, size: int):
+def multinomialCounts(weights: np.ndarray, size: int, rng=None,
+                      nDraws: int = None):
+    """Draw `size` samples with replacement from the elements of `weights`
+    with probabilities proportional to `weights` and return how many times
+    each element is drawn. The counts are drawn directly from the multinomial
+    distribution so that the cost scales with the number of elements instead
+    of with `size`
+
+    Args:
+        weights: `np.ndarray` 1D array of non-negative weights
+        size: `int` Total number of samples
+        rng: `np.random.Generator` or `np.random.RandomState` Random number
+        generator. Default to None, which means the global numpy random state
+        is used
+        nDraws: `int` If provided, repeat the draw this many times
+        independently in one call. Default to None
+
+    Returns:
+        `np.ndarray` of int64 with the same size as `weights` summing to
+        `size`, or of shape (nDraws, size of `weights`) if nDraws is provided
+    """
+    if rng is None:
+        rng = np.random
+    size = int(size)
+    assert size >= 0, f"Can't draw a negative number of samples {size}"
+    shape = (weights.size,) if nDraws is None else (nDraws, weights.size)
+    if size == 0 or weights.size == 0:
+        return np.zeros(shape, dtype=np.int64)
+    p = weights.astype(np.float64) / weights.sum()
+    # the probabilities must sum to 1 up to round-off in multinomial
+    p /= p.sum()
+    return rng.multinomial(size, p, size=nDraws).astype(np.int64)
+
+
+def resample(m: sp.coo_matrix, size: int, rng=None):
     """Resample with replacement the input matrix so that the
     resulting matrix sum to the given size
     Args:
         m: `sp.coo_matrix` Input matrix
         size: Resulting matrix sum to this number
+        rng: `np.random.Generator` or `np.random.RandomState` Random number
+        generator. Default to None, which means the global numpy random state
+        is used
 
     Returns:
         resampled matrix
     """
-    bins = np.arange(m.data.size)
-    p = m.data / m.data.sum()
-    samples = np.random.choice(bins, size=size, p=p)
-    sampledData = np.bincount(samples, minlength=bins.size)
+    sampledData = multinomialCounts(m.data, size, rng)
     ans = sp.coo_matrix((sampledData, (m.row, m.col)), shape=m.shape)
     ans.eliminate_zeros()
     return ans
 
 
+def resampleBand(band: DiagBand, size: int, rng=None):
+    """Resample with replacement the non-zero elements of the input band so
+    that the resulting band sum to the given size. This is the `DiagBand`
+    counterpart of `resample`
+
+    Args:
+        band: `DiagBand` Input band
+        size: Resulting band sum to this number
+        rng: `np.random.Generator` or `np.random.RandomState` Random number
+        generator. Default to None, which means the global numpy random state
+        is used
+
+    Returns:
+        `DiagBand` resampled band
+    """
+    idx = np.flatnonzero(band.data)
+    data = np.zeros(band.data.shape, dtype=band.data.dtype)
+    data.flat[idx] = multinomialCounts(band.data.flat[idx], size, rng)
+    return DiagBand(data, band.diagOffset, band.binOffset)
+
+
+def resampleBandReplicates(band: DiagBand, size: int, nReplicates: int,
+                           rng=None, idx: np.ndarray = None):
+    """Draw independent resamples of the band as in `resampleBand` with one
+    vectorized multinomial draw and stack them along a trailing axis, as
+    accepted by `meanFilterDiags` and `diagStatsDense`
+
+    Args:
+        band: `DiagBand` Input band
+        size: Each resampled band sum to this number
+        nReplicates: `int` Number of resamples
+        rng: `np.random.Generator` or `np.random.RandomState` Random number
+        generator. Default to None, which means the global numpy random state
+        is used
+        idx: `np.ndarray` flat indices of the non-zero elements of the band if
+        they're already computed. Default to None
+
+    Returns:
+        `np.ndarray` of shape (*band.data.shape, nReplicates) of the type of
+        the band
+    """
+    if idx is None:
+        idx = np.flatnonzero(band.data)
+    data = np.zeros((band.data.size, nReplicates), dtype=band.data.dtype)
+    data[idx] = multinomialCounts(band.data.flat[idx], size, rng, nReplicates).T
+    return data.reshape(band.data.shape + (nReplicates,))
+
+
+def thinBand(band: DiagBand, p: float, rng=None):
+    """Binomially thin the counts of the input band, i.e., keep each contact
+    independently with probability `p`, so that thinning a thinned band gives
+    a nested subsample of it
+
+    Args:
+        band: `DiagBand` Input band of integer counts
+        p: `float` Probability of keeping each contact
+        rng: `np.random.Generator` or `np.random.RandomState` Random number
+        generator. Default to None, which means the global numpy random state
+        is used
+
+    Returns:
+        `DiagBand` thinned band
+    """
+    if rng is None:
+        rng = np.random
+    assert 0 <= p <= 1, f"Can't thin with probability {p}"
+    idx = np.flatnonzero(band.data)
+    data = np.zeros(band.data.shape, dtype=band.data.dtype)
+    data.flat[idx] = rng.binomial(
+        np.rint(band.data.flat[idx]).astype(np.int64), p)
+    return DiagBand(data, band.diagOffset, band.binOffset)
+
+
+# Memoized results of coolerMemoized keyed by the file path, the Cooler group,
+# the file size and modification time and the name of the result
+coolerMemo = {}
+
+
+def coolerMemoized(cool: cooler.api.Cooler, name: str, compute):
+    """Return a memoized result computed from a Cooler file so that it's only
+    computed once per process for each file, e.g., when the same file is
+    paired with many others. The memo is invalidated if the file changes
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler object
+        name: `str` Name of the result
+        compute: callable without argument that computes the result
+
+    Returns:
+        the result
+    """
+    fname = os.path.realpath(cool.filename)
+    stat = os.stat(fname)
+    key = (fname, cool.root, stat.st_size, stat.st_mtime_ns, name)
+    if key not in coolerMemo:
+        coolerMemo[key] = compute()
+    return coolerMemo[key]
+
+
+def coolerDatasetHash(cool: cooler.api.Cooler, path: str,
+                      chunkSize: int = 1 << 22):
+    """Return the sha256 hash of the content of a dataset of a Cooler file,
+    read in chunks directly from h5. Strings are hashed by value and numbers
+    are hashed as 64-bit, so that datasets with the same values but stored with
+    different widths hash the same. The hash is memoized per file
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler object
+        path: `str` Path of the dataset in the Cooler group, e.g.,
+        'chroms/name'
+        chunkSize: `int` maximal number of elements read at a time
+
+    Returns:
+        `str` hex digest of the dataset
+    """
+    def compute():
+        sha = hashlib.sha256()
+        with cool.open('r') as grp:
+            dset = grp[path]
+            for start in range(0, dset.shape[0], chunkSize):
+                chunk = dset[start:(start + chunkSize)]
+                if chunk.dtype.kind in 'SUO':
+                    sha.update(b'\0'.join(
+                        v if isinstance(v, bytes) else str(v).encode('utf-8')
+                        for v in chunk) + b'\0')
+                elif chunk.dtype.kind == 'f':
+                    sha.update(chunk.astype('<f8').tobytes())
+                else:
+                    sha.update(chunk.astype('<i8').tobytes())
+        return sha.hexdigest()
+    return coolerMemoized(cool, 'hash:' + path, compute)
+
+
+def coolerDatasetSum(cool: cooler.api.Cooler, path: str,
+                     chunkSize: int = 1 << 22):
+    """Return the sum of a dataset of a Cooler file, read in chunks directly
+    from h5. The sum is memoized per file
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler object
+        path: `str` Path of the dataset in the Cooler group, e.g.,
+        'pixels/count'
+        chunkSize: `int` maximal number of elements read at a time
+
+    Returns:
+        sum of the dataset
+    """
+    def compute():
+        with cool.open('r') as grp:
+            dset = grp[path]
+            total = dset.dtype.type(0)
+            for start in range(0, dset.shape[0], chunkSize):
+                total += dset[start:(start + chunkSize)].sum()
+        return total
+    return coolerMemoized(cool, 'sum:' + path, compute)
+
+
+def coolerDatasetLength(cool: cooler.api.Cooler, path: str):
+    """Return the number of elements of a dataset of a Cooler file without
+    reading it
+
+    Args:
+        cool: `cooler.api.Cooler` Input Cooler object
+        path: `str` Path of the dataset in the Cooler group
+
+    Returns:
+        `int` number of elements
+    """
+    with cool.open('r') as grp:
+        return grp[path].shape[0]
+
+
 def coolerInfo(cool: cooler.api.Cooler, k: str):
     """Retrieve metadata from Cooler file
 
@@ -219,7 +997,8 @@ def coolerInfo(cool: cooler.api.Cooler, k: str):
 
     This function will attempt to return the requested field via the input key
     `k` directly from the Cooler `cool` object or if that doesn't work, will try
-    to compute it from the contact matrix for certain types of metadata
+    to compute it from the h5 datasets of the contact matrix for certain types
+    of metadata. The computed 'sum' is memoized per file
 
 
     Args:
@@ -230,12 +1009,12 @@ def coolerInfo(cool: cooler.api.Cooler, k: str):
     if k in cool.info:
         return cool.info[k]
     elif k == 'sum':
-        return cool.pixels()['count'][:].sum()
+        return coolerDatasetSum(cool, 'pixels/count')
     elif k == 'nbins':
-        return cool.bins().shape[0]
+        return coolerDatasetLength(cool, 'bins/start')
     elif k == 'nnz':
-        return cool.pixels().shape[0]
+        return coolerDatasetLength(cool, 'pixels/count')
     elif k == 'nchroms':
-        return cool.chroms().shape[0]
+        return coolerDatasetLength(cool, 'chroms/name')
     else:
         raise KeyError(f'Unable to retrieve metadata field \'{k}\'')
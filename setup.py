@@ -10,8 +10,8 @@
 # The algorithm first normalizes the input contact matrices by the total
 # number of contacts and then for each chromosome: 1) mean-filter the input
 # matrices with an input window size; 2) exclude common zero entries in
-# the input matrices; 3) compute the SCC score. It doesn't have the
-# procedure to bootstrap the window-size parameter
+# the input matrices; 3) compute the SCC score. The window-size parameter
+# can be trained with hicrep-htrain
 #
 # Distributed under terms of the GNU General Public License v3.0.
 import setuptools
@@ -42,6 +42,15 @@ setuptools.setup(
         "pandas",
         "h5py",
     ],
-    entry_points={"console_scripts": ["hicrep=hicrep:main"]},
+    entry_points={"console_scripts": ["hicrep=hicrep:main",
+                                        "hicrep-matrix=hicrep:mainMatrix",
+                                        "hicrep-htrain=hicrep:mainHTrain",
+                                        "hicrep-multires=hicrep:mainMultiRes",
+                                        "hicrep-batch=hicrep:mainBatch",
+                                        "hicrep-windows=hicrep:mainWindows",
+                                        "hicrep-server=hicrep:mainServer",
+                                        "hicrep-index=hicrep:mainIndex",
+                                        "hicrep-query=hicrep:mainQuery",
+                                        "hicrep-bootstrap=hicrep:mainBootstrap"]},
     data_files = [("", ["LICENSE.txt"])]
 )
@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_BandCache.py
+# Description: Test the on-disk cache of smoothed bands
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+import numpy as np
+from hicrep.utils import readMcool, DiagBand
+from hicrep.cache import BandCache
+from hicrep.hicrep import hicrepSCC
+
+def testBandCache(tmp_path):
+    fmcool = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    cool, _ = readMcool(fmcool, -1)
+    cache = BandCache(str(tmp_path))
+
+    # Test that different parameters give different keys
+    key = cache.key(cool, 'chr2L', 1, 6, 'sum')
+    assert key == cache.key(cool, 'chr2L', 1, 6, 'sum'),\
+        f"BandCache.key is not deterministic"
+    for args in [('chr2R', 1, 6, 'sum'), ('chr2L', 2, 6, 'sum'),
+                 ('chr2L', 1, 7, 'sum'), ('chr2L', 1, 6, 'none')]:
+        assert cache.key(cool, *args) != key,\
+            f"BandCache.key doesn't depend on {args}"
+
+    # Test the round trip through the cache
+    assert cache.get(key) is None, f"BandCache.get returns a missing entry"
+    band = DiagBand(np.random.rand(5, 100), 1, 42)
+    cache.put(key, band)
+    cached = cache.get(key)
+    assert isinstance(cached.data, np.memmap) and\
+        np.array_equal(cached.data, band.data) and\
+        cached.diagOffset == band.diagOffset and\
+        cached.binOffset == band.binOffset,\
+        f"BandCache.get returns different band from the one stored"
+
+    # Test that the least recently used entries are evicted first
+    nBytes = os.path.getsize(os.path.join(str(tmp_path), key + ".npy"))
+    cache.put("other", band)
+    os.utime(os.path.join(str(tmp_path), key + ".npy"), (0, 0))
+    cache.get("other")
+    cache.evict(nBytes)
+    assert cache.get(key) is None and cache.get("other") is not None,\
+        f"BandCache.evict doesn't evict the least recently used entry"
+
+
+def testFlyHiCCache(tmp_path):
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    cache = BandCache(str(tmp_path))
+    # Test that both filling and hitting the cache give the same results
+    for _ in range(2):
+        results = hicrepSCC(cool1, cool2, h, dBPMax, False, cache=cache)
+        assert (results == expected).all(),\
+            f"SCC scores computed with cache {results} differ from those "\
+            f"computed without cache {expected}"
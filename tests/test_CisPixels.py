@@ -0,0 +1,35 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_CisPixels.py
+# Description: Test CisPixels against streamSubBand
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import (
+    readMcool, streamSubBand, CisPixels
+    )
+
+def testCisPixels():
+    fmcool = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    cool, _ = readMcool(fmcool, -1)
+    for dMax, chunkSize in [(6, 1 << 22), (100, 1000), (-1, 12345)]:
+        cis = CisPixels(cool, dMax, chunkSize)
+        assert cis.chromNames == list(cool.chromnames),\
+            f"CisPixels returns chromosomes {cis.chromNames} different from "\
+            f"the input"
+        for chrName in cool.chromnames:
+            bin1, bin2, counts = cis.pixels(chrName)
+            binLo, binHi = cool.extent(chrName)
+            # Test that only the cis pixels off the main diagonal are kept
+            assert np.all((bin1 >= binLo) & (bin2 < binHi) & (bin2 > bin1)),\
+                f"CisPixels returns pixels out of chromosome {chrName}"
+            assert np.shares_memory(counts, cis.counts),\
+                f"CisPixels returns a copy of the pixels of {chrName}"
+            expected = streamSubBand(cool, chrName, dMax)
+            band = cis.band(chrName)
+            assert band.binOffset == expected.binOffset and\
+                np.array_equal(band.data, expected.data),\
+                f"CisPixels with dMax {dMax} returns a different band from "\
+                f"streamSubBand for chromosome {chrName}"
@@ -14,6 +14,7 @@ from hicrep.utils import (
     trimDiags, meanFilterSparse,
     resample, coolerInfo
     )
+from hicrep.cache import BandCache
 from hicrep.hicrep import (
     sccOfDiag, hicrepSCC
     )
@@ -121,3 +122,106 @@ def testFlyHiC():
         from the whole set when {chrNamesRemain} are excluded. The whole genome
         results are: {results} and the subset indices are {iChrs}.
         """
+
+
+def testFlyHiCParallel():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+
+    # Test that the parallel computation gives the same results in the same
+    # order as the serial one
+    results = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    resultsPar = hicrepSCC(cool1, cool2, h, dBPMax, False, nWorkers=3)
+    assert (results == resultsPar).all(), f"""
+        SCC scores between {fmcool1} and {fmcool2} computed with 3 workers
+        {resultsPar} differ from the serial results {results}
+        """
+
+    # Test that down sampling is reproducible regardless of the number of
+    # workers
+    chrNames = ['chr2L', 'chr4', 'chrX']
+    np.random.seed(10)
+    results = hicrepSCC(cool1, cool2, h, dBPMax, True, chrNames)
+    np.random.seed(10)
+    resultsPar = hicrepSCC(cool1, cool2, h, dBPMax, True, chrNames, nWorkers=2)
+    assert (results == resultsPar).all(), f"""
+        Down sampled SCC scores between {fmcool1} and {fmcool2} computed with
+        2 workers {resultsPar} differ from the serial results {results}
+        """
+
+
+def testFlyHiCPrefetch(tmp_path):
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+
+    # Test that prefetching gives the same results as reading each chromosome
+    # when it's computed, with and without cache and down sampling
+    results = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    for prefetch in [1, 3]:
+        resultsPre = hicrepSCC(cool1, cool2, h, dBPMax, False,
+                               prefetch=prefetch)
+        assert (results == resultsPre).all(), f"""
+            SCC scores between {fmcool1} and {fmcool2} computed with
+            prefetching {resultsPre} differ from the results without
+            prefetching {results}
+            """
+    cache = BandCache(str(tmp_path))
+    for _ in range(2):
+        resultsPre = hicrepSCC(cool1, cool2, h, dBPMax, False, cache=cache,
+                               prefetch=1)
+        assert np.allclose(results, resultsPre),\
+            f"SCC scores computed with prefetching and cache differ"
+    np.random.seed(10)
+    results = hicrepSCC(cool1, cool2, h, dBPMax, True)
+    np.random.seed(10)
+    resultsPre = hicrepSCC(cool1, cool2, h, dBPMax, True, prefetch=2)
+    assert (results == resultsPre).all(),\
+        f"Down sampled SCC scores computed with prefetching differ"
+
+
+def testFlyHiCBulkLoad():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+
+    # Test that loading all the chromosomes up front gives the same results
+    # as reading each chromosome when it's computed
+    results = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    resultsBulk = hicrepSCC(cool1, cool2, h, dBPMax, False, bBulkLoad=True)
+    assert (results == resultsBulk).all(), f"""
+        SCC scores between {fmcool1} and {fmcool2} computed with bulk loading
+        {resultsBulk} differ from the results without {results}
+        """
+
+
+def testFlyHiCFloat32():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+
+    # Test that computing in float32 stays close to float64
+    for bDownSample in [False, True]:
+        results = hicrepSCC(cool1, cool2, h, dBPMax, bDownSample,
+                            rng=np.random.default_rng(1))
+        for kwargs in [{}, dict(bBulkLoad=True), dict(prefetch=1)]:
+            results32 = hicrepSCC(cool1, cool2, h, dBPMax, bDownSample,
+                                  rng=np.random.default_rng(1),
+                                  dtype=np.float32, **kwargs)
+            assert np.allclose(results32, results, rtol=0, atol=1e-6), f"""
+                SCC scores between {fmcool1} and {fmcool2} computed in float32
+                {results32} differ from float64 {results}
+                """
@@ -0,0 +1,44 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_Prefetcher.py
+# Description: Test the background Prefetcher
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import pytest
+from hicrep.prefetch import Prefetcher
+
+def testPrefetcher():
+    items = list(range(10))
+    # Test that the results are yielded in order
+    with Prefetcher(lambda i: i * i, items, depth=2) as prefetcher:
+        results = list(prefetcher)
+    assert results == [(i, i * i) for i in items],\
+        f"Prefetcher yields unexpected results {results}"
+
+    # Test that the fetch doesn't run further ahead than the queue depth
+    fetched = []
+    def fetch(i):
+        fetched.append(i)
+        return i
+    prefetcher = Prefetcher(fetch, items, depth=2)
+    it = iter(prefetcher)
+    assert next(it) == (0, 0), f"Prefetcher yields unexpected first result"
+    prefetcher.thread.join(timeout=0.5)
+    # 2 waiting in the queue and 1 blocked on putting into the queue
+    assert len(fetched) <= 4,\
+        f"Prefetcher fetches {len(fetched)} items ahead with depth 2"
+    prefetcher.close()
+    assert not prefetcher.thread.is_alive(),\
+        f"Prefetcher background thread is still running after close"
+
+    # Test that exceptions are re-raised to the consumer
+    def fail(i):
+        if i == 3:
+            raise ValueError("fetch failed")
+        return i
+    with Prefetcher(fail, items) as prefetcher:
+        with pytest.raises(ValueError):
+            for _ in prefetcher:
+                pass
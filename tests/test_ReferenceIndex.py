@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_ReferenceIndex.py
+# Description: Test the reference index built by buildReferenceIndex against
+# hicrepSCC
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import pytest
+from hicrep.utils import readMcool
+from hicrep.hicrep import hicrepSCC
+from hicrep.index import buildReferenceIndex, ReferenceIndex
+
+FMCOOL1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+FMCOOL2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+
+
+def testFlyHiC(tmp_path, monkeypatch):
+    cool1, _ = readMcool(FMCOOL1, -1)
+    cool2, _ = readMcool(FMCOOL2, -1)
+    h = 1
+    dBPMax = 500000
+    chrNames = ['chr2L', 'chr3R', 'chrX']
+    findex = str(tmp_path / "refs.idx")
+    buildReferenceIndex(findex, {'ref1': cool1, 'ref2': cool2, 'ref1b': cool1},
+                        h, dBPMax, chrNames)
+    index = ReferenceIndex(findex)
+    assert index.references == ['ref1', 'ref2', 'ref1b'] and\
+        index.chrNames == chrNames, f"ReferenceIndex has the wrong content"
+    # scan the references one at a time
+    monkeypatch.setattr("hicrep.index.INDEX_SCAN_BLOCK", 1)
+    scc = index.scores(cool2)
+    for i, cool in enumerate([cool1, cool2, cool1]):
+        expected = hicrepSCC(cool, cool2, h, dBPMax, False, chrNames)
+        assert np.allclose(scc[i], expected, rtol=1e-12, atol=1e-12),\
+            f"ReferenceIndex scores differ from hicrepSCC of reference {i}"
+    results = index.query(cool2, k=2)
+    assert [name for name, _, _ in results] == ['ref2', 'ref1'],\
+        f"ReferenceIndex.query returns the wrong top references"
+    assert np.isclose(results[0][1], scc[1].mean(), rtol=1e-12),\
+        f"ReferenceIndex.query returns the wrong mean score"
+    with pytest.raises(AssertionError):
+        index.scores(cool2, ['chr4'])
+
+
+def testFlyHiCFloat32(tmp_path):
+    cool1, _ = readMcool(FMCOOL1, -1)
+    cool2, _ = readMcool(FMCOOL2, -1)
+    findex = str(tmp_path / "refs.idx")
+    buildReferenceIndex(findex, {'ref1': cool1}, 1, 500000, ['chr2L'],
+                        dtype=np.float32)
+    index = ReferenceIndex(findex)
+    assert index.bands('chr2L').dtype == np.float32,\
+        f"ReferenceIndex doesn't store the bands in float32"
+    expected = hicrepSCC(cool1, cool2, 1, 500000, False, ['chr2L'])
+    assert np.allclose(index.scores(cool2)[0], expected, rtol=0, atol=1e-6),\
+        f"ReferenceIndex scores in float32 differ from hicrepSCC"
@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_SCCServer.py
+# Description: Test the in-memory SCC server SCCServer, its BandLRU and its
+# HTTP interface
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import json
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+import pytest
+from hicrep.utils import readMcool, DiagBand
+from hicrep.hicrep import hicrepSCC
+from hicrep.server import BandLRU, SCCServer, serve
+
+FMCOOL1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+FMCOOL2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+
+
+def testBandLRU():
+    lru = BandLRU(maxBytes=2 * 8 * 10)
+    nComputed = []
+
+    def compute(i):
+        nComputed.append(i)
+        return DiagBand(np.full((1, 10), float(i)))
+
+    for i in [0, 1, 0, 2]:
+        assert lru.get(i, lambda: compute(i)).data[0, 0] == i,\
+            f"BandLRU returns the wrong band of {i}"
+    # 1 is the least recently used when 2 is added
+    assert list(lru.entries) == [0, 2] and lru.nbytes == 2 * 8 * 10,\
+        f"BandLRU evicted the wrong entries {list(lru.entries)}"
+    assert nComputed == [0, 1, 2] and lru.hits == 1 and lru.misses == 3,\
+        f"BandLRU recomputed a cached entry"
+    with pytest.raises(ValueError):
+        lru.get(3, lambda: int("x"))
+    assert 3 not in lru.entries, f"BandLRU kept a failed entry"
+
+
+def testFlyHiC():
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(FMCOOL1, -1)
+    cool2, _ = readMcool(FMCOOL2, -1)
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, False)
+
+    # keep only about one chromosome in memory at a time
+    scc = SCCServer({'a': cool1, 'b': cool2}, h, dBPMax, maxBytes=1 << 18,
+                    nWorkers=2)
+    httpd = serve(scc)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        results = scc.scc('a', ['b'])['b']
+        assert np.allclose(results, expected, rtol=0, atol=1e-12),\
+            f"SCCServer scores {results} differ from hicrepSCC {expected}"
+        assert scc.stats()['nbytes'] <= 1 << 18,\
+            f"SCCServer holds more bands than its memory limit"
+
+        with urllib.request.urlopen(url + "/samples") as response:
+            samples = json.load(response)
+        assert samples['samples'] == ['a', 'b'] and\
+            samples['chrNames'] == scc.chrNames,\
+            f"GET /samples returned {samples}"
+
+        request = json.dumps({'query': 'b', 'chrNames': ['chr2L', 'chrX']})
+        with urllib.request.urlopen(url + "/scc",
+                                    request.encode('utf-8')) as response:
+            results = json.load(response)
+        iChrs = [scc.chrNames.index(c) for c in ['chr2L', 'chrX']]
+        assert results['chrNames'] == ['chr2L', 'chrX'] and\
+            np.allclose(results['scc']['a'], expected[iChrs], rtol=0,
+                        atol=1e-12),\
+            f"POST /scc returned {results}"
+
+        request = json.dumps({'query': 'c'})
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url + "/scc", request.encode('utf-8'))
+        assert e.value.code == 400, f"Unknown sample didn't return 400"
+
+        def fail(*args):
+            raise RuntimeError("oops")
+
+        scc.scc = fail
+        request = json.dumps({'query': 'a'})
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url + "/scc", request.encode('utf-8'))
+        assert e.value.code == 500 and\
+            json.load(e.value) == {'error': "RuntimeError: oops"},\
+            f"Unexpected error didn't return 500"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        scc.close()
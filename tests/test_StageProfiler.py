@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_StageProfiler.py
+# Description: Test the per-stage profiling of hicrepSCC
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import tracemalloc
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.hicrep import hicrepSCC
+from hicrep.profiler import StageProfiler, PROFILE_FIELDS
+
+def testFlyHiCProfile(tmp_path):
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    chrNames = ['chr2L', 'chrX']
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, False, chrNames)
+    stages = ['streamSubBand', 'normalize', 'meanFilterBand', 'sccByDiag']
+    for nWorkers, bTraceMemory in [(1, False), (2, False), (1, True),
+                                   (2, True)]:
+        profiler = StageProfiler(bTraceMemory)
+        assert tracemalloc.is_tracing() == bTraceMemory,\
+            f"StageProfiler({bTraceMemory}) doesn't start tracemalloc on "\
+            f"demand"
+        results = hicrepSCC(cool1, cool2, h, dBPMax, False, chrNames,
+                            nWorkers=nWorkers, profiler=profiler)
+        profiler.stop()
+        assert not tracemalloc.is_tracing(),\
+            "StageProfiler.stop() doesn't stop tracemalloc"
+        # Test that profiling doesn't change the results
+        assert (results == expected).all(),\
+            f"SCC scores computed with profiling differ from those without"
+        # Test that every stage of every chromosome is recorded
+        recorded = [(r['chrName'], r['stage']) for r in profiler.records]
+        for chrName in chrNames:
+            for stage in stages:
+                assert (chrName, stage) in recorded,\
+                    f"Stage {stage} of chromosome {chrName} is not profiled "\
+                    f"with {nWorkers} workers"
+        for record in profiler.records:
+            assert record['wallSeconds'] >= 0 and record['cpuSeconds'] >= 0,\
+                f"Invalid timing in profiling record {record}"
+            assert (record['peakAllocMB'] is not None) == bTraceMemory,\
+                f"Unexpected peak allocated memory in profiling record "\
+                f"{record}"
+            if record['stage'] == 'meanFilterBand':
+                assert record['nnzIn'] > 0 and record['nnzOut'] > 0,\
+                    f"Invalid nnz in profiling record {record}"
+        fout = str(tmp_path / "profile.tsv")
+        profiler.toTSV(fout)
+        with open(fout) as f:
+            lines = f.read().splitlines()
+        assert lines[0].split("\t") == PROFILE_FIELDS and\
+            len(lines) == len(profiler.records) + 1,\
+            f"StageProfiler.toTSV writes unexpected table"
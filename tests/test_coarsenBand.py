@@ -0,0 +1,34 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_coarsenBand.py
+# Description: Test coarsenBand against aggregating the dense matrix
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import scipy.sparse as sp
+from hicrep.utils import (
+    coarsenBand, pixels2Band
+    )
+
+def testCoarsenBand():
+    for size, factor, nDiags in [(103, 4, 10), (50, 1, 20), (37, 5, 100)]:
+        m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3)))
+        band = pixels2Band(m.row, m.col, m.data, size, size)
+        result = coarsenBand(band, factor, nDiags, binOffset=3)
+        # aggregate the zero-padded dense matrix
+        nBinsC = -(-size // factor)
+        dense = np.zeros((nBinsC * factor, nBinsC * factor))
+        dense[:size, :size] = m.toarray()
+        dense = dense.reshape(nBinsC, factor, nBinsC, factor).sum(axis=(1, 3))
+        expected = coarsenBand(pixels2Band(*np.nonzero(dense),
+                                           dense[np.nonzero(dense)],
+                                           nBinsC, nBinsC), 1, nDiags)
+        assert result.binOffset == 3,\
+            f"coarsenBand doesn't set the bin offset of the output"
+        assert result.data.shape == (min(nDiags, nBinsC) - 1, nBinsC),\
+            f"coarsenBand returns unexpected shape {result.data.shape}"
+        assert np.allclose(result.data, expected.data),\
+            f"coarsenBand differs from the aggregated dense matrix with "\
+            f"factor {factor}"
@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_coolerDatasetHash.py
+# Description: Test the util functions coolerDatasetHash() and
+# coolerDatasetSum()
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import (
+    readMcool, coolerDatasetHash, coolerDatasetSum, coolerMemo
+    )
+
+
+def testFlyHiC():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    cool1, binSize1 = readMcool(fmcool1, -1)
+    cool2, binSize2 = readMcool(fmcool2, -1)
+
+    for path in ['chroms/name', 'chroms/length', 'bins/start', 'bins/end']:
+        # chunked hash doesn't depend on the chunk size
+        assert coolerDatasetHash(cool1, path) ==\
+            coolerDatasetHash(cool2, path, chunkSize=7),\
+            f"Hash of {path} differs between {fmcool1} and {fmcool2}"
+    assert coolerDatasetHash(cool1, 'pixels/count') !=\
+        coolerDatasetHash(cool2, 'pixels/count'),\
+        f"Hash of pixels/count is the same for {fmcool1} and {fmcool2}"
+
+    for cool in [cool1, cool2]:
+        total = cool.pixels()['count'][:].sum()
+        assert coolerDatasetSum(cool, 'pixels/count', chunkSize=1000) ==\
+            total, f"coolerDatasetSum() differs from the sum of the pixels"
+
+    # the results are memoized per file
+    nMemo = len(coolerMemo)
+    coolerDatasetHash(cool1, 'chroms/name')
+    coolerDatasetSum(cool1, 'pixels/count')
+    assert len(coolerMemo) == nMemo, f"coolerDatasetHash() is not memoized"
+    assert np.any([k[-1] == 'hash:chroms/name' for k in coolerMemo]),\
+        f"coolerDatasetHash() is not memoized"
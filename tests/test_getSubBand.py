@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_getSubBand.py
+# Description: Test getSubBand against getSubCoo and trimDiags
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import (
+    readMcool, cool2pixels, getSubCoo, getSubBand, streamSubBand, trimDiags,
+    bandPixelSpans
+    )
+
+def testGetSubBand():
+    fmcool = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    cool, _ = readMcool(fmcool, -1)
+    pixels = cool2pixels(cool)
+    bins = cool.bins()
+    for chrName, dMax in [('chr2L', 6), ('chr4', 100), ('chrX', -1)]:
+        band = getSubBand(pixels, bins, chrName, dMax)
+        m = getSubCoo(pixels, bins, chrName)
+        nDiags = m.shape[0] if dMax < 0 else min(dMax, m.shape[0])
+        assert band.nBins == m.shape[0] and band.nDiags == nDiags,\
+            f"getSubBand returns band of {band.nBins} bins and {band.nDiags} "\
+            f"diagonals for chromosome {chrName} while {m.shape[0]} bins and "\
+            f"{nDiags} diagonals are expected"
+        assert band.binOffset == bins.fetch(chrName).index[0],\
+            f"getSubBand returns wrong bin offset for chromosome {chrName}"
+        expected = trimDiags(m, nDiags, False).toarray()
+        assert np.array_equal(band.toCoo().toarray(), expected),\
+            f"getSubBand returns different contacts from getSubCoo for "\
+            f"chromosome {chrName}"
+
+
+def testStreamSubBand():
+    fmcool = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    cool, _ = readMcool(fmcool, -1)
+    pixels = cool2pixels(cool)
+    bins = cool.bins()
+    # Test that reading in small chunks gives the same band as fetching the
+    # whole region at once
+    for chrName, dMax in [('chr2L', 6), ('chr4', 100), ('chrX', -1),
+                          ('chr3R:1000000-5000000', 10)]:
+        expected = getSubBand(pixels, bins, chrName, dMax)
+        for chunkSize, maxGap in [(1000, 0), (12345, 100), (1 << 22, None)]:
+            band = streamSubBand(cool, chrName, dMax, chunkSize, maxGap)
+            assert band.binOffset == expected.binOffset and\
+                np.array_equal(band.data, expected.data),\
+                f"streamSubBand with chunk size {chunkSize} and max gap "\
+                f"{maxGap} differs from getSubBand for region {chrName}"
+
+
+def testBandPixelSpans():
+    # rows of 5, 0, 2, 10 and 3 pixels
+    bin1Offset = np.array([0, 5, 5, 7, 17, 20])
+    # at most the first 3 pixels of each row with the touching spans merged
+    starts, stops = bandPixelSpans(bin1Offset, 3, 0, 100)
+    assert starts.tolist() == [0, 5, 17] and stops.tolist() == [3, 10, 20],\
+        f"bandPixelSpans returns unexpected spans {starts} {stops}"
+    # merge the spans at most 2 pixels apart
+    starts, stops = bandPixelSpans(bin1Offset, 3, 2, 100)
+    assert starts.tolist() == [0, 17] and stops.tolist() == [10, 20],\
+        f"bandPixelSpans doesn't merge spans {starts} {stops}"
+    # split the spans into chunks of at most 4 pixels
+    starts, stops = bandPixelSpans(bin1Offset, -1, 0, 4)
+    assert starts.tolist() == [0, 4, 8, 12, 16] and\
+        stops.tolist() == [4, 8, 12, 16, 20],\
+        f"bandPixelSpans doesn't split spans {starts} {stops}"
@@ -0,0 +1,53 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_gitRevision.py
+# Description: Test the function gitRevision() that reads the git revision
+# without running git
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import os
+from hicrep import gitRevision
+
+
+def writeFile(fname: str, content: str):
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    with open(fname, 'w') as f:
+        f.write(content)
+
+
+def testGitRevision(tmp_path):
+    rev = "0123456789abcdef0123456789abcdef01234567"
+
+    repo = str(tmp_path / "loose")
+    writeFile(os.path.join(repo, ".git", "HEAD"), "ref: refs/heads/dev\n")
+    writeFile(os.path.join(repo, ".git", "refs", "heads", "dev"), rev + "\n")
+    assert gitRevision(repo) == (rev, "dev"),\
+        f"gitRevision() failed to read a loose ref"
+
+    repo = str(tmp_path / "packed")
+    writeFile(os.path.join(repo, ".git", "HEAD"), "ref: refs/heads/main\n")
+    writeFile(os.path.join(repo, ".git", "packed-refs"),
+              "# pack-refs with: peeled fully-peeled sorted\n"
+              f"{rev} refs/heads/main\n")
+    assert gitRevision(repo) == (rev, "main"),\
+        f"gitRevision() failed to read a packed ref"
+
+    repo = str(tmp_path / "detached")
+    writeFile(os.path.join(repo, ".git", "HEAD"), rev + "\n")
+    assert gitRevision(repo) == (rev, "HEAD"),\
+        f"gitRevision() failed to read a detached HEAD"
+
+    # worktree with a .git file pointing to the git directory whose refs are
+    # in the main git directory
+    repo = str(tmp_path / "worktree")
+    gitDir = str(tmp_path / "loose" / ".git" / "worktrees" / "wt")
+    writeFile(os.path.join(repo, ".git"), f"gitdir: {gitDir}\n")
+    writeFile(os.path.join(gitDir, "HEAD"), "ref: refs/heads/dev\n")
+    writeFile(os.path.join(gitDir, "commondir"), "../..\n")
+    assert gitRevision(repo) == (rev, "dev"),\
+        f"gitRevision() failed to read the ref of a worktree"
+
+    assert gitRevision(str(tmp_path / "nogit")) is None,\
+        f"gitRevision() returned a revision outside of a git repository"
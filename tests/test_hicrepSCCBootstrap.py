@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_hicrepSCCBootstrap.py
+# Description: Test the batched bootstrap replicates of hicrepSCCBootstrap
+# against scoring the replicates one at a time
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import scipy.sparse as sp
+from hicrep.utils import (
+    readMcool, pixels2Band, resampleBandReplicates, meanFilterBand, DiagBand
+    )
+from hicrep.hicrep import (
+    sccOfChrBootstrap, hicrepSCCBootstrap, bootstrapSummary, sccByDiag,
+    hicrepSCC
+    )
+
+FMCOOL1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+FMCOOL2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+
+
+def randomBand(size: int, nDiags: int, seed: int):
+    m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3,
+                                        random_state=seed), k=1))
+    return pixels2Band(m.row, m.col, np.ceil(m.data * 10), size, nDiags)
+
+
+def testResampleBandReplicates():
+    band = randomBand(100, 20, 0)
+    data = resampleBandReplicates(band, 500, 8, np.random.default_rng(0))
+    assert data.shape == band.data.shape + (8,),\
+        f"resampleBandReplicates returns the wrong shape {data.shape}"
+    assert np.all(data.sum(axis=(0, 1)) == 500),\
+        f"resampleBandReplicates doesn't keep the number of contacts"
+    assert np.all(data[band.data == 0] == 0),\
+        f"resampleBandReplicates draws elements that are zeros in the input"
+
+
+def testSccOfChrBootstrap():
+    b1 = randomBand(100, 20, 1)
+    b2 = randomBand(100, 20, 2)
+    h = 2
+    nReplicates = 6
+    size = min(b1.data.sum(), b2.data.sum())
+    scc = sccOfChrBootstrap(b1, b2, h, nReplicates, True,
+                            np.random.default_rng(3))
+    # the same draws scored one replicate at a time
+    rng = np.random.default_rng(3)
+    x = resampleBandReplicates(b1, size, nReplicates, rng)
+    y = resampleBandReplicates(b2, size, nReplicates, rng)
+    expected = [sccByDiag(meanFilterBand(DiagBand(x[..., r]), h),
+                          meanFilterBand(DiagBand(y[..., r]), h), b1.nDiags)
+                for r in range(nReplicates)]
+    assert np.allclose(scc, expected, rtol=1e-12, atol=1e-12),\
+        f"sccOfChrBootstrap differs from scoring the replicates one at a time"
+
+
+def testFlyHiC(monkeypatch):
+    cool1, _ = readMcool(FMCOOL1, -1)
+    cool2, _ = readMcool(FMCOOL2, -1)
+    chrNames = ['chr2L', 'chrX']
+    # smooth and score a few replicates at a time
+    monkeypatch.setattr("hicrep.hicrep.BOOTSTRAP_BLOCK", 10000)
+    scc = hicrepSCCBootstrap(cool1, cool2, 1, 500000, False, 40, chrNames,
+                             rng=np.random.default_rng(0))
+    assert scc.shape == (2, 40) and np.all(np.abs(scc) <= 1),\
+        f"hicrepSCCBootstrap returns invalid scores {scc}"
+    mean, sd, lo, hi = bootstrapSummary(scc, 0.9)
+    expected = hicrepSCC(cool1, cool2, 1, 500000, False, chrNames)
+    assert np.all(lo <= hi) and np.all(sd > 0) and\
+        np.all(np.abs(mean - expected) < 5 * sd + 1e-3),\
+        f"Bootstrap summary {mean} {sd} {lo} {hi} is off from {expected}"
@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_hicrepSCCByH.py
+# Description: Test hicrepSCCByH and selectH using public data
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.profiler import StageProfiler
+from hicrep.hicrep import (
+    hicrepSCC, hicrepSCCByH, selectH
+    )
+
+def testFlyHiCByH():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    dBPMax = 500000
+    bDownSample = False
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    hs = [0, 1, 2, 3]
+    results = hicrepSCCByH(cool1, cool2, hs, dBPMax, bDownSample)
+    nChrs = cool1.chroms()[:].shape[0]
+    assert results.shape == (len(hs), nChrs),\
+        f"hicrepSCCByH returns unexpected shape {results.shape}"
+    # Test that each half-size agrees with hicrepSCC
+    for h, scc in zip(hs, results):
+        expected = hicrepSCC(cool1, cool2, h, dBPMax, bDownSample)
+        assert np.allclose(scc, expected),\
+            f"hicrepSCCByH differs from hicrepSCC with h = {h}"
+
+
+def testSelectH():
+    hs = [0, 1, 2, 3, 4]
+    # stops at the first half-size after which the score increases by less
+    # than 0.01
+    assert selectH(hs, [0.5, 0.6, 0.65, 0.652, 0.8]) == 2,\
+        f"selectH doesn't select the half-size at which the SCC stabilizes"
+    assert selectH(hs, [0.5, 0.6, 0.7, 0.8, 0.9]) == 4,\
+        f"selectH doesn't select the largest half-size without stabilization"
+    # the per-chromosome scores are averaged
+    scc = np.array([[0.5, 0.7], [0.6, 0.8], [0.6, 0.8], [0.9, 0.9],
+                    [0.9, 0.9]])
+    assert selectH(hs, scc) == 1,\
+        f"selectH doesn't average the SCC of the chromosomes"
+
+
+def testFlyHiCByHFloat32():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    hs = [0, 2, 5]
+    chrNames = ['chr2L', 'chrX']
+    profiler = StageProfiler()
+    try:
+        results = hicrepSCCByH(cool1, cool2, hs, dBPMax, False, chrNames,
+                               profiler=profiler, dtype=np.float32)
+    finally:
+        profiler.stop()
+    expected = hicrepSCCByH(cool1, cool2, hs, dBPMax, False, chrNames)
+    assert np.allclose(results, expected, rtol=0, atol=1e-5),\
+        f"hicrepSCCByH in float32 differs from float64"
+    assert {record['stage'] for record in profiler.records} >=\
+        {'streamSubBand', 'normalize', 'meanFilterBandRange'},\
+        f"hicrepSCCByH doesn't record its stages to the profiler"
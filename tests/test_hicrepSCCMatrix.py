@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_hicrepSCCMatrix.py
+# Description: Test all-vs-all hicrepSCCMatrix against pairwise hicrepSCC
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.hicrep import (
+    hicrepSCC, hicrepSCCMatrix
+    )
+
+def testFlyHiCMatrix():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    bDownSample = False
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    cools = [cool1, cool2, cool1]
+    results = hicrepSCCMatrix(cools, h, dBPMax, bDownSample)
+    nChrs = cool1.chroms()[:].shape[0]
+    assert results.shape == (3, 3, nChrs),\
+        f"hicrepSCCMatrix returns unexpected shape {results.shape}"
+    assert np.allclose(results, results.transpose((1, 0, 2))),\
+        f"hicrepSCCMatrix returns non-symmetric SCC matrix"
+    # Test that each pair agrees with the pairwise computation
+    for i, j in [(0, 0), (0, 1), (1, 1), (0, 2)]:
+        expected = hicrepSCC(cools[i], cools[j], h, dBPMax, bDownSample)
+        assert np.allclose(results[i, j], expected),\
+            f"hicrepSCCMatrix differs from hicrepSCC between input {i} and {j}"
+    # Test that the copy of an input scores the same as the input itself
+    assert np.allclose(results[0, 2], results[0, 0]),\
+        f"hicrepSCCMatrix scores a copy of {fmcool1} differently from itself"
+
+    # Test chromosome subset
+    chrNames = ['chr2L', 'chrX']
+    resultsSub = hicrepSCCMatrix(cools, h, dBPMax, bDownSample, chrNames)
+    assert np.allclose(resultsSub, results[:, :, [0, 5]]),\
+        f"hicrepSCCMatrix on chromosome subset {chrNames} differs from those "\
+        f"computed from the whole set"
+
+
+def testFlyHiCMatrixSelfDegenerate():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    # chrY has near-constant diagonals after smoothing whose zero-variance
+    # cut-off is decided by rounding
+    h = 2
+    dBPMax = -1
+    bDownSample = False
+    chrNames = ['chrY']
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+    cools = [cool1, cool2]
+    results = hicrepSCCMatrix(cools, h, dBPMax, bDownSample, chrNames)
+    for i, cool in enumerate(cools):
+        expected = hicrepSCC(cool, cool, h, dBPMax, bDownSample, chrNames)
+        assert np.allclose(results[i, i], expected, rtol=1e-12, atol=0),\
+            f"hicrepSCCMatrix scores input {i} against itself as "\
+            f"{results[i, i]} instead of {expected} on {chrNames}"
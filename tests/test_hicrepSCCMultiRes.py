@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_hicrepSCCMultiRes.py
+# Description: Test hicrepSCCMultiRes against hicrepSCC on zoomified data
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import pytest
+import cooler
+from hicrep import readFinestCool
+from hicrep.utils import readMcool
+from hicrep.cache import BandCache
+from hicrep.hicrep import (
+    hicrepSCC, hicrepSCCMultiRes
+    )
+
+def testFlyHiCMultiRes(tmp_path):
+    fcools = ["tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool",
+              "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"]
+    binSizes = [100000, 200000, 500000]
+    hs = [1, 2, 0]
+    dBPMaxs = [500000, 2000000, -1]
+    fmcools = []
+    for i, fcool in enumerate(fcools):
+        fmcool = str(tmp_path / f"input{i}.mcool")
+        cooler.zoomify_cooler(fcool, fmcool, binSizes, chunksize=10000000)
+        fmcools.append(fmcool)
+    cool1, _ = readMcool(fmcools[0], binSizes[0])
+    cool2, _ = readMcool(fmcools[1], binSizes[0])
+    results = hicrepSCCMultiRes(cool1, cool2, binSizes, hs, dBPMaxs, False)
+    nChrs = cool1.chroms()[:].shape[0]
+    assert results.shape == (len(binSizes), nChrs),\
+        f"hicrepSCCMultiRes returns unexpected shape {results.shape}"
+    # Test that each resolution agrees with hicrepSCC on the coarser
+    # resolutions of the mcool files
+    for binSize, h, dBPMax, scc in zip(binSizes, hs, dBPMaxs, results):
+        coolC1, _ = readMcool(fmcools[0], binSize)
+        coolC2, _ = readMcool(fmcools[1], binSize)
+        expected = hicrepSCC(coolC1, coolC2, h, dBPMax, False)
+        assert np.allclose(scc, expected),\
+            f"hicrepSCCMultiRes differs from hicrepSCC at bin size {binSize}"
+
+
+def testFlyHiCMultiResCache(tmp_path):
+    fcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    binSizes = [100000, 300000]
+    hs = [1, 1]
+    dBPMaxs = [500000, 1500000]
+    chrNames = ['chr2L', 'chr4']
+    cool1, _ = readMcool(fcool1, -1)
+    cool2, _ = readMcool(fcool2, -1)
+    expected = hicrepSCCMultiRes(cool1, cool2, binSizes, hs, dBPMaxs, False,
+                                 chrNames)
+    cache = BandCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        # the second run reads the coarse bands from the cache
+        scc = hicrepSCCMultiRes(cool1, cool2, binSizes, hs, dBPMaxs, False,
+                                chrNames, cache=cache, dtype=np.float32)
+        assert np.allclose(scc, expected, rtol=0, atol=1e-5),\
+            f"hicrepSCCMultiRes in float32 with a cache differs from float64"
+    assert len(list((tmp_path / "cache").glob("*.npy"))) ==\
+        2 * len(binSizes) * len(chrNames),\
+        f"hicrepSCCMultiRes doesn't cache every resolution of every input"
+
+
+def testReadFinestCool(tmp_path):
+    fcool = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool = str(tmp_path / "input.mcool")
+    cooler.zoomify_cooler(fcool, fmcool, [100000, 200000], chunksize=10000000)
+    assert readFinestCool(fcool, 100000).binsize == 100000,\
+        f"readFinestCool doesn't read a cool file as is"
+    assert readFinestCool(fmcool, 200000).binsize == 200000,\
+        f"readFinestCool doesn't select the bin size of a mcool file"
+    with pytest.raises(AssertionError):
+        readFinestCool(fmcool, 50000)
+    fother = tmp_path / "input.txt"
+    fother.write_text("not a cool file\n")
+    with pytest.raises(AssertionError):
+        readFinestCool(str(fother), 100000)
@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_ladderBands.py
+# Description: Test the down sampling ladder ladderBands and its use by
+# hicrepSCC and hicrepSCCMatrix
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.cache import BandCache
+from hicrep.hicrep import (
+    ladderBands, ladderLevel, ladderDepth, bandTotal, hicrepSCC,
+    hicrepSCCMatrix, prefetchBands, diagCutoff
+    )
+
+FMCOOL1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+FMCOOL2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+
+
+def testLadderLevel():
+    for level in range(60):
+        depth = ladderDepth(level)
+        assert ladderLevel(depth) == level and\
+            ladderLevel(np.nextafter(depth, 0)) == level - (level > 0),\
+            f"ladderLevel of {depth} contacts isn't {level}"
+    assert ladderLevel(0) == 0, f"ladderLevel of 0 contacts isn't 0"
+
+
+def testLadderBands():
+    cool, _ = readMcool(FMCOOL1, -1)
+    dMax = 6
+    total, _ = bandTotal(cool, 'chr2L', dMax)
+    top = ladderLevel(total)
+    levels = [top, top - 1, top - 4]
+    bands = ladderBands(cool, 'chr2L', 0, dMax, levels)
+    for upper, lower in zip(levels[:-1], levels[1:]):
+        assert np.all(bands[lower].data <= bands[upper].data),\
+            f"Level {lower} is not nested in level {upper}"
+    for level in levels:
+        assert abs(bands[level].data.sum() / ladderDepth(level) - 1) < 0.01,\
+            f"Level {level} doesn't have {ladderDepth(level)} contacts"
+    # a level doesn't depend on the levels requested with it
+    alone = ladderBands(cool, 'chr2L', 0, dMax, [top - 4])
+    assert np.array_equal(alone[top - 4].data, bands[top - 4].data),\
+        f"Level {top - 4} depends on the levels requested with it"
+
+
+def testFlyHiC(tmp_path):
+    cool1, _ = readMcool(FMCOOL1, -1)
+    cool2, _ = readMcool(FMCOOL2, -1)
+    h = 1
+    dBPMax = 500000
+    chrNames = ['chr2L', 'chr4', 'chrX']
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, True, chrNames,
+                         bLadder=True)
+    assert np.all(np.abs(expected) <= 1), f"Invalid scc scores {expected}"
+    cache = BandCache(str(tmp_path))
+    for _ in range(2):
+        # the second run reads the levels from the cache
+        scc = hicrepSCC(cool1, cool2, h, dBPMax, True, chrNames, cache=cache,
+                        bLadder=True)
+        assert np.array_equal(scc, expected),\
+            f"hicrepSCC with ladder differs with a cache"
+    # the prefetcher doesn't read the bands whose levels are cached
+    dMax = diagCutoff(cool1, 100000, dBPMax)
+    for chrName in chrNames:
+        bands = prefetchBands([cool1, cool2], chrName, h, dMax, True, cache,
+                              bLadder=True)
+        assert bands == (None, None),\
+            f"prefetchBands reads the bands of {chrName} with cached levels"
+    scc = hicrepSCC(cool1, cool2, h, dBPMax, True, chrNames, cache=cache,
+                    prefetch=1, bLadder=True)
+    assert np.array_equal(scc, expected),\
+        f"hicrepSCC with ladder differs with prefetching"
+    scc = hicrepSCCMatrix([cool1, cool2, cool1], h, dBPMax, True, chrNames,
+                          bLadder=True)
+    for i, j in [(0, 1), (1, 2), (0, 2), (1, 1)]:
+        cools = [cool1, cool2, cool1]
+        assert np.allclose(scc[i, j], hicrepSCC(cools[i], cools[j], h, dBPMax,
+                                                True, chrNames, bLadder=True),
+                           rtol=1e-12, atol=1e-12),\
+            f"hicrepSCCMatrix with ladder differs from hicrepSCC for {i}, {j}"
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_lazyImport.py
+# Description: Test that importing the package and printing the help of the
+# command line tools don't load the numerical modules and that the lazily
+# re-exported names are available
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import sys
+import subprocess
+import importlib
+import hicrep
+
+HEAVY_MODULES = ['numpy', 'scipy', 'pandas', 'h5py', 'cooler']
+
+
+def loadedModules(code: str):
+    """Run code in a fresh interpreter and return which of the heavy modules
+    it loaded"""
+    code += ("\nimport sys\n"
+             f"print('@loaded', *[m for m in {HEAVY_MODULES} if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], check=True,
+                         stdout=subprocess.PIPE, encoding='utf-8').stdout
+    return out.strip().split("\n")[-1].split()[1:]
+
+
+def testLazyImport():
+    assert loadedModules("import hicrep") == [],\
+        "Importing hicrep loads the numerical modules"
+    code = ("import sys, hicrep\n"
+            "sys.argv = ['hicrep', '--help']\n"
+            "try:\n"
+            "    hicrep.main()\n"
+            "except SystemExit:\n"
+            "    pass")
+    assert loadedModules(code) == [],\
+        "hicrep --help loads the numerical modules"
+
+
+def testLazyExports():
+    for name, module in hicrep.LAZY_EXPORTS.items():
+        assert getattr(hicrep, name) is\
+            getattr(importlib.import_module(module), name),\
+            f"hicrep.{name} is not re-exported from {module}"
+        assert name in dir(hicrep), f"hicrep.{name} is not listed by dir()"
+    for name in hicrep.LAZY_SUBMODULES:
+        assert getattr(hicrep, name) is\
+            importlib.import_module(f"hicrep.{name}"),\
+            f"hicrep.{name} is not the submodule"
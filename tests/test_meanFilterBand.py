@@ -0,0 +1,50 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_meanFilterBand.py
+# Description: Test meanFilterBand against meanFilterSparse
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import scipy.sparse as sp
+from hicrep.utils import (
+    meanFilterSparse, meanFilterBand, pixels2Band
+    )
+
+def testMeanFilterBand():
+    size = 200
+    for nDiags in [2, 30, size]:
+        m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3), k=1))
+        band = pixels2Band(m.row, m.col, m.data, size, nDiags)
+        for h in [1, 4, 10]:
+            result = meanFilterBand(band, h)
+            assert result.nDiags == nDiags and result.nBins == size,\
+                f"meanFilterBand returns band of different shape than input"
+            expected = meanFilterSparse(band.toCoo(), h, nDiags).toarray()
+            assert np.allclose(result.toCoo().toarray(), expected,
+                               rtol=1e-12, atol=1e-12),\
+                f"meanFilterBand differs from meanFilterSparse with "\
+                f"filter size {h} and {nDiags} diagonals"
+
+
+def testMeanFilterBandFloat32(monkeypatch):
+    size = 200
+    nDiags = 50
+    m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3,
+                                        random_state=1), k=1))
+    band = pixels2Band(m.row, m.col, m.data, size, nDiags)
+    # decay the contacts by 6 orders of magnitude away from the diagonal so
+    # that a prefix sum in float32 would lose the far diagonals
+    band.data *= 10.0 ** (-6 * np.arange(nDiags - 1) / nDiags)[:, None]
+    band32 = pixels2Band(m.row, m.col, m.data, size, nDiags)
+    band32.data = band.data.astype(np.float32)
+    # accumulate over several blocks of columns
+    monkeypatch.setattr("hicrep.utils.BOX_SUM_BLOCK", 1000)
+    for h in [1, 5]:
+        expected = meanFilterBand(band, h).data
+        result = meanFilterBand(band32, h).data
+        assert result.dtype == np.float32,\
+            f"meanFilterBand doesn't keep the float32 input type"
+        assert np.allclose(result, expected, rtol=1e-5, atol=0),\
+            f"meanFilterBand loses precision in float32 with filter size {h}"
@@ -0,0 +1,31 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_meanFilterBandRange.py
+# Description: Test meanFilterBandRange against meanFilterBand
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import scipy.sparse as sp
+from hicrep.utils import (
+    meanFilterBand, meanFilterBandRange, pixels2Band
+    )
+
+def testMeanFilterBandRange():
+    size = 300
+    nDiags = 40
+    m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.1), k=1))
+    band = pixels2Band(m.row + 7, m.col + 7, m.data, size, nDiags,
+                       binOffset=7)
+    hs = [0, 1, 2, 5, 20, 60]
+    results = list(meanFilterBandRange(band, hs))
+    assert [h for h, _ in results] == hs,\
+        f"meanFilterBandRange doesn't yield the half-sizes in order"
+    for h, filtered in results:
+        expected = band if h == 0 else meanFilterBand(band, h)
+        assert filtered.diagOffset == band.diagOffset and\
+            filtered.binOffset == band.binOffset,\
+            f"meanFilterBandRange doesn't keep the offsets of the input band"
+        assert np.allclose(filtered.data, expected.data),\
+            f"meanFilterBandRange differs from meanFilterBand with h = {h}"
@@ -13,7 +13,7 @@ import scipy.ndimage as spi
 from scipy.signal import convolve2d
 import numpy as np
 from hicrep.utils import (
-    meanFilterSparse
+    meanFilterSparse, trimDiags
     )
 
 def testMeanFilterSparse():
@@ -42,3 +42,23 @@ def testMeanFilterSparse():
                 f"{diff.toarray()}"\
                 f"Max difference is:\n"\
                 f"{diff.max()}"
+
+
+def testMeanFilterSparseBand():
+    # test that restricting the output to the diagonals used by sccByDiag
+    # doesn't change the results on those diagonals
+    size = 300
+    nDiags = 40
+    a = sp.triu(sp.random(size, size, density=0.3), k=1)
+    a = trimDiags(sp.coo_matrix(a), nDiags, False)
+    for h in [1, 5, 20]:
+        aFull = meanFilterSparse(a, h).toarray()
+        aBand = meanFilterSparse(a, h, nDiags).toarray()
+        for d in range(1, nDiags):
+            assert np.allclose(np.diagonal(aFull, d), np.diagonal(aBand, d),
+                               rtol=1e-12, atol=1e-12),\
+                f"Wrong mean filter results on diagonal {d} with filter size {h}"
+        assert np.count_nonzero(np.tril(aBand)) == 0 and\
+            np.count_nonzero(np.triu(aBand, nDiags)) == 0,\
+            f"Mean filter results outside of diagonals [1, {nDiags}) are not "\
+            f"removed with filter size {h}"
@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_orderPairs.py
+# Description: Test the batch functions orderPairs() and shardPairs()
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import pytest
+from hicrep.batch import orderPairs, shardPairs, parseShard
+
+
+def testOrderPairs():
+    pairs = [('a', 'b'), ('c', 'd'), ('b', 'c'), ('e', 'f'), ('a', 'd'),
+             ('f', 'g')]
+    order = orderPairs(pairs)
+    assert sorted(order) == list(range(len(pairs))),\
+        f"orderPairs() doesn't return a permutation of the pairs"
+    assert order == [0, 2, 1, 4, 3, 5],\
+        f"orderPairs() doesn't chain the pairs sharing a file"
+    # each pair but the ones starting a new chain shares a file with the
+    # previous one
+    nShared = sum(len(set(pairs[i]) & set(pairs[j])) > 0
+                  for i, j in zip(order[:-1], order[1:]))
+    assert nShared == len(pairs) - 2,\
+        f"orderPairs() doesn't keep the pairs sharing a file together"
+
+
+def testShardPairs():
+    order = list(range(10))
+    shards = [shardPairs(order, i, 3) for i in range(3)]
+    assert sum(shards, []) == order,\
+        f"shardPairs() doesn't split the pairs into contiguous shards"
+    assert [len(shard) for shard in shards] == [3, 3, 4],\
+        f"shardPairs() doesn't split the pairs evenly"
+    assert parseShard("2/3") == (2, 3), f"parseShard() failed to parse 2/3"
+    for shard in ["3/3", "1", "a/2"]:
+        with pytest.raises(AssertionError):
+            parseShard(shard)
@@ -11,7 +11,7 @@
 import numpy as np
 from scipy.sparse import coo_matrix
 from hicrep.utils import (
-    resample
+    resample, resampleBand, DiagBand
     )
 
 def testResample():
@@ -36,3 +36,36 @@ def testResample():
     # And there should be more contact in the bin with 1000 times more contacts
     assert result[3] > result[1],\
         f"resample returns an array which doesn't sum to size (when size = 0)"
+
+
+def testResampleGenerator():
+    arr = coo_matrix(np.random.rand(100, 100) * 1e6)
+    size = int(5e8)
+
+    # Test that the counts are drawn without enumerating every read and that
+    # a seeded Generator makes the result reproducible
+    result1 = resample(arr, size, np.random.default_rng(1))
+    result2 = resample(arr, size, np.random.default_rng(1))
+    assert result1.sum() == size,\
+        f"resample returns an array which doesn't sum to size with a Generator"
+    assert np.array_equal(result1.toarray(), result2.toarray()),\
+        f"resample isn't reproducible with a seeded Generator"
+    # The resampled counts should be within a few standard deviations of the
+    # expected counts
+    expected = arr.toarray() / arr.sum() * size
+    assert np.all(np.abs(result1.toarray() - expected) <=
+                  6 * np.sqrt(expected) + 1),\
+        f"resample returns counts too far from the expected counts"
+
+
+def testResampleBand():
+    data = np.array([[0, 1, 3, 1000], [3, 1, 0, 0]], dtype=float)
+    band = DiagBand(data, binOffset=10)
+    result = resampleBand(band, 100000, np.random.default_rng(2))
+    assert result.data.sum() == 100000,\
+        f"resampleBand returns a band which doesn't sum to size"
+    assert np.all(result.data[data == 0] == 0),\
+        f"resampleBand puts contacts in an element without contacts"
+    assert result.diagOffset == band.diagOffset and\
+        result.binOffset == band.binOffset,\
+        f"resampleBand doesn't keep the offsets of the input band"
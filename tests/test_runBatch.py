@@ -0,0 +1,113 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_runBatch.py
+# Description: Test the resumable batch runner runBatch() with its
+# CheckpointStore and the pair list readers
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import pytest
+import numpy as np
+from hicrep.utils import readMcool
+from hicrep.hicrep import hicrepSCC
+from hicrep.batch import readPairs, CheckpointStore, runBatch
+
+FMCOOL1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+FMCOOL2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+
+
+def testReadPairs(tmp_path):
+    pairs = readPairs("tests/data/fly_hi-c/metadata_2020-02-13-00h-46m.tsv")
+    assert pairs == [(FMCOOL1, FMCOOL2)],\
+        f"readPairs() failed to read the pairs of a sample sheet"
+    fpairs = str(tmp_path / "pairs.tsv")
+    with open(fpairs, 'w') as f:
+        f.write(f"# comment\n{FMCOOL1}\t{FMCOOL2}\n\n{FMCOOL2}\t{FMCOOL1}\n")
+    assert readPairs(fpairs) == [(FMCOOL1, FMCOOL2), (FMCOOL2, FMCOOL1)],\
+        f"readPairs() failed to read a pair list"
+
+
+def testCheckpointStore(tmp_path):
+    fcheckpoint = str(tmp_path / "checkpoint.tsv")
+    params = dict(h=1, dBPMax=500000)
+    with CheckpointStore(fcheckpoint, params) as store:
+        store.append('a', 'b', 'chr1', 0.5)
+        store.append('a', 'b', 'chr2', 0.25)
+    # simulate a crash in the middle of a line
+    with open(fcheckpoint, 'a') as f:
+        f.write("a\tb\tchr3")
+    with CheckpointStore(fcheckpoint, params) as store:
+        assert store.done('a', 'b') == {'chr1': 0.5, 'chr2': 0.25},\
+            f"CheckpointStore failed to read back the results"
+        store.append('a', 'b', 'chr3', 0.125)
+    with CheckpointStore(fcheckpoint, params) as store:
+        assert store.done('a', 'b') ==\
+            {'chr1': 0.5, 'chr2': 0.25, 'chr3': 0.125},\
+            f"CheckpointStore failed to append after a line cut short"
+    with pytest.raises(AssertionError):
+        CheckpointStore(fcheckpoint, dict(h=2, dBPMax=500000))
+
+
+def testFlyHiC(tmp_path):
+    h = 1
+    dBPMax = 500000
+    cool1, binSize1 = readMcool(FMCOOL1, -1)
+    cool2, binSize2 = readMcool(FMCOOL2, -1)
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, False, excludeChr={'M'})
+
+    fcheckpoint = str(tmp_path / "checkpoint.tsv")
+    pairs = [(FMCOOL1, FMCOOL2)]
+    with CheckpointStore(fcheckpoint, {}) as store:
+        # pretend that the run died after the first chromosome
+        store.append(FMCOOL1, FMCOOL2, 'chr2L', 0.125)
+    with CheckpointStore(fcheckpoint, {}) as store:
+        results = runBatch(pairs, [0], store, -1, h, dBPMax, False,
+                           excludeChr={'M'})
+    fmcool1, fmcool2, chrNames, scc = results[0]
+    assert chrNames[0] == 'chr2L' and scc[0] == 0.125,\
+        f"runBatch() recomputed a chromosome already in the checkpoint"
+    assert np.allclose(scc[1:], expected[1:], atol=1e-12),\
+        f"runBatch() differs from hicrepSCC()"
+
+    with CheckpointStore(fcheckpoint, {}) as store:
+        assert len(store.done(FMCOOL1, FMCOOL2)) == len(chrNames),\
+            f"runBatch() didn't checkpoint every chromosome"
+
+
+def testOpenCoolers(tmp_path, monkeypatch):
+    fcools = []
+    for i in range(4):
+        fcool = tmp_path / f"input{i}.cool"
+        fcool.write_bytes(open([FMCOOL1, FMCOOL2][i % 2], 'rb').read())
+        fcools.append(str(fcool))
+    opened = []
+
+    def openCooler(fname, binSize):
+        cool, binSize = readMcool(fname, binSize)
+        opened.append(cool)
+        return cool, binSize
+
+    nOpen = []
+
+    def scc(*args, **kwargs):
+        nOpen.append(sum(bool(cool.store) for cool in opened))
+        return hicrepSCC(*args, **kwargs)
+
+    monkeypatch.setattr("hicrep.batch.readMcool", openCooler)
+    monkeypatch.setattr("hicrep.batch.hicrepSCC", scc)
+    monkeypatch.setattr("hicrep.batch.BATCH_OPEN_COOLERS", 2)
+    pairs = [(fcools[0], fcools[1]), (fcools[1], fcools[2]),
+             (fcools[2], fcools[3]), (fcools[3], fcools[0])]
+    with CheckpointStore(str(tmp_path / "checkpoint.tsv"), {}) as store:
+        results = runBatch(pairs, range(len(pairs)), store, -1, 1, 500000,
+                           False, ['chr4'])
+    expected = hicrepSCC(readMcool(FMCOOL1, -1)[0], readMcool(FMCOOL2, -1)[0],
+                         1, 500000, False, ['chr4'])
+    for _, _, _, result in results:
+        assert np.allclose(result, expected, atol=1e-12),\
+            f"runBatch() differs from hicrepSCC() after closing inputs"
+    assert len(opened) == 5 and max(nOpen) == 2,\
+        f"runBatch() doesn't keep the open inputs to the last 2 used"
+    assert not any(bool(cool.store) for cool in opened),\
+        f"runBatch() doesn't close its inputs"
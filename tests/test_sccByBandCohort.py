@@ -0,0 +1,33 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_sccByBandCohort.py
+# Description: test sccByBandCohort
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import scipy.sparse as sp
+from hicrep.utils import pixels2Band, meanFilterBand
+from hicrep.hicrep import (
+    sccByDiag, sccByBandCohort
+    )
+
+def testSccByBandCohort():
+    size = 500
+    nDiags = 50
+    bands = []
+    for i in range(5):
+        m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.1), k=1))
+        band = pixels2Band(m.row, m.col, m.data, size, nDiags)
+        # mix smoothed and sparse inputs
+        bands.append(meanFilterBand(band, 1) if i % 2 else band)
+    for n in [2, nDiags // 2, nDiags]:
+        scc = sccByBandCohort(bands, n)
+        assert scc.shape == (len(bands), len(bands)),\
+            f"sccByBandCohort returns unexpected shape {scc.shape}"
+        # Test that every pair agrees with the pairwise computation
+        expected = np.array([[sccByDiag(b1, b2, n) for b2 in bands]
+                             for b1 in bands])
+        assert np.allclose(scc, expected),\
+            f"sccByBandCohort differs from sccByDiag with {n} diagonals"
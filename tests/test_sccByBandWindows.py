@@ -0,0 +1,114 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Usage: test_sccByBandWindows.py
+# Description: Test the sliding-window scores of sccByBandWindows() and
+# hicrepSCCWindows() against scoring each window from scratch
+#
+# Distributed under terms of the GNU General Public License v3.0.
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from hicrep.utils import readMcool, pixels2Band, meanFilterBand, DiagBand
+from hicrep.hicrep import (
+    sccByDiag, sccByBand, sccByBandWindows, hicrepSCC, hicrepSCCWindows
+    )
+
+
+def windowBand(b: DiagBand, start: int, stop: int):
+    """Slice the elements (i, j) of a band with both i and j in [start, stop)"""
+    data = b.data[:, start:stop].copy()
+    for k in range(data.shape[0]):
+        data[k, max(stop - start - k - b.diagOffset, 0):] = 0
+    return DiagBand(data, b.diagOffset)
+
+
+def testSccByBandWindows():
+    size = 150
+    nDiags = 20
+    bands = []
+    for seed in [1, 2]:
+        m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3,
+                                            random_state=seed), k=1))
+        bands.append(meanFilterBand(
+            pixels2Band(m.row, m.col, m.data, size, nDiags), 1))
+    b1, b2 = bands
+    m1 = b1.toCoo().tocsr()
+    m2 = b2.toCoo().tocsr()
+    for winBins, stepBins in [(30, 7), (30, 30), (10, 40), (200, 5)]:
+        starts, scc = sccByBandWindows(b1, b2, nDiags, winBins, stepBins)
+        expectedStarts = np.arange(0, max(size - winBins, 0) + 1, stepBins)
+        if expectedStarts[-1] + winBins < size:
+            expectedStarts = np.append(expectedStarts, size - winBins)
+        assert (starts == expectedStarts).all(),\
+            f"sccByBandWindows windows start at {starts}"
+        for start, result in zip(starts, scc):
+            stop = min(start + winBins, size)
+            expected = sccByDiag(m1[start:stop, start:stop].tocoo(),
+                                 m2[start:stop, start:stop].tocoo(), nDiags)
+            assert np.isclose(result, expected, rtol=0, atol=1e-12),\
+                f"sccByBandWindows differs from scoring the window "\
+                f"[{start}, {stop}) from scratch"
+
+
+def testSccByBandWindowsDrift():
+    # heavy-tailed contacts and small steps over many windows make the
+    # round-off of the incremental updates add up
+    size = 3000
+    nDiags = 50
+    rng = np.random.default_rng(1)
+    bands = []
+    for seed in [1, 2]:
+        m = sp.coo_matrix(sp.triu(sp.random(size, size, density=0.3,
+                                            random_state=seed), k=1))
+        data = rng.pareto(0.8, m.nnz)
+        bands.append(meanFilterBand(
+            pixels2Band(m.row, m.col, data, size, nDiags), 2))
+    b1, b2 = bands
+    for winBins, stepBins in [(100, 1), (200, 7), (170, 60)]:
+        starts, scc = sccByBandWindows(b1, b2, nDiags, winBins, stepBins)
+        assert starts[-1] == size - winBins,\
+            f"sccByBandWindows doesn't score the end of the band"
+        for start, result in zip(starts, scc):
+            stop = start + winBins
+            expected = sccByBand(windowBand(b1, start, stop),
+                                 windowBand(b2, start, stop), nDiags)
+            assert np.isclose(result, expected, rtol=0, atol=5e-9),\
+                f"sccByBandWindows differs from sccByBand of the window "\
+                f"[{start}, {stop})"
+
+
+def testFlyHiC():
+    fmcool1 = "tests/data/fly_hi-c/4DNFI8DRD739_bin100kb.cool"
+    fmcool2 = "tests/data/fly_hi-c/4DNFIZ1ZVXC8_bin100kb.cool"
+    h = 1
+    dBPMax = 500000
+    cool1, _ = readMcool(fmcool1, -1)
+    cool2, _ = readMcool(fmcool2, -1)
+
+    # windows larger than any chromosome give the whole chromosome scores
+    expected = hicrepSCC(cool1, cool2, h, dBPMax, False)
+    results = hicrepSCCWindows(cool1, cool2, h, dBPMax, False, 10**9, 10**9)
+    chroms = cool1.chroms()[:].set_index('name')['length']
+    for (chrName, starts, ends, scc), sccChr in zip(results, expected):
+        assert starts.tolist() == [0] and ends.tolist() == [chroms[chrName]],\
+            f"Whole chromosome window of {chrName} is [{starts}, {ends})"
+        assert np.isclose(scc[0], sccChr, rtol=0, atol=1e-12),\
+            f"Whole chromosome window of {chrName} scores {scc[0]} instead "\
+            f"of {sccChr}"
+
+    results = hicrepSCCWindows(cool1, cool2, h, dBPMax, False, 2000000, 500000)
+    chrName, starts, ends, scc = results[0]
+    chrLen = chroms[chrName]
+    assert (starts[:-1] == np.arange(starts.size - 1) * 500000).all() and\
+        (ends[:-1] - starts[:-1] == 2000000).all(),\
+        f"hicrepSCCWindows windows of {chrName} are wrong"
+    assert ends[-1] == chrLen and starts[-1] < ends[-1] and\
+        starts[-1] > starts[-2],\
+        f"hicrepSCCWindows last window of {chrName} doesn't end at the end "\
+        f"of the chromosome"
+    with pytest.raises(AssertionError):
+        hicrepSCCWindows(cool1, cool2, h, dBPMax, False, 2000000, 250000)
+    assert np.nanmin(scc) > 0.5,\
+        f"hicrepSCCWindows scores of replicates are too low"
@@ -11,8 +11,10 @@
 import numpy as np
 import scipy.sparse as sp
 from scipy.sparse import coo_matrix
+from hicrep.utils import pixels2Band, upperDiagCsr
+import hicrep.hicrep
 from hicrep.hicrep import (
-    sccByDiag
+    sccByDiag, sccByDiagCsr, diagStatsCoo
     )
 
 def testSccByDiag():
@@ -29,3 +31,54 @@ def testSccByDiag():
     assert scc < 1e-3 and scc > -1e-3,\
         f"sccByDiag returns SCC score significantly different than 0"\
         f"for two randomly populated matrices"
+
+
+def testSccByDiagBand():
+    size = 500
+    nDiags = 50
+    m1 = coo_matrix(sp.triu(sp.random(size, size, density=0.2), k=1))
+    m2 = coo_matrix(sp.triu(sp.random(size, size, density=0.2), k=1))
+    b1 = pixels2Band(m1.row, m1.col, m1.data, size, size)
+    b2 = pixels2Band(m2.row, m2.col, m2.data, size, size)
+    # Test that the DiagBand inputs give the same score as the sparse ones
+    for n in [2, nDiags, size]:
+        assert np.isclose(sccByDiag(b1, b2, n), sccByDiag(m1, m2, n)),\
+            f"sccByDiag returns different SCC scores for DiagBand and "\
+            f"coo_matrix inputs with {n} diagonals"
+
+
+def testSccByDiagFused():
+    size = 500
+    m1 = coo_matrix(sp.random(size, size, density=0.2))
+    m2 = coo_matrix(sp.random(size, size, density=0.2) + m1)
+    # add duplicated and explicit zero entries, which should be summed and
+    # ignored respectively
+    m1 = coo_matrix((np.concatenate([m1.data, m1.data[:10], np.zeros(5)]),
+                     (np.concatenate([m1.row, m1.row[:10], np.arange(5)]),
+                      np.concatenate([m1.col, m1.col[:10], np.arange(5) + 1]))),
+                    shape=m1.shape)
+    # Test that the fused statistics kernel gives the same scores as the
+    # diagonal-wise csr matrices with both the sorted keys and the dense arrays
+    ratio = hicrep.hicrep.DENSE_DIAG_STATS_RATIO
+    try:
+        for hicrep.hicrep.DENSE_DIAG_STATS_RATIO in [0, np.inf]:
+            for n in [2, 50, size]:
+                assert np.isclose(sccByDiag(m1, m2, n),
+                                  sccByDiagCsr(upperDiagCsr(m1, n),
+                                               upperDiagCsr(m2, n))),\
+                    f"sccByDiag returns different SCC scores from "\
+                    f"sccByDiagCsr with {n} diagonals"
+            # Test the statistics against dense computation
+            n = 50
+            stats = diagStatsCoo(m1, m2, n)
+            x = m1.toarray()
+            y = m2.toarray()
+            for d in [1, n // 2, n - 1]:
+                xD = np.diag(x, d)
+                yD = np.diag(y, d)
+                expected = [np.count_nonzero((xD != 0) | (yD != 0)), xD.sum(),
+                            yD.sum(), xD @ xD, yD @ yD, xD @ yD]
+                assert np.allclose([stat[d - 1] for stat in stats], expected),\
+                    f"diagStatsCoo returns wrong statistics for diagonal {d}"
+    finally:
+        hicrep.hicrep.DENSE_DIAG_STATS_RATIO = ratio